@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+""" Benchmark of the CLUT inversion methods against a dense ground truth.
+
+Simulates sweeps with a different number of grey levels and measurement noise on a
+saturating luminance curve, inverts them with every method of `invert_luminances`, and
+reports the RMS and maximal linearization error (relative luminance) of the resulting CLUT.
+"""
+import time
+
+import numpy as np
+
+from psychopy_pixx.devices._clut import CLUT_METHODS, invert_luminances
+
+
+def true_luminance(levels):
+    """ Gamma-like curve that saturates at high grey levels. """
+    return levels**2.2 / (0.3 + 0.7 * levels**1.5)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(42)
+    dense_levels = np.linspace(0, 1, 200001)
+    dense_lums = true_luminance(dense_levels) / true_luminance(1.)
+    desired_lums = np.linspace(0, 1, 2**16)
+
+    print(f"{'noise':>8} {'levels':>6} " + " ".join(f"{method:>26}" for method in CLUT_METHODS))
+    for noise in (0, 1e-4, 1e-3):
+        for n_levels in (16, 64, 256, 1024, 4096):
+            levels = np.linspace(0, 1, n_levels)
+            lums = np.repeat(true_luminance(levels).reshape(1, -1), 4, axis=0)
+            lums[:, 1:-1] += rng.normal(0, noise, (4, n_levels - 2))
+            results = []
+            for method in CLUT_METHODS:
+                start = time.perf_counter()
+                try:
+                    clut = invert_luminances(levels, lums, method=method)
+                except ValueError:
+                    results.append('failed')
+                    continue
+                duration = time.perf_counter() - start
+                shown_lums = np.interp(clut[0], dense_levels, dense_lums)
+                error = shown_lums - desired_lums
+                results.append(f"{np.sqrt(np.mean(error**2)):.1e} / {np.abs(error).max():.1e} ({duration * 1e3:3.0f}ms)")
+            print(f"{noise:8.0e} {n_levels:6d} " + " ".join(f"{result:>26}" for result in results))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+""" Benchmark of the per-check cost of the register monitor.
+
+Uses a simulated device, whose register update sleeps for a typical USB round trip, to compare
+the cost of a fingerprint check with a full register comparison (like `correct_luminance(assert_register=True)`)
+and shows the cost of rate-limited calls, e.g. after every frame.
+With a real ViewPixx, use `vpixx.register_monitor()` and its `.stats()` instead.
+"""
+import time
+
+import numpy as np
+
+from psychopy_pixx.devices._register_monitor import RegisterMonitor
+
+
+class SimulatedDevice(object):
+    """ Register with a few dozen entries and a slow register update. """
+    def __init__(self, latency=0.5e-3, n_entries=40):
+        self.latency = latency
+        self._register = {f'Entry{n}': n for n in range(n_entries)}
+        self._register.update({'VideoMode': 'M16', 'BacklightIntensity': 255})
+        for key in self._register:
+            setattr(self, 'get' + key, lambda key=key: self._register[key])
+        self.isScanningBackLightEnabled = lambda: True
+
+    def updateRegisterCache(self):
+        time.sleep(self.latency)
+
+
+def time_calls(function, n_calls):
+    durations = []
+    for _ in range(n_calls):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return np.array(durations) * 1e3
+
+
+if __name__ == '__main__':
+    n_calls = 500
+    print(f"{'latency':>8} {'check':>24} {'all entries':>24} {'rate-limited call':>24}")
+    for latency in (0., 0.2e-3, 1e-3):
+        device = SimulatedDevice(latency)
+        expected = {key: getattr(device, 'get' + key)() for key in device._register}
+        expected['ScanningBackLight'] = True
+
+        fingerprint_monitor = RegisterMonitor(device, expected, min_interval=0.)
+        full_monitor = RegisterMonitor(device, expected, keys=None, min_interval=0.)
+        limited_monitor = RegisterMonitor(device, expected, min_interval=60.)
+        limited_monitor.check()
+        results = [time_calls(monitor.check, n_calls) for monitor in (fingerprint_monitor, full_monitor, limited_monitor)]
+        print(f"{latency * 1e3:6.1f}ms " + " ".join(f"{np.median(durations):9.4f}ms (p99 {np.percentile(durations, 99):7.4f}ms)"
+                                                for durations in results))
+
+    device = SimulatedDevice()
+    register_monitor = RegisterMonitor(device, expected, min_interval=0.05, on_mismatch='ignore')
+    register_monitor.start()
+    time.sleep(0.3)
+    device._register['BacklightIntensity'] = 128  # e.g. changed with VPutil
+    time.sleep(0.2)
+    register_monitor.stop()
+    print(f"Background monitor: {register_monitor.stats()}")
+    print(f"First mismatch: {register_monitor.events[0]['mismatches']}")
+    device._register['BacklightIntensity'] = 255
+    register_monitor.check(force=True)
+    print(f"Events after the recovery: {register_monitor.stats()}")
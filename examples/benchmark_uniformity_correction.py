@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+""" Benchmark of the spatial uniformity correction with the NumPy reference of the shaders.
+
+Simulates a panel with a smooth luminance fall-off towards the edges, measures it at a few
+photometer positions, builds the gain/offset maps, and reports the luminance non-uniformity
+across the whole panel before and after correction, together with the per-pixel cost of the reference.
+"""
+import time
+
+import numpy as np
+
+from psychopy_pixx.devices._uniformity import correct_uniformity, sample_map, uniformity_maps
+
+
+def panel_luminance(values, x, y):
+    """ Luminance of the globally linearized panel, darker and with more black level towards the edges. """
+    gain = 100 * (1 - 0.15 * (x**2 + y**2) / 2 + 0.03 * x)
+    offset = 0.5 + 0.1 * (x**2 + y**2)
+    return offset + gain * values
+
+
+if __name__ == '__main__':
+    height, width = 1200, 1920
+    levels = np.linspace(0, 1, 17)
+    rng = np.random.default_rng(42)
+
+    # pixel centers in norm units, row 0 at the bottom
+    x = 2 * (np.arange(width) + 0.5) / width - 1
+    y = 2 * (np.arange(height) + 0.5) / height - 1
+    x, y = np.meshgrid(x, y)
+    test_values = np.linspace(0.05, 0.95, 5)
+
+    print(f"{'positions':>9} {'map':>7} {'before':>8} {'after':>8} {'build':>8} {'per pixel':>10}")
+    for n_grid in (2, 3, 5):
+        grid = np.linspace(-0.8, 0.8, n_grid)
+        positions = np.stack(np.meshgrid(grid, grid), axis=-1).reshape(-1, 2)
+        lums = panel_luminance(levels, positions[:, :1], positions[:, 1:])
+        lums = np.repeat(lums[:, None, :], 4, axis=1) + rng.normal(0, 0.05, (len(positions), 4, len(levels)))
+        for size in ((4, 4), (16, 16)):
+            start = time.perf_counter()
+            gain_map, offset_map = uniformity_maps(levels, lums, positions, size=size)
+            build_time = time.perf_counter() - start
+
+            gain, offset = sample_map(gain_map, height, width)[0], sample_map(offset_map, height, width)[0]
+            before, after = [], []
+            start = time.perf_counter()
+            for value in test_values:
+                corrected = correct_uniformity(np.full((height, width), value, dtype=np.float32), gain, offset)
+                before.append(panel_luminance(value, x, y))
+                after.append(panel_luminance(corrected, x, y))
+            pixel_time = (time.perf_counter() - start) / len(test_values) / (height * width)
+            # non-uniformity: relative standard deviation across the panel, worst test value
+            before = max(np.std(lum) / np.mean(lum) for lum in before)
+            after = max(np.std(lum) / np.mean(lum) for lum in after)
+            print(f"{len(positions):9d} {size[0]:3d}x{size[1]:<3d} {100 * before:7.2f}% {100 * after:7.2f}% "
+                  f"{build_time * 1e3:6.1f}ms {pixel_time * 1e9:8.1f}ns")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+""" Example that plays a pre-encoded 16-bit noise movie at the full refresh rate and reports dropped frames. """
+import time
+
+import numpy as np
+
+
+if __name__ == '__main__':
+    from psychopy import visual, core, monitors  # import some libraries from PsychoPy
+
+    from psychopy_pixx.devices import ViewPixx
+    from psychopy_pixx.devices.viewpixx import encode_frames_file
+
+    screen = 1
+    n_frames = 600
+    mon = monitors.Monitor('ViewPixx')
+    mywin = visual.Window(size=mon.getSizePix(), monitor=mon, units="deg", useFBO=True, 
+                          screen=screen, fullscr=False, gamma=1)
+    vpixx = ViewPixx(mywin)
+    vpixx.mode = 'M16'
+    vpixx.correct_luminance()
+
+    print(f"Encode {n_frames} noise frames ...")
+    width, height = mywin.frameBufferSize
+    rng = np.random.default_rng(42)
+    # coarse binary noise around mid grey, 16 x 16 pixel checks
+    checks = rng.random((n_frames, height // 16 + 1, width // 16 + 1), dtype=np.float32) > 0.5
+    noise = np.repeat(np.repeat(checks, 16, axis=1), 16, axis=2)[:, :height, :width] * 0.02 + 0.49
+    start = time.perf_counter()
+    frames = encode_frames_file('noise_m16.npy', noise, mode='M16', clut=vpixx.shader_clut)
+    print(f"Encoded in {time.perf_counter() - start:.1f}s.")
+
+    print("Play noise movie ...")
+    flip_times = np.array(list(vpixx.play_frames(frames)))
+    intervals = np.diff(flip_times)
+    frame_interval = np.median(intervals)
+    print(f"Frame interval {1000 * frame_interval:.2f}ms (max {1000 * intervals.max():.2f}ms), "
+          f"{np.sum(intervals > 1.5 * frame_interval)} dropped frames.")
+    mywin.flip()
+    core.wait(1.0)
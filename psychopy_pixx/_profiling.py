@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+"""
+Lightweight instrumentation of calibration phases and device calls.
+
+Spans (durations) and counters are recorded as trace events, the JSON format of
+chrome://tracing and https://ui.perfetto.dev, such that a whole calibration night can be inspected
+on a timeline. The profiler is disabled by default and then costs a single attribute lookup per span.
+
+usage::
+    from psychopy_pixx._profiling import PROFILER
+    PROFILER.enable()
+    with PROFILER.span('flip', 'calibration', level=0.5):
+        window.flip()
+    PROFILER.count('serial bytes read', 42)
+    PROFILER.save('calibration_trace.json')
+"""
+
+
+def _to_json(value):
+    if hasattr(value, 'item'):  # numpy scalars
+        return value.item()
+    return str(value)
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler(object):
+    """ Record spans and counters as trace events.
+
+    Events are appended from any thread (list.append is atomic), counters are updated under a lock.
+    Timestamps are time.perf_counter() in microseconds relative to the profiler's creation.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+        self.counters = {}
+        self._pid = os.getpid()
+        self._start = time.perf_counter()
+        self._thread_names = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self.events = []
+        self.counters = {}
+        self._start = time.perf_counter()
+
+    def _timestamp(self, perf_time=None) -> float:
+        if perf_time is None:
+            perf_time = time.perf_counter()
+        return (perf_time - self._start) * 1e6
+
+    def _tid(self) -> int:
+        thread = threading.current_thread()
+        self._thread_names.setdefault(thread.ident, thread.name)
+        return thread.ident
+
+    def span(self, name: str, category: str = 'calibration', **args):
+        """ Context manager that records the duration of its block. """
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, category, args)
+
+    @contextmanager
+    def _span(self, name, category, args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), category, **args)
+
+    def record(self, name: str, start: float, stop: float, category: str = 'calibration', **args):
+        """ Record a span between two time.perf_counter() times, e.g. across the chunks of a generator. """
+        if not self.enabled:
+            return
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': self._pid, 'tid': self._tid(),
+                 'ts': self._timestamp(start), 'dur': (stop - start) * 1e6}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def instant(self, name: str, category: str = 'calibration', **args):
+        """ Record a point in time, e.g. a warning. """
+        if not self.enabled:
+            return
+        event = {'name': name, 'cat': category, 'ph': 'i', 's': 't', 'pid': self._pid, 'tid': self._tid(),
+                 'ts': self._timestamp()}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def count(self, name: str, value=1, category: str = 'calibration'):
+        """ Add value to a counter, recorded as its running total. """
+        if not self.enabled:
+            return
+        with self._lock:  # called from the acquisition and reader threads
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self.events.append({'name': name, 'cat': category, 'ph': 'C', 'pid': self._pid,
+                                'ts': self._timestamp(), 'args': {name: total}})
+
+    def summary(self) -> dict:
+        """ Return count, total, mean and max duration (seconds) per span name, and the counters. """
+        spans = {}
+        for event in self.events:
+            if event['ph'] != 'X':
+                continue
+            stats = spans.setdefault(event['name'], {'count': 0, 'total': 0., 'max': 0.})
+            duration = event['dur'] * 1e-6
+            stats['count'] += 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+        for stats in spans.values():
+            stats['mean'] = stats['total'] / stats['count']
+        return {'spans': spans, 'counters': dict(self.counters)}
+
+    def print_summary(self):
+        summary = self.summary()
+        spans = sorted(summary['spans'].items(), key=lambda item: -item[1]['total'])
+        print(f"{'span':>28} {'count':>7} {'total':>9} {'mean':>9} {'max':>9}")
+        for name, stats in spans:
+            print(f"{name:>28} {stats['count']:7d} {stats['total']:8.2f}s "
+                  f"{stats['mean'] * 1e3:7.2f}ms {stats['max'] * 1e3:7.2f}ms")
+        for name, total in summary['counters'].items():
+            print(f"{name:>28} {total:>7g}")
+
+    def save(self, path):
+        """ Write the events as trace-event JSON, with the summary as metadata. """
+        thread_names = [{'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': name}}
+                        for tid, name in self._thread_names.items()]
+        with open(path, 'w') as trace_file:
+            json.dump({'traceEvents': thread_names + list(self.events),
+                       'displayTimeUnit': 'ms',
+                       'otherData': self.summary()}, trace_file, default=_to_json)
+        return path
+
+
+PROFILER = Profiler()
@@ -0,0 +1,100 @@
+"""
+Binary sidecar files for large calibration entries.
+
+Psychopy stores all calibrations of a monitor in one json file, which is parsed completely
+by `monitors.Monitor(name)`. Large arrays (e.g. 4096x4 luminances) and the ViewPixx register
+are therefore stored in separate files next to the monitor file and the calibration only keeps
+a reference `{'sidecar': 'ViewPixx_arrays/<calibration>/lumsPre.npy'}`.
+Arrays are memory-mapped when loaded, so they are only read if used.
+"""
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+
+
+SIDECAR = 'sidecar'
+SIDECAR_ENTRIES = ('lumsPre', 'levelsPre', 'lumsPost', 'levelsPost', 'lumsRes', 'levelsRes',
+                   'lumsUniformity', 'viewpixx')
+
+
+def safe_name(name) -> str:
+    """ File name from a calibration name, which by default contains spaces and colons. """
+    return re.sub(r'[^\w.-]', '_', str(name))
+
+
+def _monitor_folder() -> Path:
+    from psychopy.monitors.calibTools import monitorFolder
+    return Path(monitorFolder)
+
+
+def _to_json(value):
+    if hasattr(value, 'tolist'):  # numpy arrays and scalars
+        return value.tolist()
+    return str(value)
+
+
+def json_normalized(value):
+    """ Return the value as loaded back from a json file, e.g. tuples and arrays become lists. """
+    return json.loads(json.dumps(value, default=_to_json))
+
+
+def is_sidecar(value) -> bool:
+    return isinstance(value, dict) and SIDECAR in value
+
+
+def store_calib_entry(monitor, key: str, value=None):
+    """ Move an entry of the current calibration into a sidecar file.
+
+    Arrays are stored as .npy, dictionaries as .json files.
+    """
+    if value is None:
+        value = monitor.currentCalib[key]
+    if is_sidecar(value):
+        return
+    folder = Path(f'{monitor.name}_arrays') / safe_name(monitor.currentCalibName)
+    (_monitor_folder() / folder).mkdir(parents=True, exist_ok=True)
+    if isinstance(value, dict):
+        path = folder / f'{key}.json'
+        with open(_monitor_folder() / path, 'w') as sidecar_file:
+            json.dump(value, sidecar_file, default=_to_json)
+    else:
+        path = folder / f'{key}.npy'
+        np.save(_monitor_folder() / path, np.asarray(value))
+    monitor.currentCalib[key] = {SIDECAR: path.as_posix()}
+
+
+def store_calib_entries(monitor, keys=SIDECAR_ENTRIES):
+    """ Move the large entries of the current calibration into sidecar files. """
+    for key in keys:
+        if monitor.currentCalib.get(key) is not None:
+            store_calib_entry(monitor, key)
+
+
+def load_calib_entry(monitor, key: str, default=None, mmap: bool = True):
+    """ Return an entry of the current calibration, loading it from its sidecar file if necessary.
+
+    Arrays are memory-mapped read-only, unless mmap=False.
+    """
+    value = monitor.currentCalib.get(key, default)
+    if not is_sidecar(value):
+        return value
+    path = _monitor_folder() / value[SIDECAR]
+    if path.suffix == '.json':
+        with open(path) as sidecar_file:
+            return json.load(sidecar_file)
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+
+def copy_calib(monitor, name=None):
+    """ Copy the current calibration like monitor.copyCalib, including its sidecar files.
+
+    The sidecar entries are stored again under the new calibration, such that both calibrations
+    can be changed or deleted independently.
+    """
+    entries = {key: load_calib_entry(monitor, key, mmap=False)
+               for key, value in monitor.currentCalib.items() if is_sidecar(value)}
+    monitor.copyCalib(name)
+    for key, value in entries.items():
+        store_calib_entry(monitor, key, value)
@@ -0,0 +1,83 @@
+import itertools
+import json
+import os
+from pathlib import Path
+
+
+"""
+Calibration campaigns over a grid of monitor configurations.
+
+Changes of the backlight intensity or scanning mode change the panel temperature and require a new warm-up,
+video mode changes do not. Campaigns are therefore ordered by scanning mode, then backlight intensity in
+alternating direction (such that consecutive configurations differ in small steps), with the video modes innermost.
+Completed configurations and the campaign name are stored in a checkpoint file,
+such that an interrupted campaign can be resumed.
+"""
+
+GRID_KEYS = ('scanning', 'bg_intensity', 'mode')
+# the luminance correction (software CLUT) requires the high luminance-resolution modes
+CAMPAIGN_MODES = ('M16', 'C48')
+DEFAULT_CONFIG = {'scanning': True, 'bg_intensity': 255, 'mode': 'M16'}
+
+
+def expand_grid(grid: dict) -> list:
+    """ All combinations of the grid values, e.g. {'bg_intensity': [255, 128], 'scanning': [True, False]}. """
+    unknown = set(grid) - set(GRID_KEYS)
+    if unknown:
+        raise ValueError(f"Expects grid keys in {GRID_KEYS}, got {sorted(unknown)}.")
+    values = [grid.get(key, [DEFAULT_CONFIG[key]]) for key in GRID_KEYS]
+    values = [value if isinstance(value, list) else [value] for value in values]
+    unsupported_modes = set(values[GRID_KEYS.index('mode')]) - set(CAMPAIGN_MODES)
+    if unsupported_modes:
+        raise ValueError(f"Expects video modes in {CAMPAIGN_MODES}, got {sorted(unsupported_modes)}.")
+    return [dict(zip(GRID_KEYS, combination)) for combination in itertools.product(*values)]
+
+
+def needs_warmup(previous, config) -> bool:
+    """ Whether the panel has to warm up again after changing from the previous configuration. """
+    return (previous is None or previous['scanning'] != config['scanning']
+            or previous['bg_intensity'] != config['bg_intensity'])
+
+
+def plan_campaign(configs: list) -> list:
+    """ Order configurations to limit warm-ups and the backlight steps between them. """
+    ordered = []
+    scanning_modes = sorted({config['scanning'] for config in configs}, reverse=True)
+    descending = True
+    for scanning in scanning_modes:
+        group = [config for config in configs if config['scanning'] == scanning]
+        intensities = sorted({config['bg_intensity'] for config in group}, reverse=descending)
+        for intensity in intensities:
+            ordered += sorted((config for config in group if config['bg_intensity'] == intensity),
+                              key=lambda config: str(config['mode']))
+        # continue the next scanning mode at the current intensity
+        descending = not descending
+    return ordered
+
+
+def config_name(campaign: str, config: dict) -> str:
+    """ Calibration name of a configuration. """
+    scanning = 'scanning' if config['scanning'] else 'normal'
+    return f"{campaign} {config['mode']} {scanning} backlight {config['bg_intensity']}"
+
+
+def config_key(config: dict) -> str:
+    return json.dumps({key: config[key] for key in GRID_KEYS}, sort_keys=True)
+
+
+def load_checkpoint(path) -> dict:
+    """ Return the checkpoint, {'name': campaign name, 'completed': calibration names by config_key}. """
+    path = Path(path)
+    if not path.exists():
+        return {'name': None, 'completed': {}}
+    with open(path) as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    return {'name': checkpoint.get('name'), 'completed': checkpoint['completed']}
+
+
+def save_checkpoint(path, name: str, completed: dict):
+    """ Write the checkpoint atomically, such that an interruption cannot corrupt it. """
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as checkpoint_file:
+        json.dump({'name': name, 'completed': completed}, checkpoint_file, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class DriftCorrector:
+    """ Correct slow luminance drift, e.g. backlight warm-up, during long measurements.
+
+    Reference levels are re-measured every `interval` levels. The drift is modelled as a
+    multiplicative gain of the summed reference luminances, relative to the first reference
+    measurement, and interpolated linearly in time between reference measurements.
+
+    usage::
+        drift = DriftCorrector(reference_levels=[1.0], interval=50, threshold=0.02)
+        lums = measure_luminances(levels, window, photometer, drift=drift)  # corrected luminances
+        drift.as_dict()  # reference measurements, e.g. to store in the calibration
+    :parameters:
+        reference_levels: list of float
+            grey levels between 0 and 1 to re-measure, should be bright enough to measure a gain.
+        interval: int
+            number of levels between reference measurements.
+        threshold: float
+            relative drift that triggers a warning (and a pause, if pause=True) when it is crossed.
+        pause: bool
+            wait for a key press if the drift crosses the threshold.
+    """
+    def __init__(self, reference_levels=(1.0,), interval=50, threshold=0.02, pause=False):
+        self.reference_levels = np.asarray(reference_levels, dtype=float)
+        self.interval = int(interval)
+        self.threshold = threshold
+        self.pause = pause
+        self.times = []
+        self.lums = []
+
+    def add_reference(self, timestamp: float, lums) -> float:
+        """ Add a reference measurement and return the current drift, relative to the first. """
+        self.times.append(timestamp)
+        self.lums.append(np.asarray(lums, dtype=float))
+        return self.drift
+
+    @property
+    def gains(self) -> np.ndarray:
+        """ Luminance gain of every reference measurement, relative to the first. """
+        if not self.lums:
+            return np.array([])
+        lums = np.array(self.lums)
+        if lums[0].sum() <= 0:
+            return np.ones(len(lums))
+        # summed luminance weights the references by brightness, dark references hardly count
+        return lums.sum(axis=1) / lums[0].sum()
+
+    @property
+    def drift(self) -> float:
+        gains = self.gains
+        return float(gains[-1] - 1) if len(gains) else 0.
+
+    @property
+    def exceeded(self) -> bool:
+        return abs(self.drift) > self.threshold
+
+    @property
+    def crossed(self) -> bool:
+        """ Whether the last reference measurement exceeds the threshold, but the one before did not. """
+        exceeded = np.abs(self.gains - 1) > self.threshold
+        return bool(len(exceeded) and exceeded[-1] and (len(exceeded) == 1 or not exceeded[-2]))
+
+    def gain(self, times) -> np.ndarray:
+        """ Interpolated gain at the (time.perf_counter) times, constant beyond the references. """
+        if not self.times:
+            return np.ones_like(np.asarray(times, dtype=float))
+        return np.interp(times, self.times, self.gains)
+
+    def correct(self, times, lums) -> np.ndarray:
+        """ Divide luminances measured at times by the interpolated drift gain. """
+        return np.asarray(lums) / self.gain(times)
+
+    def as_dict(self) -> dict:
+        return {
+            'reference_levels': self.reference_levels,
+            'interval': self.interval,
+            'threshold': self.threshold,
+            'times': np.array(self.times),
+            'lums': np.array(self.lums),
+            'gains': self.gains,
+        }
@@ -1,44 +1,162 @@
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from psychopy.monitors import GammaCalculator
 
 
 """
-Utility function to fit gamma curve from measurements. 
+Utility function to fit gamma curve from measurements.
 
 Psychopy estimates an inverse gamma function from these luminances
 as described here: https://www.psychopy.org/general/gamma.html
 
 We would like to use the full inverse (Eq. 3), which
 is for some reason called eq.4 in the code.
-"""     
+
+Instead of psychopy's GammaCalculator, which fits one series at a time,
+the series are fitted together with a vectorized Levenberg-Marquardt
+optimization of the same model, starting values, and parameter bounds.
+"""
 
 # eq4: y = a + (b + k*xx)**gamma  # Pelli & Zhang 1991
 # https://www.psychopy.org/_modules/psychopy/monitors
-#     /calibTools.html#Monitor.linearizeLums        
-EQ_FULL_GAMMA = 4 
+#     /calibTools.html#Monitor.linearizeLums
+EQ_FULL_GAMMA = 4
+
+# bounds of (gamma, a, k) as in psychopy's GammaCalculator.fitGammaFun
+GAMMA_BOUNDS = (0.8, 5.0)
+K_BOUNDS = (2., 200.)
+A_MARGIN = 0.00001
+
+
+def _full_gamma(x, min_lum, gamma, a, k):
+    """ Model luminances and jacobian w.r.t. (gamma, a, k) for series in rows. """
+    gamma, a, k, min_lum = (v[:, np.newaxis] for v in (gamma, a, k, min_lum))
+    # psychopy's gammaFun uses b = 0.1**(1/gamma) if a >= min_lum, can't take inv power of -ve
+    valid = a < min_lum
+    offset = np.where(valid, min_lum - a, 0.1)
+    b = offset ** (1 / gamma)
+    base = np.clip(b + k * x, 1e-12, None)
+    power = base ** gamma
+    dpower = base ** (gamma - 1)  # = d(power) / d(base) / gamma
+    jac = np.empty(power.shape + (3,))
+    jac[..., 0] = power * np.log(base) - dpower * b * np.log(offset) / gamma
+    jac[..., 1] = 1 - np.where(valid, dpower * offset ** (1 / gamma - 1), 0)
+    jac[..., 2] = gamma * dpower * x
+    return a + power, jac
+
+
+def _fit_full_gamma(levels, lums, max_iter=200, tol=1e-10):
+    """ Fit eq.4 to every row of lums, returns (N, 6) grid. """
+    n_series = lums.shape[0]
+    min_lum, max_lum = lums[:, 0], lums[:, -1]
+    lower = np.stack([np.full(n_series, GAMMA_BOUNDS[0]), np.full(n_series, A_MARGIN), np.full(n_series, K_BOUNDS[0])], axis=1)
+    upper = np.stack([np.full(n_series, GAMMA_BOUNDS[1]), min_lum - A_MARGIN, np.full(n_series, K_BOUNDS[1])], axis=1)
+    upper = np.maximum(upper, lower)
+
+    # starting values as in psychopy
+    gamma_guess = 2.0
+    a_guess = min_lum / 5.0
+    k_guess = np.clip(max_lum - a_guess, 0, None) ** (1.0 / gamma_guess) - a_guess
+    params = np.clip(np.stack([np.full(n_series, gamma_guess), a_guess, k_guess], axis=1), lower, upper)
+
+    model, jac = _full_gamma(levels, min_lum, *params.T)
+    ssq = np.sum((model - lums)**2, axis=1)
+    damping = np.full(n_series, 1e-3)
+    active = np.ones(n_series, dtype=bool)
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        resid = (model - lums)[active]
+        jtj = np.einsum('nli,nlj->nij', jac[active], jac[active])
+        jtr = np.einsum('nli,nl->ni', jac[active], resid)
+        # keep parameters at a bound fixed if the gradient points outwards (projected steps would stall)
+        fixed = (((params[active] <= lower[active]) & (jtr > 0))
+                 | ((params[active] >= upper[active]) & (jtr < 0)))
+        free = ~fixed
+        jtj = jtj * free[:, :, np.newaxis] * free[:, np.newaxis, :] + fixed[:, :, np.newaxis] * np.eye(3)
+        jtr = np.where(fixed, 0., jtr)
+        diag = np.einsum('nii->ni', jtj)
+        lhs = jtj + (damping[active, np.newaxis] * (diag + 1e-12))[..., np.newaxis] * np.eye(3)
+        step = np.linalg.solve(lhs, -jtr[..., np.newaxis])[..., 0]
+        candidate = np.clip(params[active] + step, lower[active], upper[active])
+        new_model, new_jac = _full_gamma(levels, min_lum[active], *candidate.T)
+        new_ssq = np.sum((new_model - lums[active])**2, axis=1)
+
+        improved = new_ssq < ssq[active]
+        idx = np.flatnonzero(active)
+        accept = idx[improved]
+        params[accept] = candidate[improved]
+        model[accept], jac[accept] = new_model[improved], new_jac[improved]
+        converged = np.abs(ssq[accept] - new_ssq[improved]) <= tol * (1 + ssq[accept])
+        ssq[accept] = new_ssq[improved]
+        damping[accept] /= 3
+        damping[idx[~improved]] *= 2
+        active[accept[converged]] = False
+        active[idx[~improved][damping[idx[~improved]] > 1e10]] = False
+
+    gamma, a, k = params.T
+    b = np.where(a < min_lum, min_lum - a, 0.1) ** (1.0 / gamma)
+    return np.stack([min_lum, max_lum, gamma, a, b, k], axis=1)
+
+
+def fit_gamma_batch(used_levels: np.ndarray, measured_lums: np.ndarray, n_jobs: int = 1, chunk_size: int = 1024):
+    """ Fit the full gamma function (eq.4) to a stack of luminance series.
+
+    Parameters
+    ----------
+    used_levels : array of shape (levels,)
+        Grey levels of the measurements, shared by all series, between 0 and 1 or 0 and 255
+        (rescaled like psychopy's gammaFun if larger than 2).
+    measured_lums : array of shape (N, levels)
+        Luminance series, e.g. guns of many calibrations or bootstrap resamples.
+        Identical series are fitted only once.
+    n_jobs : int
+        Number of processes to spread batches larger than chunk_size.
+
+    Returns
+    -------
+    Array of shape (N, 6) with the columns min, max, gamma, a, b, k.
+    """
+    used_levels = np.asarray(used_levels, dtype=float)
+    if used_levels.max() > 2.0:
+        used_levels = used_levels / 255.0
+    measured_lums = np.asarray(measured_lums, dtype=float)
+    if measured_lums.ndim != 2 or measured_lums.shape[1] != len(used_levels):
+        raise ValueError("Expect luminances of shape (N, levels) matching the levels, "
+                         f"got {used_levels.shape} and {measured_lums.shape}")
+
+    unique_lums, inverse = np.unique(measured_lums, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)  # numpy 2 returns inverse with the input's dimension
+    if n_jobs > 1 and len(unique_lums) > chunk_size:
+        chunks = np.array_split(unique_lums, int(np.ceil(len(unique_lums) / chunk_size)))
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            grids = pool.map(_fit_full_gamma, [used_levels] * len(chunks), chunks)
+            unique_grid = np.concatenate(list(grids))
+    else:
+        unique_grid = _fit_full_gamma(used_levels, unique_lums)
+    return unique_grid[inverse]
+
+
 
 def fit_gamma_grid(used_levels: np.ndarray, measured_lums: np.ndarray):
+    """ Fit the full gamma function (eq.4) to the luminances of 1 or 4 guns.
+
+    Returns the (4, 6) grid of psychopy's calibrations with the columns min, max, gamma, a, b, k;
+    a single series is used for all guns.
+    """
     used_levels = np.asarray(used_levels)
     measured_lums = np.asarray(measured_lums)
     if measured_lums.ndim == 1:
-        measured_lums = measured_lums.reshape(1, -1)  
+        measured_lums = measured_lums.reshape(1, -1)
 
     n_gun, n_measures = measured_lums.shape
     if n_gun not in (1, 4):
-        raise ValueError(f"Expect either 1 or 4 measurement series for the guns, got {n_guns}.")    
+        raise ValueError(f"Expect either 1 or 4 measurement series for the guns, got {n_gun}.")
     if len(used_levels) != n_measures:
         raise ValueError("Expect same number of entries for levels and measures, "
                          f"got {used_levels.shape} and {measured_lums.shape}")
-    
-    gamma_grid = np.zeros([4, 6])
-    for gun in range(4):
-        gamma_calc= GammaCalculator(inputs=used_levels, lums=measured_lums[gun], eq=EQ_FULL_GAMMA)
-        gamma_grid[gun, 0] = gamma_calc.min
-        gamma_grid[gun, 1] = gamma_calc.max
-        gamma_grid[gun, 2] = gamma_calc.gamma
-        gamma_grid[gun, 3] = gamma_calc.a
-        gamma_grid[gun, 4] = gamma_calc.b
-        gamma_grid[gun, 5] = gamma_calc.k
+
+    gamma_grid = fit_gamma_batch(used_levels, measured_lums)
     if n_gun == 1:
-        gamma_grid[1:, :] = gamma_grid[0, :]
+        gamma_grid = np.repeat(gamma_grid, 4, axis=0)
     return gamma_grid
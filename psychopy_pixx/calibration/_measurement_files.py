@@ -0,0 +1,61 @@
+"""
+Readers of the measurement files stored by `pixxcalibrate measure` (--savefiles, --all_measurements)
+and of look up tables, used by `pixxcalibrate refit`.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def load_luminance_file(path):
+    """ Load levels and luminances from a `luminancePre_*.csv` or `luminancePost_*.csv` file. 
+
+    Levels are stored in percent, luminances in one or four gun columns.
+    """
+    data = np.loadtxt(path, delimiter=',', ndmin=2)
+    levels = data[:, 0] / 100
+    lums = data[:, 1:].T
+    if lums.shape[0] == 1:
+        lums = np.repeat(lums, 4, axis=0)
+    return levels, lums
+
+
+def load_raw_file(path, outliers=None):
+    """ Load and average the single measurements of an `allMeasurments*.csv` file.
+
+    The single measurements are stored without drift correction. If the drift gains of the rows
+    (--drift_interval) exist in `allMeasurments*_drift.csv` next to the file, the measurements are divided by them.
+
+    Measurements deviating more than `outliers` times the (scaled) median absolute deviation
+    from the level's median are ignored.
+    """
+    data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+    levels, inverse = np.unique(data[:, 0], return_inverse=True)
+    measures = data[:, 1:]
+    drift_path = Path(path).with_name(f'{Path(path).stem}_drift.csv')
+    if drift_path.exists():
+        drift = np.loadtxt(drift_path, delimiter=',', skiprows=1, ndmin=2)
+        if len(drift) != len(data) or not np.allclose(drift[:, 0], data[:, 0]):
+            raise ValueError(f"Expects the drift gains in {drift_path} to match the rows of {path}.")
+        print(f"Correct the drift with the gains in {drift_path}.")
+        measures = measures / drift[:, 1:2]
+    if outliers is not None:
+        median = np.median(measures, axis=1, keepdims=True)
+        mad = 1.4826 * np.median(np.abs(measures - median), axis=1, keepdims=True)
+        is_inlier = np.abs(measures - median) <= outliers * mad
+        print(f"Drop {measures.size - is_inlier.sum()} of {measures.size} measurements as outliers.")
+        measures = np.where(is_inlier, measures, np.nan)
+    row_lums = np.nanmean(measures, axis=1)
+    # the same level might be measured repeatedly, average these too
+    lums = np.bincount(inverse, weights=row_lums) / np.bincount(inverse)
+    return levels, np.repeat(lums.reshape(1, -1), 4, axis=0)
+
+
+def load_lut_file(path):
+    """ Load levels and predicted luminances of a look up table file. """
+    lut = pd.read_csv(path)
+    lut = lut.sort_values(by='levels')
+    levels = lut['levels'].values
+    lums = np.array([lut['prediciton'].values, lut['prediciton'].values, lut['prediciton'].values, lut['prediciton'].values])
+    return levels, lums
@@ -0,0 +1,97 @@
+import numpy as np
+
+
+"""
+Order in which the grey levels of a sweep are measured.
+
+Sequential orders have the smallest jumps between consecutive grey levels and thus short settle times,
+but slow drifts of the monitor (e.g. warm-up) are confounded with the grey level.
+Random orders decorrelate drift and level, but maximize the jumps.
+Strided orders measure every k-th level in a pass and alternate the direction of passes,
+which bounds the jumps to k levels while spreading every level region over the whole sweep.
+"""
+
+ORDERS = ('sequential', 'inverted', 'random', 'strided', 'shuffled-strided')
+
+
+def _bit_reversal_order(n: int) -> np.ndarray:
+    """ Low-discrepancy (van der Corput) permutation of range(n). """
+    n_bits = max(1, int(np.ceil(np.log2(max(n, 2)))))
+    values = np.arange(2**n_bits)
+    reversed_values = np.zeros_like(values)
+    for bit in range(n_bits):
+        reversed_values |= ((values >> bit) & 1) << (n_bits - 1 - bit)
+    return reversed_values[reversed_values < n]
+
+
+def plan_order(n_levels: int, order: str = 'sequential', stride: int = None, rng=None) -> np.ndarray:
+    """ Return the indices of n_levels grey levels in measurement order.
+
+    Parameters
+    ----------
+    order : 'sequential', 'inverted', 'random', 'strided' or 'shuffled-strided'
+        'strided' measures every stride-th level per pass, passes start at increasing offsets,
+        'shuffled-strided' starts the passes at offsets in low-discrepancy order.
+        Both alternate the direction of passes to avoid large jumps between passes.
+    stride : int
+        Maximal jump, in levels, of strided orders (default: about sqrt(n_levels)).
+    """
+    if order not in ORDERS:
+        raise ValueError(f"Expects order in {ORDERS}, got '{order}'.")
+    if order == 'sequential':
+        return np.arange(n_levels)
+    elif order == 'inverted':
+        return np.arange(n_levels)[::-1]
+    elif order == 'random':
+        rng = np.random.default_rng(rng)
+        return rng.permutation(n_levels)
+
+    if stride is None:
+        stride = int(np.ceil(np.sqrt(n_levels)))
+    stride = int(np.clip(stride, 1, max(n_levels, 1)))
+    offsets = np.arange(stride) if order == 'strided' else _bit_reversal_order(stride)
+    passes = []
+    for n_pass, offset in enumerate(offsets):
+        indices = np.arange(offset, n_levels, stride)
+        passes.append(indices if n_pass % 2 == 0 else indices[::-1])
+    return np.concatenate(passes)
+
+
+def linear_settle(base: float = 0.5, per_jump: float = 0.):
+    """ Settle time model: base seconds plus per_jump seconds per full range grey level jump.
+
+    The jump is the difference of consecutive grey levels (0 to 1), i.e. of the DAC levels,
+    not of the luminances, which the model does not know before the measurement.
+    """
+    def settle(jump):
+        return base + per_jump * np.abs(jump)
+    return settle
+
+
+def order_report(levels: np.ndarray, index: np.ndarray, settle) -> dict:
+    """ Summarize the settle time and drift confounding of a measurement order.
+
+    Parameters
+    ----------
+    levels : grey levels between 0 and 1
+    index : measurement order, e.g. from plan_order
+    settle : callable returning the settle time for a grey level jump, e.g. from linear_settle
+
+    Returns
+    -------
+    dict with the total and per-level settle time (seconds), maximal jump,
+    and drift confounding, the absolute correlation of measurement time and level.
+    """
+    ordered = np.asarray(levels)[index]
+    jumps = np.abs(np.diff(ordered, prepend=ordered[:1]))
+    settle_times = settle(jumps)
+    if len(ordered) > 1 and np.std(ordered) > 0:
+        confounding = float(np.abs(np.corrcoef(np.arange(len(ordered)), ordered)[0, 1]))
+    else:
+        confounding = 0.
+    return {
+        'total_settle': float(np.sum(settle_times)),
+        'settle_per_level': float(np.mean(settle_times)),
+        'max_jump': float(jumps.max()),
+        'drift_confounding': confounding,
+    }
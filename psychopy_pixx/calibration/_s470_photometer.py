@@ -11,14 +11,52 @@ Note: This class will be integrated in a future psychopy version
 https://github.com/psychopy/psychopy/pull/4680
 """
 import sys
+import threading
+import time
 import numpy as np
 
+from psychopy_pixx._profiling import PROFILER
+
 try:
     import serial
 except ImportError:
     serial = False
 
 
+class _RingBuffer(object):
+    """ Fixed-size buffer of (time, value) pairs, written by a single thread.
+
+    A lock serializes writes and reads, such that readers never copy partly written or
+    overwritten pairs. Reads copy the buffer with numpy, so the writer waits at most about a millisecond.
+    """
+    def __init__(self, size: int):
+        self._data = np.full((int(size), 2), np.nan)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, len(self._data))
+
+    def push(self, times: np.ndarray, values: np.ndarray):
+        size = len(self._data)
+        times, values = times[-size:], values[-size:]
+        with self._lock:
+            index = (self._count + np.arange(len(values))) % size
+            self._data[index, 0] = times
+            self._data[index, 1] = values
+            self._count += len(values)
+
+    def between(self, start: float, stop: float = np.inf):
+        """ Return the times and values within start and stop (inclusive), in the order of pushing. """
+        size = len(self._data)
+        with self._lock:
+            count = self._count
+            n_valid = min(count, size)
+            data = self._data[(count - n_valid + np.arange(n_valid)) % size]
+        is_between = (data[:, 0] >= start) & (data[:, 0] <= stop)
+        return data[is_between, 0], data[is_between, 1]
+
+
 class S470(object):
     """Gamma Scientific flexOptometer S470, S480, S490
     You need to connect a S470 to the serial (RS232) port.
@@ -26,19 +64,42 @@ class S470(object):
     usage::
         phot = S470(port)
         lum = phot.getLum()
+    or, continuously sampling in the background::
+        phot.start_acquisition()
+        start = time.perf_counter()
+        times, lums = phot.wait_readings(start, n_measures=100)
+        phot.stop_acquisition()
     :parameters:
         port: string
             the serial port to connect with the photometer.
             Typically COM1 on Windows and /dev/ttyUSB0 or /dev/ttyS470 on Linux. 
         n_repeat: int
             number of repeated measures to average for getLum 
+        timeout: float
+            seconds to wait for serial responses.
+        handshake_timeout: float
+            seconds to wait for the responses while connecting (default: timeout),
+            short timeouts speed up the search for photometers on several ports.
+        channel_range: int
+            DC range of the channel, range n measures up to 10^n.
+        sample_rate: int
+            readings per second, up to 250.
+        auto_ranging: bool
+            select the channel range by a short probe measurement, see .auto_range().
     """
     longName = "Gamma Scientific S470/S480/S490"
     driverFor = ['s470', 's480', 's490']  # psychopy expects lower-case
+    RANGES = tuple(range(7))  # DC ranges 10^0 to 10^6
+    MAX_SAMPLE_RATE = 250
 
-    def __init__(self, port: str, n_repeat: int = 250, baudrate=38400):
+    def __init__(self, port: str, n_repeat: int = 250, baudrate=38400, timeout=2., handshake_timeout=None,
+                 channel_range=6, sample_rate=MAX_SAMPLE_RATE, auto_ranging=False):
         super(S470, self).__init__()
         self.n_repeat = n_repeat
+        self.auto_ranging = auto_ranging
+        self.range_probe_measures = 5
+        self.range_headroom = 0.8  # fraction of the range's full scale that probes may use
+        self._range_by_band = {}
         
         if not serial:
             raise ImportError("The module serial is needed to connect to "
@@ -54,15 +115,22 @@ class S470(object):
             self.portNumber = None
         self.lastLum = None
         self.type = 'S470'
+        self._acquisition = None
+        self._acquisition_error = None
+        self._buffer = None
         self.terminator = '\r\n'
 
+        # invalid arguments are no connection problems, raise before opening the port
+        self._check_channel_range(channel_range)
+        self._check_sample_rate(sample_rate)
+
         # try to open the port
         _linux = sys.platform.startswith('linux')
         if sys.platform in ('darwin', 'win32') or _linux:
             try:
                 self.com = serial.Serial(self.portString, 
                                          baudrate=baudrate,
-                                         timeout=2) # seconds
+                                         timeout=handshake_timeout or timeout) # seconds
             except Exception:
                 msg = f"Couldn't connect to port {self.portString}. Is it being used by another program?"
                 raise IOError(msg)
@@ -71,47 +139,168 @@ class S470(object):
             raise IOError(msg)
         self.OK = True  # required by psychopy
         
-        self.channel_range = self.write_line('RNG 6')  # channel's DC range 10^6
-        self.readings_per_second = self.write_line('SRT 250')  # 250 readings per second (max)
+        try:
+            self.channel_range = channel_range
+            self.sample_rate = sample_rate
+        except (IOError, ValueError, AssertionError):  # e.g. undecodable or unexpected responses
+            self.com.close()
+            raise IOError(f"No S470 photometer responding at port {self.portString}.")
+        self.com.timeout = timeout
 
     def write_line(self, txt):
         """ Write a command and return the response.
         
         Device always responds <CR> <LF> value <CR> <LF>
         """
-        self.com.write(f'{txt}{self.terminator}'.encode())
-        
-        first_line = self.read_line()
-        assert first_line == "", f"Expect empty line message, got '{first_line.encode()}'."
-        return self.read_line()
+        with PROFILER.span('s470 command', 's470', command=txt):
+            command = f'{txt}{self.terminator}'.encode()
+            self.com.write(command)
+            PROFILER.count('serial bytes written', len(command), 's470')
+
+            first_line = self.read_line()
+            assert first_line == "", f"Expect empty line message, got '{first_line.encode()}'."
+            return self.read_line()
         
     def read_line(self) -> str:
         """ Read a line from the serial port and return without the terminator.
         """
         line = self.com.read_until(expected=self.terminator.encode()).decode()
+        PROFILER.count('serial bytes read', len(line), 's470')
         if line.endswith(self.terminator):
             return line[:-len(self.terminator)]
         else:
             raise IOError("Expect read_line receiving message ending with "
-                          f"{self.terminator.encode('string_escape')}, got {line}")
+                          f"{self.terminator!r}, got {line!r}")
 
-    def measure(self, n_measures: int = 1) -> list:
-        """ Measure luminances from the serial port."""
+    @property
+    def channel_range(self) -> int:
+        return self._channel_range
+
+    def _check_channel_range(self, value: int):
+        if value not in self.RANGES:
+            raise ValueError(f"Expect channel range in {self.RANGES}, got {value}.")
+
+    @channel_range.setter
+    def channel_range(self, value: int):
+        self._check_channel_range(value)
+        if self.acquiring:
+            raise RuntimeError("Cannot change the range during continuous acquisition.")
+        self.write_line(f'RNG {value:d}')
+        self._channel_range = value
+
+    @property
+    def sample_rate(self) -> int:
+        return self._sample_rate
+
+    def _check_sample_rate(self, value: int):
+        if not 1 <= value <= self.MAX_SAMPLE_RATE:
+            raise ValueError(f"Expect sample rate between 1 and {self.MAX_SAMPLE_RATE}, got {value}.")
+
+    @sample_rate.setter
+    def sample_rate(self, value: int):
+        self._check_sample_rate(value)
+        if self.acquiring:
+            raise RuntimeError("Cannot change the sample rate during continuous acquisition.")
+        self.write_line(f'SRT {value:d}')
+        self._sample_rate = value
+
+    @property
+    def readings_per_second(self) -> int:
+        return self._sample_rate
+
+    def auto_range(self, band=None) -> int:
+        """ Select the most sensitive channel range for the current luminance.
+
+        A few readings (.range_probe_measures) in the current range or, if they exceed it, in the 
+        highest range determine the smallest range that covers the luminance with some headroom.
+        The range is cached by band, e.g. a band of grey levels, such that later measurements
+        of the band switch the range without probing. Reset the cache with .reset_range_cache()
+        if the luminances of the bands change, e.g. with a new CLUT or backlight.
+        """
+        if band is not None and band in self._range_by_band:
+            if self._range_by_band[band] != self.channel_range:
+                self.channel_range = self._range_by_band[band]
+            return self.channel_range
+
+        probe = np.abs(self.measure(self.range_probe_measures)).max()
+        if probe > self.range_headroom * 10.0**self.channel_range:
+            self.channel_range = self.RANGES[-1]
+            probe = np.abs(self.measure(self.range_probe_measures)).max()
+        best_range = next((rng for rng in self.RANGES if probe <= self.range_headroom * 10.0**rng), self.RANGES[-1])
+        if best_range != self.channel_range:
+            self.channel_range = best_range
+        if band is not None:
+            self._range_by_band[band] = best_range
+        return best_range
+
+    @property
+    def range_by_band(self) -> dict:
+        return dict(self._range_by_band)
+
+    def reset_range_cache(self):
+        """ Forget the ranges selected by auto_range, such that every band is probed again. """
+        self._range_by_band = {}
+
+    def _request_readings(self, n_measures: int):
+        """ Send the read command for n_measures readings. """
         n_measures = int(n_measures)
-        if n_measures > 1:
-            first_lum = self.write_line(f'REA {n_measures:d}')
-        elif n_measures == 1:
-            first_lum = self.write_line('REA')
-        else: # negative numbers would result in infinite measures; avoid it.
+        if n_measures < 1:  # negative numbers would result in infinite measures; avoid it.
             raise ValueError(f"Expect n_measures as positive integer, got {n_measures}.")
+        command = f'REA {n_measures:d}' if n_measures > 1 else 'REA'
+        command = f'{command}{self.terminator}'.encode()
+        self.com.write(command)
+        PROFILER.count('serial bytes written', len(command), 's470')
+        return n_measures
 
-        lums = [float(first_lum)]
-        for i in range(n_measures - 1):
-            msg = self.read_line()
-            lums.append(float(msg))
+    def stream(self, n_measures: int, chunk_size: int = 4096):
+        """ Measure luminances and yield (host time, luminances) chunks as they arrive.
+
+        The serial buffer is drained in large chunks and every chunk of complete lines
+        is parsed at once. Host time is taken from time.perf_counter() after reading the chunk.
+        If profiling, the readings are recorded as one span with the bytes and parsing time.
+        """
+        start = time.perf_counter()
+        n_measures = self._request_readings(n_measures)
+        n_bytes, parse_time = 0, 0.
+        terminator = self.terminator.encode()
+        # the device responds <CR> <LF> value <CR> <LF> value <CR> <LF> ...
+        expected_lines, n_lines = n_measures + 1, 0
+        rest = b''
+        while n_lines < expected_lines:
+            data = self.com.read(max(1, min(chunk_size, self.com.in_waiting)))
+            if not data:
+                raise IOError(f"Expect {n_measures} readings, got timeout after {max(0, n_lines - 1)}.")
+            timestamp = time.perf_counter()
+            n_bytes += len(data)
+            data = rest + data
+            complete, separator, rest = data.rpartition(terminator)
+            if not separator:  # no complete line yet
+                continue
+            n_lines += complete.count(terminator) + 1
+            if n_lines > expected_lines or (n_lines == expected_lines and rest):
+                raise IOError(f"Expect {n_measures} readings, got additional data.")
+            values = np.array(complete.split(), dtype=float)
+            parse_time += time.perf_counter() - timestamp
+            if len(values):
+                yield timestamp, values
+        PROFILER.record('s470 readings', start, time.perf_counter(), 's470',
+                        n_measures=n_measures, bytes=n_bytes, parse_seconds=parse_time)
+        PROFILER.count('serial bytes read', n_bytes, 's470')
+
+    def measure(self, n_measures: int = 1) -> np.ndarray:
+        """ Measure luminances from the serial port."""
+        if self.acquiring:
+            raise RuntimeError("Cannot measure during continuous acquisition, use .readings() or .stop_acquisition().")
+        lums = np.empty(int(n_measures))
+        n_read = 0
+        for _, values in self.stream(n_measures):
+            lums[n_read:n_read + len(values)] = values
+            n_read += len(values)
+        if n_read != len(lums):
+            raise IOError(f"Expect {len(lums)} readings, got {n_read}.")
         return lums
 
-    def getLum(self, return_std=False) -> float:
+    def getLum(self, return_std=False, return_all=False) -> float:
         """ Return the average luminance of repeated measures. 
         The number of repetitions is controlled by .n_repeat.
         The returned luminance is set to .lastLum.
@@ -121,8 +310,80 @@ class S470(object):
         self.lastLum = np.mean(lums)
         if return_std:
             return self.lastLum, np.std(lums)
+        elif return_all:
+            return self.lastLum, lums.tolist()
         else:
             return self.lastLum
 
+    @property
+    def acquiring(self) -> bool:
+        return self._acquisition is not None
+
+    def start_acquisition(self, buffer_size: int = 2**16, chunk_measures: int = None):
+        """ Sample luminances continuously in a background thread.
+
+        The thread repeatedly requests chunk_measures readings (default: a quarter second)
+        and stores them with host timestamps of time.perf_counter() in a ring buffer
+        of buffer_size readings. Use .readings() or .wait_readings() to access them.
+        """
+        if self.acquiring:
+            raise RuntimeError("Acquisition is already running.")
+        sample_rate = float(self.sample_rate)
+        if chunk_measures is None:
+            chunk_measures = max(1, int(sample_rate / 4))
+        self._buffer = _RingBuffer(buffer_size)
+        self._acquisition_error = None
+        stop_event = threading.Event()
+        thread = threading.Thread(target=self._acquire, args=(stop_event, chunk_measures, sample_rate),
+                                  name='S470 acquisition', daemon=True)
+        self._acquisition = (thread, stop_event)
+        thread.start()
+
+    def _acquire(self, stop_event, chunk_measures, sample_rate):
+        try:
+            while not stop_event.is_set():
+                for timestamp, values in self.stream(chunk_measures):
+                    # the chunk's last value arrived at timestamp, earlier values one sample period apart
+                    times = timestamp - np.arange(len(values) - 1, -1, -1) / sample_rate
+                    self._buffer.push(times, values)
+        except Exception as error:  # e.g. IOError or a ValueError of garbled readings, raised by wait_readings
+            self._acquisition_error = error
+
+    def stop_acquisition(self):
+        """ Stop the background acquisition after the current chunk of readings. """
+        if not self.acquiring:
+            return
+        thread, stop_event = self._acquisition
+        stop_event.set()
+        thread.join()
+        self._acquisition = None
+
+    def readings(self, start: float, stop: float = np.inf):
+        """ Return (times, luminances) of the continuous acquisition between two perf_counter times. """
+        if self._buffer is None:
+            raise RuntimeError("No acquisition data, call .start_acquisition() first.")
+        return self._buffer.between(start, stop)
+
+    def wait_readings(self, start: float, n_measures: int, timeout: float = None):
+        """ Wait for and return the first n_measures (times, luminances) after start.
+
+        The default timeout is the duration of the readings at the sample rate plus the serial timeout.
+        """
+        now = time.perf_counter()
+        if timeout is None:
+            timeout = max(0., start - now) + n_measures / self.sample_rate + self.com.timeout
+        wait_until = now + timeout
+        while True:
+            times, lums = self.readings(start)
+            if len(lums) >= n_measures:
+                return times[:n_measures], lums[:n_measures]
+            if self._acquisition_error is not None:
+                raise IOError("Continuous acquisition stopped.") from self._acquisition_error
+            if not self.acquiring or time.perf_counter() > wait_until:
+                raise IOError(f"Expect {n_measures} readings since {start}, got {len(lums)}.")
+            time.sleep(0.01)
+
     def __del__(self):
-        self.com.close()
+        self.stop_acquisition()
+        if hasattr(self, 'com'):
+            self.com.close()
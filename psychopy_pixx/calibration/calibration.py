@@ -1,15 +1,25 @@
 import time 
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import click
-import matplotlib.pyplot as plt
+import inspect
+import json
 import csv
 import os
 from datetime import datetime
-import pandas as pd
 
 from psychopy_pixx.calibration.photometer import findPhotometer
+from psychopy_pixx.calibration._campaign import (config_key, config_name, expand_grid, load_checkpoint,
+                                                 needs_warmup, plan_campaign, save_checkpoint)
+from psychopy_pixx.calibration._drift import DriftCorrector
+from psychopy_pixx.calibration._measurement_files import load_luminance_file, load_lut_file, load_raw_file
+from psychopy_pixx._sidecar import copy_calib, load_calib_entry, store_calib_entries, store_calib_entry
+from psychopy_pixx.calibration.report import report_cli, start_report
+from psychopy_pixx.calibration._ordering import ORDERS, linear_settle, order_report, plan_order
+from psychopy_pixx._profiling import PROFILER
 from psychopy_pixx.devices import ViewPixx
+from psychopy_pixx.devices.viewpixx import CLUT_METHODS, invert_luminances, save_clut
 
 def measure_luminances(
     levels,
@@ -24,7 +34,14 @@ def measure_luminances(
     n_measures=50,
     timeestimation_output=False,
     all_measurements=False,
-    savefiles='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5'):
+    savefiles='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5',
+    settle=0.5,
+    range_bands=16,
+    order=None,
+    stride=None,
+    drift=None,
+    positions=None,
+    print_order=False):
     """Automatically measures a series of gun values and measures
     the luminance with a photometer.
     
@@ -32,10 +49,9 @@ def measure_luminances(
     
     :Parameters:
         photometer : a photometer object
-            e.g. a :class:`~        print(np.mean(lums), np.median(lums), lums)
-psychopy.hardware.pr.PR65` or
+            e.g. a :class:`~psychopy.hardware.pr.PR65` or
             :class:`~psychopy.hardware.minolta.LS100` from
-            hardware.findPhotometer()
+            hardware.findPhotometer(), or a list of photometers with positions.
         levels : 
             array of values to test
         gamma : (default=1.0) the gamma value at which to test
@@ -49,9 +65,39 @@ psychopy.hardware.pr.PR65` or
             screen (use this to see that the display is performing as
             expected).
         n_measures : Averaging this number of measurements per level, only for S470 photometer.
+        order : Measurement order of the levels, see `plan_order` (default: 'random' if random, 
+            'inverted' if inverted, else 'sequential'). Strided orders bound the jumps
+            between consecutive levels to stride levels.
+        settle : Seconds to wait after showing a level before the measurement, or a function
+            of the grey level jump (see `linear_settle`).
+            If the S470 photometer acquires continuously (see `S470.start_acquisition`), the
+            first n_measures readings after settling are used instead of requesting new ones.
+        range_bands : Number of grey level bands that share the channel range of an
+            auto-ranging S470 photometer (see `S470.auto_range`). The ranges are selected anew in every call.
+        drift : a :class:`DriftCorrector` to re-measure its reference levels at its interval,
+            the returned luminances are corrected for the drift. The single measurements
+            (all_measurements) are stored uncorrected, their drift gains in `allMeasurments*_drift.csv`.
+        positions : list of patch centres (x, y) in norm units, one per photometer in the photometer list.
+            Every photometer points at its own patch of size stimSize, all patches show the same level,
+            and the photometers are read concurrently (one thread per device) after each flip.
+        print_order : print the settle time and drift confounding of the order, e.g. for the main sweeps.
+
+    :Returns:
+        luminances of shape (4, levels) or, with positions, (positions, 4, levels).
+        An empty array if the user quits.
     """
     from psychopy import event, visual, core
 
+    if positions is None:
+        photometers = [photometer]
+    else:
+        photometers = list(photometer)
+        if len(photometers) != len(positions):
+            raise ValueError(f"Expects one position per photometer, got {len(positions)} positions "
+                             f"for {len(photometers)} photometers.")
+        if all_measurements:
+            raise ValueError("Expects a single photometer to store all measurements.")
+
     if gamma == 1:
         initRGB = 0.5 ** (1 / 2.0) * 2 - 1
     else:
@@ -66,8 +112,12 @@ psychopy.hardware.pr.PR65` or
     noise = np.random.rand(512, 512).round() * 2 - 1
     backPatch = visual.PatchStim(window, tex=noise, size=2, units='norm', 
                                  sf=[window.clientSize[0] / 512.0, window.clientSize[1] / 512.0])
-    testPatch = visual.PatchStim(window, tex='sqr', size=stimSize,
-                                 color=initRGB, units='norm')
+    if positions is None:
+        testPatches = [visual.PatchStim(window, tex='sqr', size=stimSize,
+                                        color=initRGB, units='norm')]
+    else:
+        testPatches = [visual.PatchStim(window, tex=None, size=stimSize, pos=pos, units='norm')
+                       for pos in positions]
     
     date_time = datetime.now().strftime("%Y-%m-%d_%H-%M") # save date and time for file distinction
 
@@ -76,29 +126,36 @@ psychopy.hardware.pr.PR65` or
     else: 
         message.setText('Spacebar for next patch')
 
-    # LS100 likes to take at least one bright measurement
-    if photometer.type == 'LS100':
-        junk = photometer.getLum()
-    if photometer.type == 'S470' and n_measures is not None:
-        photometer.n_repeat = n_measures
+    for phot in photometers:
+        # LS100 likes to take at least one bright measurement
+        if phot.type == 'LS100':
+            junk = phot.getLum()
+        if phot.type == 'S470' and n_measures is not None:
+            phot.n_repeat = n_measures
+        if phot.type == 'S470':
+            # the luminance of the bands changes between sweeps, e.g. with the CLUT or backlight
+            phot.reset_range_cache()
 
     if random and inverted:
         print(f'ERROR: you can not set both random={random} and inverted={inverted}!')
         return 1
-    if random and not inverted:
-        shuffled_index = np.random.permutation(len(levels))
-        toTest = levels[shuffled_index]
-    elif not random and inverted:
-        toTest = levels[::-1] 
-    else:
-        toTest = levels
+    if order is None:
+        order = 'random' if random else 'inverted' if inverted else 'sequential'
+    order_index = plan_order(len(levels), order, stride)
+    toTest = levels[order_index]
+    if not callable(settle):
+        settle = linear_settle(settle)
+    if print_order:
+        report = order_report(levels, order_index, settle)
+        print(f"Measure {len(levels)} levels in {order} order: {report['settle_per_level']:.2f}s settle time per level, "
+              f"max jump {report['max_jump']:.3f}, drift confounding {report['drift_confounding']:.2f}.")
 
     if allGuns:
         guns = [0, 1, 2, 3]  # gun=0 is the white luminance measure
     else:
         guns = [0]
-    # this will hold the measured luminance values
-    lumsList = np.zeros((4, len(toTest)))
+    # this will hold the measured luminance values of every photometer
+    lumsCube = np.zeros((len(photometers), 4, len(toTest)))
 
     # for (approx) ending time calculation timestamps and counter
     counter = 0
@@ -107,6 +164,7 @@ psychopy.hardware.pr.PR65` or
     # create list for logging all measurments
     if all_measurements:
         allLums_data = []
+        allLums_times = []
 
     # prepare logging
     if all_measurements and savefiles!='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5':
@@ -119,147 +177,206 @@ psychopy.hardware.pr.PR65` or
             header.append(f'measurement_{i:03}')
         writer.writerow(header)
 
-    # for each gun, for each value run test
-    for gun in guns:
-        for valN, DACval in enumerate(toTest):
-            # counter for timeestimation
-            counter = valN + 1
-
-            lum = (DACval * 2) - 1  # from range 0:1 into -1:1
-            # only do luminanc=-1 once
-            if lum == -1 and gun > 0:
-                continue
-            # set the patch color
-            if gun > 0:
-                rgb = [-1, -1, -1]
-                rgb[gun - 1] = lum
-            else:
-                rgb = [lum, lum, lum]
-
-            backPatch.draw()
+    def show_level(rgb):
+        backPatch.draw()
+        for testPatch in testPatches:
             testPatch.setColor(rgb)
             testPatch.draw()
-            message.draw()
-            window.flip()
+        message.draw()
+        window.flip()
 
+    def wait_settle(flip_time, settle_time):
+        # continuously acquiring photometers select the readings after settling instead
+        if not all(getattr(phot, 'acquiring', False) for phot in photometers):
             # allowing the screen to settle (no good reason!)
-            time.sleep(0.5)
+            with PROFILER.span('settle'):
+                time.sleep(max(0., flip_time + settle_time - time.perf_counter()))
 
-            # take measurement
-            if autoMode == 'auto':
-                if all_measurements:
-                    actualLum, lums = photometer.getLum(return_all=True)
-                    allLums_data.append([DACval] + lums)
-                else:
-                    actualLum = photometer.getLum()
-                print(f"\t{valN+1:4d}/{len(toTest)} At DAC value {DACval:5.3f}\t: {actualLum:6.2f}cd/m^2")
-                if timeestimation_output and counter%10 == 0:
-                    current = time.time()-start
-                    duration = current/counter
-                    estimated_end = time.time() + (duration * (len(toTest)-counter))
-                    time_format_current = time.strftime('%H:%M:%S', time.gmtime(current))
-                    time_format_duration = time.strftime('%H:%M:%S', time.gmtime(duration))
-                    time_format_end = time.strftime('%d.%m.%y %H:%M', time.localtime(estimated_end))
-                    print('')
-                    print(f'  Time-Estimation:')
-                    print(f'   We needed {time_format_current} unitl now ({counter} levels).')
-                    print(f'   This results into {time_format_duration} per level.') 
-                    print(f'   Estimated ending time: {time_format_end}')
-                    print('')
-                lumsList[gun, valN] = actualLum
-                # check for quit request
-                for thisKey in event.getKeys():
-                    if thisKey in ('q', 'Q', 'escape'):
+    def read_photometers(level, flip_time, settle_time):
+        """ Return (luminance, single measurements or None) of every photometer. """
+        def read(phot):
+            if getattr(phot, 'auto_ranging', False):
+                phot.auto_range(band=int(level * range_bands))
+            if getattr(phot, 'acquiring', False):
+                _, lums = phot.wait_readings(flip_time + settle_time, phot.n_repeat)
+                return np.mean(lums), lums.tolist()
+            elif all_measurements:
+                return phot.getLum(return_all=True)
+            return phot.getLum(), None
+
+        if pool is None:
+            return [read(photometers[0])]
+        return list(pool.map(read, photometers))
+
+    def measure_references():
+        """ Measure the drift references, return False if the user quits. """
+        refLums = []
+        for refLevel in drift.reference_levels:
+            show_level([refLevel * 2 - 1] * 3)
+            flip_time = time.perf_counter()
+            wait_settle(flip_time, settle(1.))
+            readings = read_photometers(refLevel, flip_time, settle(1.))
+            refLums.extend(lum for lum, _ in readings)
+        current_drift = drift.add_reference(time.perf_counter(), refLums)
+        print(f"\tReference luminances {np.round(refLums, 2)} cd/m^2, drift {100 * current_drift:+.2f}%")
+        # warn (and pause) once when the drift crosses the threshold, not at every later reference
+        if drift.crossed:
+            print(f"WARNING: Luminance drifted {100 * current_drift:+.2f}%, more than {100 * drift.threshold:.2f}%.")
+            if drift.pause:
+                print("Press space to continue or Q to quit.")
+                keys = event.waitKeys(keyList=['space', 'q', 'Q', 'escape'])
+                return 'space' in keys
+        return True
+
+    # one reader thread per photometer for the whole sweep
+    pool = ThreadPoolExecutor(max_workers=len(photometers)) if len(photometers) > 1 else None
+    try:
+        # time of every measurement for the drift correction
+        levelTimes = np.zeros((4, len(toTest)))
+
+        # for each gun, for each value run test
+        for gun in guns:
+            for valN, DACval in enumerate(toTest):
+                # counter for timeestimation
+                counter = valN + 1
+
+                if drift is not None and autoMode == 'auto' and valN % drift.interval == 0:
+                    with PROFILER.span('drift references'):
+                        references_ok = measure_references()
+                    if not references_ok:
                         window.close()
                         return np.array([])
 
-            elif autoMode == 'semi':
-                print(f"\t{valN+1:4d}/{len(toTest)} At DAC value {DACval:5.3f}")
+                lum = (DACval * 2) - 1  # from range 0:1 into -1:1
+                # only do luminanc=-1 once
+                if lum == -1 and gun > 0:
+                    continue
+                # set the patch color
+                if gun > 0:
+                    rgb = [-1, -1, -1]
+                    rgb[gun - 1] = lum
+                else:
+                    rgb = [lum, lum, lum]
 
-                done = False
-                while not done:
+                with PROFILER.span('flip', gun=gun, level=float(DACval)):
+                    show_level(rgb)
+                flip_time = time.perf_counter()
+                settle_time = settle(abs(DACval - toTest[valN - 1]) if valN > 0 else 0.)
+                wait_settle(flip_time, settle_time)
+
+                # take measurement
+                if autoMode == 'auto':
+                    with PROFILER.span('measure', gun=gun, level=float(DACval)):
+                        readings = read_photometers(DACval, flip_time, settle_time)
+                    lumsCube[:, gun, valN] = [actualLum for actualLum, _ in readings]
+                    if all_measurements:
+                        allLums_data.append([DACval] + readings[0][1])
+                    log_start = time.perf_counter()
+                    lums_str = ", ".join(f"{actualLum:6.2f}" for actualLum, _ in readings)
+                    print(f"\t{valN+1:4d}/{len(toTest)} At DAC value {DACval:5.3f}\t: {lums_str}cd/m^2")
+                    if timeestimation_output and counter%10 == 0:
+                        current = time.time()-start
+                        duration = current/counter
+                        estimated_end = time.time() + (duration * (len(toTest)-counter))
+                        time_format_current = time.strftime('%H:%M:%S', time.gmtime(current))
+                        time_format_duration = time.strftime('%H:%M:%S', time.gmtime(duration))
+                        time_format_end = time.strftime('%d.%m.%y %H:%M', time.localtime(estimated_end))
+                        print('')
+                        print(f'  Time-Estimation:')
+                        print(f'   We needed {time_format_current} unitl now ({counter} levels).')
+                        print(f'   This results into {time_format_duration} per level.') 
+                        print(f'   Estimated ending time: {time_format_end}')
+                        print('')
+                    levelTimes[gun, valN] = time.perf_counter()
+                    if all_measurements:
+                        allLums_times.append(levelTimes[gun, valN])
                     # check for quit request
                     for thisKey in event.getKeys():
                         if thisKey in ('q', 'Q', 'escape'):
+                            window.close()
                             return np.array([])
-                        elif thisKey in (' ', 'space'):
-                            done = True
 
+                elif autoMode == 'semi':
+                    print(f"\t{valN+1:4d}/{len(toTest)} At DAC value {DACval:5.3f}")
+
+                    done = False
+                    while not done:
+                        # check for quit request
+                        for thisKey in event.getKeys():
+                            if thisKey in ('q', 'Q', 'escape'):
+                                return np.array([])
+                            elif thisKey in (' ', 'space'):
+                                done = True
+
+                if all_measurements and savefiles!='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5':
+                    writer.writerow(allLums_data[-1])
+                if autoMode == 'auto':
+                    PROFILER.record('log', log_start, time.perf_counter())
+
+        if drift is not None and autoMode == 'auto':
+            if not measure_references():
+                window.close()
+                return np.array([])
+            lumsCube = drift.correct(levelTimes, lumsCube)
             if all_measurements and savefiles!='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5':
-                writer.writerow(allLums_data[-1])
+                # the single measurements are stored uncorrected, store their drift gains next to them
+                with open(f"{savefiles}/allMeasurments{date_time}_drift.csv", 'w') as drift_file:
+                    drift_writer = csv.writer(drift_file)
+                    drift_writer.writerow(['levels', 'gain'])
+                    drift_writer.writerows(zip([row[0] for row in allLums_data], drift.gain(allLums_times)))
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
-    if random:  # revert shuffling
-        lumsList = lumsList[:, shuffled_index.argsort()]
-    return lumsList
+    duration = time.time() - start
+    print(f"Measured {len(toTest)} levels in {duration:.0f}s, {duration / max(1, len(toTest) * len(guns)):.2f}s per level.")
+    # revert ordering
+    lumsCube = lumsCube[..., order_index.argsort()]
+    return lumsCube[0] if positions is None else lumsCube
 
 
-@click.command()
-@click.option('-l', '--levels', required=True, help='Number of grey levels to measure', type=int)
-@click.option('-m', '--monitor', required=True, help='monitor name from psychopy monitor center')
-@click.option('-s', '--screen', required=True, help='screen to show window, typically 0 is internal and 1 external', type=int)
-@click.option('-p', '--photometer', required=True, help='photometer name supported by psychopy')
-@click.option('--port', help='Port of the photometer', default=None)
-@click.option('--random', help='Measure in randomized order.', is_flag=True)
-@click.option('--inverted', help='Measure in inverted order.', is_flag=True)
-@click.option('--levelspost', help='Number of measurements after linearization', default=100)
-@click.option('--restests', help='Number of test points for luminance resolution', default=5)
-@click.option('--plot', is_flag=False, flag_value='.', help='Create, show and save plots.', default='no_plots_8e26a619-e688-4dcf-b010-7bd5fca459d8')
-@click.option('--gamma', help='Gamma with which the monitor is to be corrected. (default: 1.0 (linearization))', type=float, default=1.0)
-@click.option('--measures', help='Number of measurements to average per color level (only S470 photometer).', type=int, default=250)
-@click.option('--savefiles', is_flag=False, flag_value='.', help='save measurements as files into the given directory', default='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5')
-@click.option('--all_measurements', help='with this option, all measurments from the photometer are saved', is_flag=True)
-@click.option('--script', help='prevents routine from opening plots and user prompts to be able to use the tool more automated', is_flag=True)
-@click.option('--timeestimation_output', help='prints a time estimation of how much longer the calibration will take', is_flag=True)
-@click.option('--no_scanning', help='with this option you swith from "scanning backlight" to "normal backlight"', is_flag=True)
-@click.option('--bg_intensity', help='intensity of the backlight', default=255)
-@click.option('--lut', help='look up table (lut) the script should use for correction/calibration', is_flag=False, flag_value='.', default='no_lut_f99fc889-c6e3-4588-ad44-4f8a9554f7b5')
-def calibration_routine_cli(levels, monitor, screen, photometer, port, random, inverted, levelspost, restests, plot, measures, gamma=1.0, 
-savefiles='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5', all_measurements=False, script=False, timeestimation_output=False, no_scanning=False, bg_intensity=255, lut='no_lut_f99fc889-c6e3-4588-ad44-4f8a9554f7b5'):
-    
-    from psychopy import monitors, visual  # lazy import
+def wait_warmup(window, photometer, max_wait=1800., interval=60., tolerance=0.002, n_measures=50):
+    """ Show white and measure it every interval seconds until the luminance is stable.
 
-    # check if paths exist
-    # Note: I have to use the string with the uuid as control, so if the option is not set, I dont log/plot
-    if savefiles!='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5':
-        if not os.path.isdir(savefiles):
-            print(f'ERROR: "{savefiles}" is no valide directory')
-            return 1
-    if plot!='no_plots_8e26a619-e688-4dcf-b010-7bd5fca459d8':
-        if not os.path.isdir(savefiles):
-            print(f'ERROR: "{plot}" is no valide directory')
-            return 1
+    The luminance is stable if it changed less than the relative tolerance since the last
+    measurement. Returns the waiting time in seconds, at most about max_wait.
+    """
+    start = time.perf_counter()
+    previous = None
+    while True:
+        lum = measure_luminances(np.array([1.]), window=window, photometer=photometer,
+                                 allGuns=False, n_measures=n_measures, settle=0.5)[0][0]
+        waited = time.perf_counter() - start
+        if previous is not None:
+            change = abs(lum - previous) / max(previous, 1e-9)
+            print(f"Warm-up after {waited / 60:.1f}min: {lum:.2f} cd/m^2, change {100 * change:.3f}%")
+            if change < tolerance:
+                return waited
+        if waited + interval > max_wait:
+            print(f"WARNING: Luminance not stable after {waited / 60:.1f}min, continue anyway.")
+            return waited
+        previous = lum
+        time.sleep(interval)
 
-    print(f"Setup monitor {monitor}, search for photometer {photometer} ...")
-    monitor = monitors.Monitor(monitor)
-    photometer = findPhotometer(device=photometer, ports=port)
-    if photometer is None:
-        raise ValueError('Photometer not found. You might specify (another) port or name.')
-    
-    # monitor setup
-    monitor_size = monitor.getSizePix()
-    if monitor_size is None:
-        raise ValueError("No monitor size defined. Please setup monitor in psychopy's monitor center.")
-    window = visual.Window(
-        fullscr=0, size=monitor_size, gamma=1, units='norm', useFBO=True,
-        monitor=monitor, allowGUI=True, winType='pyglet', screen=screen)
-    vpixx = ViewPixx(window)
-    vpixx.scanning_backlight = not no_scanning
-    vpixx.backlight = bg_intensity
-    print(f'backlight intensity is: {vpixx.backlight}')
-    
-    if not script:
-        monitor_state = {
-            'Width': monitor.getWidth(), 
-            'Distance': monitor.getDistance(),
-            'SizePix': monitor_size,
-            **vpixx.register}
-        register_str = "\n".join(f"\t{key}: {val}" for key, val in monitor_state.items())
-        click.confirm(f'This is your monitor state. Ok?\n{register_str}\n' , abort=True)
 
+def run_calibration(monitor, window, vpixx, photometer, levels, levelspost=100, restests=5, gamma=1.0, measures=250,
+                    random=False, inverted=False, order=None, stride=None, settle=0.5, settle_per_jump=0.,
+                    drift_interval=0, drift_levels=(1.0,), drift_threshold=0.02, script=False,
+                    savefiles='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5', all_measurements=False,
+                    timeestimation_output=False, lut='no_lut_f99fc889-c6e3-4588-ad44-4f8a9554f7b5',
+                    continuous=False, inline=False, name=None):
+    """ Measure, linearize, validate and save a new calibration with open window, ViewPixx and photometer.
+
+    The options are those of `pixxcalibrate measure`, which opens the devices around this function.
+    The calibration is saved as name (default: date and time), the saved name is returned.
+    """
+    monitor_size = monitor.getSizePix()
+    settle_model = linear_settle(settle, settle_per_jump)
     measure_kwargs = dict(window=window, photometer=photometer, random=random, inverted=inverted,
-                          allGuns=False, n_measures=measures)
+                          allGuns=False, n_measures=measures, settle=settle_model)
     print(f"Measure a few black and white screens ...")
-    blackwhiteLums = measure_luminances(np.array([1, 1, 1 , 0, 0, 0]), **measure_kwargs)[0]
+    with PROFILER.span('phase black/white'):
+        blackwhiteLums = measure_luminances(np.array([1, 1, 1 , 0, 0, 0]), **measure_kwargs)[0]
     minLum, maxLum = blackwhiteLums[3], blackwhiteLums[0]
     if (blackwhiteLums[:3].max() - blackwhiteLums[:3].min() > 0.1
         or blackwhiteLums[3:].max() - blackwhiteLums[3:].min() > 0.1):
@@ -276,9 +393,19 @@ savefiles='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5', all_measurements=F
     # measurements
     print(f"Measure luminance series ...")
     levelsPre = np.linspace(0, 1, levels, endpoint=True)
+    # one drift corrector per sweep: the CLUT changes the reference luminances between the sweeps
+    drifts = {}
+
+    def sweep_drift(sweep):
+        if drift_interval > 0:
+            drifts[sweep] = DriftCorrector(reference_levels=drift_levels,
+                                           interval=drift_interval, threshold=drift_threshold, pause=not script)
+        return drifts.get(sweep)
     measure_kwargs_realMeasurment = dict(window=window, photometer=photometer, random=random, inverted=inverted,
-                          allGuns=False, n_measures=measures, timeestimation_output=timeestimation_output, all_measurements=all_measurements, savefiles=savefiles)
-    lumsPre = measure_luminances(levelsPre, **measure_kwargs_realMeasurment)
+                          allGuns=False, n_measures=measures, timeestimation_output=timeestimation_output, all_measurements=all_measurements, savefiles=savefiles,
+                          settle=settle_model, order=order, stride=stride, print_order=True)
+    with PROFILER.span('phase pre', levels=len(levelsPre)):
+        lumsPre = measure_luminances(levelsPre, drift=sweep_drift('Pre'), **measure_kwargs_realMeasurment)
     if savefiles!='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5':
         data = np.vstack((100*levelsPre, lumsPre)).T   # percent for better accuracy, all 4 post guns
         date_time = datetime.now().strftime("%Y-%m-%d_%H-%M")        # save date and time for file distinction
@@ -287,15 +414,10 @@ savefiles='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5', all_measurements=F
 
     #try to set pretrained lut
     if lut != 'no_lut_f99fc889-c6e3-4588-ad44-4f8a9554f7b5':
-        lut = pd.read_csv(lut)
-        lut = lut.sort_values(by='levels')
-        print(lut)
-        levelsPre = lut['levels'].values
-        print(levelsPre)
-        lumsPre = np.array([lut['prediciton'].values, lut['prediciton'].values, lut['prediciton'].values, lut['prediciton'].values])
+        levelsPre, lumsPre = load_lut_file(lut)
     
     print("Create new monitor calibration.")
-    monitor.newCalib(width=monitor.getWidth(), distance=monitor.getDistance())
+    monitor.newCalib(calibName=name, width=monitor.getWidth(), distance=monitor.getDistance())
     monitor.setSizePix(monitor_size)
     monitor.setLineariseMethod(3)  # interpolation
     monitor.setLumsPre(lumsPre)
@@ -310,15 +432,27 @@ savefiles='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5', all_measurements=F
         'type': photometer.type,
         'repeat_measures': measures,
         'random_measures': random,
+        'order': order or ('random' if random else 'inverted' if inverted else 'sequential'),
+        'settle': settle,
+        'settle_per_jump': settle_per_jump,
+        'continuous_measures': continuous,
     }
+    if photometer.type == 'S470':
+        monitor.currentCalib['photometer'].update({
+            'sample_rate': photometer.sample_rate,
+            'channel_range': photometer.channel_range,
+            'range_by_band': photometer.range_by_band,
+        })
     
     print(f'Correct luminance (gamma={gamma}) ...')
-    vpixx.correct_luminance(gamma)
+    with PROFILER.span('phase correct luminance'):
+        vpixx.correct_luminance(gamma)
     
     if levelspost > 0:
         print(f"Measure luminances again for validation ...")
         levelsPost = np.linspace(0, 1, levelspost, endpoint=True)
-        lumsPost = measure_luminances(levelsPost, **measure_kwargs_realMeasurment)
+        with PROFILER.span('phase post', levels=len(levelsPost)):
+            lumsPost = measure_luminances(levelsPost, drift=sweep_drift('Post'), **measure_kwargs_realMeasurment)
         monitor.setLumsPost(lumsPost)
         monitor.setLevelsPost(levelsPost)
 
@@ -327,53 +461,442 @@ savefiles='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5', all_measurements=F
         reslevels = np.linspace(0, 1, restests, endpoint=False)
         resoffset = np.r_[np.inf, np.arange(14, 6 - 1, -1).astype(float)]
         reslevels = reslevels.reshape(-1, 1) + 2**-resoffset.reshape(1, -1)
-        reslums = measure_luminances(reslevels.ravel(), **measure_kwargs_realMeasurment)
+        with PROFILER.span('phase resolution', levels=reslevels.size):
+            reslums = measure_luminances(reslevels.ravel(), drift=sweep_drift('Res'), **measure_kwargs_realMeasurment)
         reslums = reslums.reshape(4, reslevels.shape[0], reslevels.shape[1]).transpose(1, 0, 2)
         monitor.currentCalib['lumsRes'] = reslums
         monitor.currentCalib['levelsRes'] = reslevels
         monitor.currentCalib['offsetRes'] = resoffset 
         
+    for sweep, drift in drifts.items():
+        monitor.currentCalib[f'drift{sweep}'] = drift.as_dict()
+    if not inline:
+        store_calib_entries(monitor)
     print("Save new monitor calibration ...")
-    monitor.save()
-    window.close()
+    with PROFILER.span('phase save'):
+        monitor.save()
     if savefiles!='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5' and levelspost > 0:
         data = np.vstack((100*levelsPost, lumsPost)).T    # percent for better accuracy, all 4 post guns
         date_time = datetime.now().strftime("%Y-%m-%d_%H-%M")        # save date and time for file distinction
         data_file = f"{savefiles}/luminancePost_{date_time}.csv"
         np.savetxt(data_file, data, fmt="%.2f", delimiter=",", header='levels,luminance_gun1,luminance_gun2,luminance_gun3,luminance_gun4') # luminances in cd/m2"
+    return monitor.currentCalibName
+
+
+class _DefaultCommandGroup(click.Group):
+    """ Click group that runs the `measure` command if no subcommand is given.
+
+    This keeps `pixxcalibrate -m ViewPixx ...` working besides subcommands like `pixxcalibrate refit ...`.
+    """
+    default_command = 'measure'
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0] not in ctx.help_option_names):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=_DefaultCommandGroup)
+def cli():
+    """ Measure and linearize the luminance of ViewPixx monitors.
+
+    Without subcommand, `measure` runs a new calibration.
+    """
+
+
+cli.add_command(report_cli)
+
+
+@cli.command('measure')
+@click.option('-l', '--levels', required=True, help='Number of grey levels to measure', type=int)
+@click.option('-m', '--monitor', required=True, help='monitor name from psychopy monitor center')
+@click.option('-s', '--screen', required=True, help='screen to show window, typically 0 is internal and 1 external', type=int)
+@click.option('-p', '--photometer', required=True, help='photometer name supported by psychopy')
+@click.option('--port', help='Port of the photometer', default=None)
+@click.option('--random', help='Measure in randomized order.', is_flag=True)
+@click.option('--inverted', help='Measure in inverted order.', is_flag=True)
+@click.option('--order', help='Measurement order of levels, overrides --random and --inverted.', type=click.Choice(ORDERS), default=None)
+@click.option('--stride', help='Maximal jump in levels of strided orders (default: sqrt(levels))', type=int, default=None)
+@click.option('--settle', help='Seconds to wait before measuring a level.', type=float, default=0.5)
+@click.option('--settle_per_jump', help='Additional settle seconds per full range (0 to 1) grey level jump.', type=float, default=0.)
+@click.option('--drift_interval', help='Re-measure reference levels every this number of levels to correct drift (default: 0, disabled)', type=int, default=0)
+@click.option('--drift_levels', help='Comma-separated reference grey levels for the drift correction', default='1.0')
+@click.option('--drift_threshold', help='Warn (and pause without --script) when the luminance drift first exceeds this fraction', type=float, default=0.02)
+@click.option('--inline', help='store measurements in the monitor file instead of binary sidecar files', is_flag=True)
+@click.option('--levelspost', help='Number of measurements after linearization', default=100)
+@click.option('--restests', help='Number of test points for luminance resolution', default=5)
+@click.option('--plot', is_flag=False, flag_value='.', help='Create, show and save plots.', default='no_plots_8e26a619-e688-4dcf-b010-7bd5fca459d8')
+@click.option('--gamma', help='Gamma with which the monitor is to be corrected. (default: 1.0 (linearization))', type=float, default=1.0)
+@click.option('--measures', help='Number of measurements to average per color level (only S470 photometer).', type=int, default=250)
+@click.option('--savefiles', is_flag=False, flag_value='.', help='save measurements as files into the given directory', default='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5')
+@click.option('--all_measurements', help='with this option, all measurments from the photometer are saved', is_flag=True)
+@click.option('--script', help='prevents routine from opening plots and user prompts to be able to use the tool more automated', is_flag=True)
+@click.option('--timeestimation_output', help='prints a time estimation of how much longer the calibration will take', is_flag=True)
+@click.option('--no_scanning', help='with this option you swith from "scanning backlight" to "normal backlight"', is_flag=True)
+@click.option('--bg_intensity', help='intensity of the backlight', default=255)
+@click.option('--lut', help='look up table (lut) the script should use for correction/calibration', is_flag=False, flag_value='.', default='no_lut_f99fc889-c6e3-4588-ad44-4f8a9554f7b5')
+@click.option('--rate', help='readings per second (only S470 photometer)', type=click.IntRange(1, 250), default=250)
+@click.option('--autorange', help='select the photometer range per grey level band (only S470 photometer)', is_flag=True)
+@click.option('--continuous', help='sample the photometer continuously in the background instead of requesting measurements per level (only S470 photometer)', is_flag=True)
+@click.option('--profile', help='save durations of calibration phases and device calls to this trace file (view in chrome://tracing or ui.perfetto.dev)', type=click.Path(dir_okay=False, writable=True), default=None)
+def calibration_routine_cli(levels, monitor, screen, photometer, port, random, inverted, levelspost, restests, plot, measures, gamma=1.0, 
+savefiles='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5', all_measurements=False, script=False, timeestimation_output=False, no_scanning=False, bg_intensity=255, lut='no_lut_f99fc889-c6e3-4588-ad44-4f8a9554f7b5',
+rate=250, autorange=False, continuous=False, order=None, stride=None, settle=0.5, settle_per_jump=0.,
+drift_interval=0, drift_levels='1.0', drift_threshold=0.02, inline=False, profile=None):
     
-    if plot != 'no_plots_8e26a619-e688-4dcf-b010-7bd5fca459d8':
-        print("Plot measurements ...")
-        plt.plot(levelsPre, lumsPre[0], label='pre')
-        if levelspost > 0:
-            plt.plot([0, 1], [lumsPre[0, 0], lumsPre[0, -1]], '--', linewidth=3, label='expected')
-            plt.plot(levelsPost, lumsPost[0], label='post')
-        plt.xlabel("Grey Level")
-        plt.ylabel("Luminance [cd/m^2]")
-        plt.legend(loc='best')
-        plt.title(f'Luminance before and after calibration ({photometer.type}, {monitor.currentCalibName})')
-        plot_file = f"{plot}/{monitor.currentCalibName}_luminance.pdf"
-        print(f"Save plot {plot_file}...")
-        plt.savefig(plot_file)   
-        if not script: 
-            plt.show()
-    
-    if restests > 0:
-        for lums, levels in zip(monitor.currentCalib['lumsRes'], monitor.currentCalib['levelsRes']):
-            lums = lums[0]
-            plt.plot(-resoffset[1:], lums[1:] - lums[0], 
-                     label=f'{levels[0]:.4f}')
-        if plot != 'no_plots_8e26a619-e688-4dcf-b010-7bd5fca459d8':
-            plt.xlabel("Log2(grey level difference)")
-            plt.ylabel("Luminance difference")
-            plt.yscale('log', base=2)
-            plt.title(f'Luminance resolution ({photometer.type}, {monitor.currentCalibName})')
-            plt.legend(loc='best', title='Grey level')
-            plot_file = f"{plot}/{monitor.currentCalibName}_resolution.pdf"
-            print(f"Save plot {plot_file}...")
-            plt.savefig(plot_file)
-            if not script:
-                plt.show()
+    from psychopy import monitors, visual  # lazy import
+
+    if profile is not None:
+        PROFILER.enable()
+        click.get_current_context().call_on_close(lambda: _save_profile(profile))
+    setup_start = time.perf_counter()
+
+    # check if paths exist
+    # Note: I have to use the string with the uuid as control, so if the option is not set, I dont log/plot
+    if savefiles!='no_savefile_f99fc889-c6e3-4588-ad44-4f8a9554f7b5':
+        if not os.path.isdir(savefiles):
+            print(f'ERROR: "{savefiles}" is no valide directory')
+            return 1
+    if plot!='no_plots_8e26a619-e688-4dcf-b010-7bd5fca459d8':
+        if not os.path.isdir(savefiles):
+            print(f'ERROR: "{plot}" is no valide directory')
+            return 1
 
+    print(f"Setup monitor {monitor}, search for photometer {photometer} ...")
+    monitor = monitors.Monitor(monitor)
+    photometer = findPhotometer(device=photometer, ports=port)
+    if photometer is None:
+        raise ValueError('Photometer not found. You might specify (another) port or name.')
+    _configure_photometer(photometer, rate, autorange, continuous)
+    if continuous:
+        photometer.start_acquisition()
+    
+    # monitor setup
+    monitor_size = monitor.getSizePix()
+    if monitor_size is None:
+        raise ValueError("No monitor size defined. Please setup monitor in psychopy's monitor center.")
+    window = visual.Window(
+        fullscr=0, size=monitor_size, gamma=1, units='norm', useFBO=True,
+        monitor=monitor, allowGUI=True, winType='pyglet', screen=screen)
+    vpixx = ViewPixx(window)
+    vpixx.scanning_backlight = not no_scanning
+    vpixx.backlight = bg_intensity
+    print(f'backlight intensity is: {vpixx.backlight}')
     
+    if not script:
+        monitor_state = {
+            'Width': monitor.getWidth(), 
+            'Distance': monitor.getDistance(),
+            'SizePix': monitor_size,
+            **vpixx.register}
+        register_str = "\n".join(f"\t{key}: {val}" for key, val in monitor_state.items())
+        click.confirm(f'This is your monitor state. Ok?\n{register_str}\n' , abort=True)
+    PROFILER.record('setup', setup_start, time.perf_counter())
+
+    calib_name = run_calibration(
+        monitor, window, vpixx, photometer, levels, levelspost=levelspost, restests=restests, gamma=gamma,
+        measures=measures, random=random, inverted=inverted, order=order, stride=stride, settle=settle,
+        settle_per_jump=settle_per_jump, drift_interval=drift_interval,
+        drift_levels=[float(level) for level in drift_levels.split(',')], drift_threshold=drift_threshold,
+        script=script, savefiles=savefiles, all_measurements=all_measurements,
+        timeestimation_output=timeestimation_output, lut=lut, continuous=continuous, inline=inline)
+    if continuous:
+        photometer.stop_acquisition()
+    window.close()
+
+    if plot != 'no_plots_8e26a619-e688-4dcf-b010-7bd5fca459d8':
+        process = start_report(monitor.name, calib_name, plot, show=not script)
+        print(f"Plot measurements in background process {process.pid} ...")
+    print("Done.")
+
+
+def _configure_photometer(photometer, rate=250, autorange=False, continuous=False):
+    """ Set the sample rate and auto-ranging of S470 photometers, other photometers only support the defaults. """
+    if photometer.type == 'S470':
+        photometer.sample_rate = rate
+        photometer.auto_ranging = autorange
+    elif rate != 250 or autorange:
+        raise ValueError(f'Sample rate and auto-ranging require the S470 photometer, got {photometer.type}.')
+    if continuous:
+        if photometer.type != 'S470':
+            raise ValueError(f'Continuous measurements require the S470 photometer, got {photometer.type}.')
+        if autorange:
+            raise ValueError('Auto-ranging is not supported with continuous measurements.')
+
+
+def _save_profile(path):
+    print(f"Save profile {PROFILER.save(path)} ...")
+    PROFILER.print_summary()
+
+
+@cli.command('refit')
+@click.option('-m', '--monitor', required=True, help='monitor name from psychopy monitor center')
+@click.option('--calib', help='name of the calibration to refit (default: latest)', default=None)
+@click.option('--pre', help='luminancePre csv file, stored with --savefiles, to use instead of the calibration measurements', default=None)
+@click.option('--raw', help='allMeasurments csv file, stored with --all_measurements, to use instead of the calibration measurements', default=None)
+@click.option('--lut', help='look up table (lut) with predicted luminances to use instead of the calibration measurements', default=None)
+@click.option('--outliers', help='drop raw measurements deviating more than this number of MADs from the median', type=float, default=None)
+@click.option('--method', help='monotonic cleanup of luminances before inversion', type=click.Choice(CLUT_METHODS), default='drop')
+@click.option('--gamma', help='Gamma with which the monitor is to be corrected. (default: 1.0 (linearization))', type=float, default=1.0)
+@click.option('--name', help='name of the new calibration (default: date and time)', default=None)
+@click.option('--inline', help='store measurements in the monitor file instead of binary sidecar files', is_flag=True)
+def refit_cli(monitor, calib, pre, raw, lut, outliers, method, gamma, name, inline):
+    """ Fit a new calibration from stored measurements, without monitor or photometer. """
+    from psychopy import monitors  # lazy import
+
+    if sum(source is not None for source in (pre, raw, lut)) > 1:
+        raise click.UsageError("Expects at most one of --pre, --raw, and --lut.")
+    if outliers is not None and raw is None:
+        raise click.UsageError("Expects --outliers only together with --raw.")
+
+    monitor = monitors.Monitor(monitor)
+    if calib is not None and not monitor.setCurrent(calib):
+        raise click.BadParameter(f"Unknown calibration '{calib}', expects one of {monitor.calibNames}.", param_hint='--calib')
+    print(f"Refit calibration {monitor.currentCalibName} ...")
+
+    if pre is not None:
+        levels, lums = load_luminance_file(pre)
+    elif raw is not None:
+        levels, lums = load_raw_file(raw, outliers)
+    elif lut is not None:
+        levels, lums = load_lut_file(lut)
+    else:
+        levels, lums = load_calib_entry(monitor, 'levelsPre'), load_calib_entry(monitor, 'lumsPre')
+    clut, error = invert_luminances(levels, lums, gamma, method, return_error=True)
+    print(f"Estimated clut error: median {np.median(error[0]):.2e}, max {error[0].max():.2e} (fraction of the level range).")
+
+    copy_calib(monitor, name)
+    monitor.setLumsPre(np.asarray(lums))
+    monitor.setLevelsPre(np.asarray(levels))
+    monitor.currentCalib['clut_method'] = method
+    monitor.currentCalib['refit'] = {
+        'source': pre or raw or lut or 'calibration',
+        'outliers': outliers,
+    }
+    if not inline:
+        store_calib_entries(monitor, ['lumsPre', 'levelsPre'])
+    print(f"Save new monitor calibration {monitor.currentCalibName} ...")
+    monitor.save()
+    print(f"Save clut {save_clut(monitor, gamma, clut)} ...")
+    print("Done.")
+
+
+def _parse_position(ctx, param, values):
+    try:
+        return [tuple(float(v) for v in value.split(',')) for value in values]
+    except ValueError:
+        raise click.BadParameter("Expects positions as x,y in norm units, e.g. --pos -0.5,0.5")
+
+
+@cli.command('uniformity')
+@click.option('-l', '--levels', required=True, help='Number of grey levels to measure', type=int)
+@click.option('-m', '--monitor', required=True, help='monitor name from psychopy monitor center')
+@click.option('-s', '--screen', required=True, help='screen to show window, typically 0 is internal and 1 external', type=int)
+@click.option('-p', '--photometer', required=True, help='photometer name supported by psychopy')
+@click.option('--port', 'ports', required=True, multiple=True, help='Port of a photometer, repeat for every photometer')
+@click.option('--pos', 'positions', required=True, multiple=True, callback=_parse_position,
+              help='Patch position x,y (norm units) of the photometer at the same --port, repeat for every photometer')
+@click.option('--size', help='Patch size (norm units)', type=float, default=0.2)
+@click.option('--random', help='Measure in randomized order.', is_flag=True)
+@click.option('--order', help='Measurement order of levels, overrides --random.', type=click.Choice(ORDERS), default=None)
+@click.option('--stride', help='Maximal jump in levels of strided orders (default: sqrt(levels))', type=int, default=None)
+@click.option('--settle', help='Seconds to wait before measuring a level.', type=float, default=0.5)
+@click.option('--settle_per_jump', help='Additional settle seconds per full range (0 to 1) grey level jump.', type=float, default=0.)
+@click.option('--drift_interval', help='Re-measure reference levels every this number of levels to correct drift (default: 0, disabled)', type=int, default=0)
+@click.option('--drift_levels', help='Comma-separated reference grey levels for the drift correction', default='1.0')
+@click.option('--drift_threshold', help='Warn (and pause without --script) when the luminance drift first exceeds this fraction', type=float, default=0.02)
+@click.option('--script', help='do not pause if the drift exceeds the threshold', is_flag=True)
+@click.option('--measures', help='Number of measurements to average per color level (only S470 photometer).', type=int, default=250)
+@click.option('--rate', help='readings per second (only S470 photometer)', type=click.IntRange(1, 250), default=250)
+@click.option('--autorange', help='select the photometer range per grey level band (only S470 photometer)', is_flag=True)
+@click.option('--continuous', help='sample the photometers continuously in the background instead of requesting measurements per level (only S470 photometer)', is_flag=True)
+@click.option('--linearized', help='Measure with the luminance correction of the current calibration.', is_flag=True)
+@click.option('--inline', help='store measurements in the monitor file instead of binary sidecar files', is_flag=True)
+def uniformity_cli(levels, monitor, screen, photometer, ports, positions, size, random, order, stride, settle,
+                   settle_per_jump, drift_interval, drift_levels, drift_threshold, script, measures, rate,
+                   autorange, continuous, linearized, inline):
+    """ Measure luminances at several screen positions with one photometer per position.
+
+    The luminances, of shape (positions, guns, levels), are added to the current calibration.
+    """
+    from psychopy import monitors, visual  # lazy import
+
+    if len(ports) != len(positions):
+        raise click.UsageError(f"Expects one --pos per --port, got {len(positions)} and {len(ports)}.")
+    print(f"Setup monitor {monitor}, search for photometers {photometer} ...")
+    monitor = monitors.Monitor(monitor)
+    photometers = [findPhotometer(device=photometer, ports=port, use_cache=False) for port in ports]
+    if any(phot is None for phot in photometers):
+        missing = [port for port, phot in zip(ports, photometers) if phot is None]
+        raise ValueError(f'Photometer not found at ports {missing}.')
+    for phot in photometers:
+        _configure_photometer(phot, rate, autorange, continuous)
+
+    monitor_size = monitor.getSizePix()
+    if monitor_size is None:
+        raise ValueError("No monitor size defined. Please setup monitor in psychopy's monitor center.")
+    window = visual.Window(
+        fullscr=0, size=monitor_size, gamma=1, units='norm', useFBO=True,
+        monitor=monitor, allowGUI=True, winType='pyglet', screen=screen)
+    try:
+        vpixx = ViewPixx(window)
+        if linearized:
+            vpixx.correct_luminance()
+        if continuous:
+            for phot in photometers:
+                phot.start_acquisition()
+        drift = None
+        if drift_interval > 0:
+            drift = DriftCorrector(reference_levels=[float(level) for level in drift_levels.split(',')],
+                                   interval=drift_interval, threshold=drift_threshold, pause=not script)
+
+        print(f"Measure luminance series at {len(positions)} positions ...")
+        levelsUniformity = np.linspace(0, 1, levels, endpoint=True)
+        lumsUniformity = measure_luminances(levelsUniformity, window, photometers, positions=positions,
+                                            allGuns=False, random=random, order=order, stride=stride,
+                                            stimSize=size, n_measures=measures, drift=drift,
+                                            settle=linear_settle(settle, settle_per_jump), print_order=True)
+    finally:
+        if continuous:
+            for phot in photometers:
+                phot.stop_acquisition()
+        window.close()
+    if lumsUniformity.size == 0:
+        print("Aborted.")
+        return 1
+
+    print(f"Add measurements to calibration {monitor.currentCalibName} ...")
+    monitor.currentCalib['lumsUniformity'] = lumsUniformity
+    monitor.currentCalib['levelsUniformity'] = levelsUniformity
+    monitor.currentCalib['positionsUniformity'] = np.array(positions)
+    monitor.currentCalib['sizeUniformity'] = size
+    monitor.currentCalib['linearizedUniformity'] = linearized
+    if not inline:
+        store_calib_entry(monitor, 'lumsUniformity')
+    monitor.save()
+    print("Done.")
+
+
+@cli.command('plan')
+@click.option('-l', '--levels', required=True, help='Number of grey levels to measure', type=int)
+@click.option('--stride', help='Maximal jump in levels of strided orders (default: sqrt(levels))', type=int, default=None)
+@click.option('--settle', help='Seconds to wait before measuring a level.', type=float, default=0.5)
+@click.option('--settle_per_jump', help='Additional settle seconds per full range (0 to 1) grey level jump.', type=float, default=0.)
+def plan_cli(levels, stride, settle, settle_per_jump):
+    """ Compare settle time and drift confounding of the measurement orders. """
+    levels_ = np.linspace(0, 1, levels, endpoint=True)
+    settle_model = linear_settle(settle, settle_per_jump)
+    print(f"{'order':>18} {'settle/level':>12} {'total settle':>12} {'max jump':>8} {'drift confounding':>17}")
+    for order in ORDERS:
+        report = order_report(levels_, plan_order(levels, order, stride), settle_model)
+        print(f"{order:>18} {report['settle_per_level']:11.2f}s {report['total_settle'] / 60:10.1f}min "
+              f"{report['max_jump']:8.3f} {report['drift_confounding']:17.3f}")
+
+
+@cli.command('campaign')
+@click.argument('config', type=click.Path(exists=True, dir_okay=False))
+@click.option('-m', '--monitor', required=True, help='monitor name from psychopy monitor center')
+@click.option('-s', '--screen', required=True, help='screen to show window, typically 0 is internal and 1 external', type=int)
+@click.option('-p', '--photometer', required=True, help='photometer name supported by psychopy')
+@click.option('--port', help='Port of the photometer', default=None)
+@click.option('--checkpoint', help='file of completed configurations (default: <config>.checkpoint.json)', default=None)
+@click.option('--restart', help='ignore the checkpoint and calibrate all configurations again', is_flag=True)
+@click.option('--plot', help='render plots of every calibration in the background into this directory', default=None)
+@click.option('--dry_run', help='only print the planned configurations', is_flag=True)
+@click.option('--profile', help='save durations of calibration phases and device calls to this trace file (view in chrome://tracing or ui.perfetto.dev)', type=click.Path(dir_okay=False, writable=True), default=None)
+def campaign_cli(config, monitor, screen, photometer, port, checkpoint, restart, plot, dry_run, profile):
+    """ Calibrate a grid of backlight and video mode configurations in one session.
+
+    CONFIG is a json file like
+    {"name": "june", "grid": {"bg_intensity": [255, 128], "scanning": [true, false], "mode": ["M16"]},
+     "options": {"levels": 256, "measures": 100}, "warmup": {"max_wait": 1800, "interval": 60, "tolerance": 0.002},
+     "photometer": {"rate": 250, "autorange": false, "continuous": false}}
+    with options of `pixxcalibrate measure` (see run_calibration).
+    Every configuration is saved as calibration "<name> <mode> <scanning> backlight <intensity>",
+    the name defaults to the start time of the campaign. Video modes are M16 (default) or C48.
+    """
+    with open(config) as config_file:
+        campaign = json.load(config_file)
+    options = campaign.get('options', {})
+    unsupported = ((set(options) - set(inspect.signature(run_calibration).parameters))
+                   | ({'monitor', 'window', 'vpixx', 'photometer', 'name', 'script', 'continuous'} & set(options)))
+    if unsupported:
+        raise click.UsageError(f"Unsupported campaign options {sorted(unsupported)}.")
+    if 'levels' not in options:
+        raise click.UsageError("Expects the number of grey levels as campaign option 'levels'.")
+    photometer_options = campaign.get('photometer', {})
+    unsupported = set(photometer_options) - {'rate', 'autorange', 'continuous'}
+    if unsupported:
+        raise click.UsageError(f"Unsupported photometer options {sorted(unsupported)}.")
+    warmup = campaign.get('warmup', {})
+    unsupported = ((set(warmup) - set(inspect.signature(wait_warmup).parameters))
+                   | ({'window', 'photometer', 'n_measures'} & set(warmup)))
+    if unsupported:
+        raise click.UsageError(f"Unsupported warm-up options {sorted(unsupported)}.")
+    checkpoint = checkpoint or f"{config}.checkpoint.json"
+    state = {'name': None, 'completed': {}} if restart else load_checkpoint(checkpoint)
+    completed = state['completed']
+    # resumed campaigns keep the name of the checkpoint, such that all calibrations share it
+    campaign_name = campaign.get('name') or state['name'] or datetime.now().strftime("%Y_%m_%d %H:%M")
+
+    try:
+        configs = plan_campaign(expand_grid(campaign.get('grid', {})))
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    pending = [cfg for cfg in configs if config_key(cfg) not in completed]
+    n_warmups = sum(needs_warmup(previous, cfg) for previous, cfg in zip([None] + pending[:-1], pending))
+    print(f"Campaign {campaign_name}: {len(pending)} of {len(configs)} configurations pending, {n_warmups} warm-ups.")
+    for cfg in pending:
+        print(f"\t{config_name(campaign_name, cfg)}")
+    if dry_run or not pending:
+        return
+
+    from psychopy import monitors, visual  # lazy import
+    if profile is not None:
+        PROFILER.enable()
+        click.get_current_context().call_on_close(lambda: _save_profile(profile))
+    print(f"Setup monitor {monitor}, search for photometer {photometer} ...")
+    monitor = monitors.Monitor(monitor)
+    monitor_size = monitor.getSizePix()
+    if monitor_size is None:
+        raise ValueError("No monitor size defined. Please setup monitor in psychopy's monitor center.")
+    photometer = findPhotometer(device=photometer, ports=port)
+    if photometer is None:
+        raise ValueError('Photometer not found. You might specify (another) port or name.')
+    continuous = photometer_options.get('continuous', False)
+    _configure_photometer(photometer, photometer_options.get('rate', 250),
+                          photometer_options.get('autorange', False), continuous)
+    window = visual.Window(
+        fullscr=0, size=monitor_size, gamma=1, units='norm', useFBO=True,
+        monitor=monitor, allowGUI=True, winType='pyglet', screen=screen)
+    try:
+        vpixx = ViewPixx(window)
+        if continuous:
+            photometer.start_acquisition()
+
+        previous = None
+        for n_config, cfg in enumerate(pending):
+            name = config_name(campaign_name, cfg)
+            print(f"Configuration {n_config + 1}/{len(pending)}: {name} ...")
+            # measure without the correction of the previous configuration
+            vpixx.uniformity_maps = None
+            vpixx.shader_clut = None
+            vpixx.mode = cfg['mode']
+            vpixx.scanning_backlight = cfg['scanning']
+            vpixx.backlight = cfg['bg_intensity']
+            if needs_warmup(previous, cfg):
+                with PROFILER.span('warmup', **cfg):
+                    wait_warmup(window, photometer, n_measures=options.get('measures', 50), **warmup)
+            with PROFILER.span('configuration', **cfg):
+                calib_name = run_calibration(monitor, window, vpixx, photometer, script=True, name=name,
+                                             continuous=continuous, **options)
+            completed[config_key(cfg)] = calib_name
+            save_checkpoint(checkpoint, campaign_name, completed)
+            if plot is not None:
+                start_report(monitor.name, calib_name, plot)
+            previous = cfg
+    finally:
+        if continuous:
+            photometer.stop_acquisition()
+        window.close()
     print("Done.")
@@ -1,9 +1,19 @@
-from psychopy.hardware import findPhotometer as psychopy_findPhotometer
-from psychopy import hardware
+import glob
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from psychopy import prefs
 
 from ._s470_photometer import S470
 
 
+PORT_CACHE_FILE = os.path.join(prefs.paths['userPrefsDir'], 'pixx_photometers.json')
+# udev symlinks of the S470, e.g. /dev/ttyS470, which are not listed by pyserial
+SYMLINK_PORT_PATTERNS = ('/dev/ttyS470*',)
+
+
 def getAllPhotometers():
     """Mock psychopy's getAllPhotometers function to
     add out S470 photometer.
@@ -16,12 +26,156 @@ def getAllPhotometers():
     return photometers
 
 
-def findPhotometer(ports=None, device=None):
-    psychopy_getAllPhotometers = hardware.getAllPhotometers
+def _serial_ports() -> dict:
+    """ Available serial ports with their USB serial number and hardware id. """
+    from serial.tools import list_ports
+    return {port.device: {'serial_number': port.serial_number, 'hwid': port.hwid}
+            for port in list_ports.comports()}
+
+
+def _default_ports(available_ports: dict) -> list:
+    """ Ports of psychopy's search, the serial ports listed by pyserial, and the photometer symlinks.
+
+    Names of the same device (e.g. /dev/ttyS470 linking to /dev/ttyUSB0) are probed only once.
+    """
+    from psychopy.hardware import getSerialPorts
+    ports = [port for pattern in SYMLINK_PORT_PATTERNS for port in sorted(glob.glob(pattern))]
+    ports += list(getSerialPorts()) + list(available_ports)
+    unique_ports = {}
+    for port in ports:
+        device = os.path.realpath(port) if os.path.exists(port) else port
+        unique_ports.setdefault(device, port)
+    return list(unique_ports.values())
+
+
+def _load_port_cache() -> dict:
     try:
-        hardware.getAllPhotometers = getAllPhotometers
-        photometer = psychopy_findPhotometer(ports, device)
-    finally: 
-        hardware.getAllPhotometers = psychopy_getAllPhotometers
-        
+        with open(PORT_CACHE_FILE) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_port_cache(cache: dict):
+    try:
+        with open(PORT_CACHE_FILE, 'w') as cache_file:
+            json.dump(cache, cache_file, indent=2)
+    except OSError:
+        print(f"WARNING: Could not store photometer port in {PORT_CACHE_FILE}.")
+
+
+def _cached_port(entry: dict, available_ports: dict):
+    """ Port of a cached photometer, following its USB serial number if the port was renamed. """
+    serial_number = entry.get('serial_number')
+    if serial_number:
+        for port, info in available_ports.items():
+            if info['serial_number'] == serial_number:
+                return port
+    return entry['port']
+
+
+def _open_photometer(cls, port, timeout):
+    """ Try to connect to the photometer class at the port, return None on failure. """
+    try:
+        if cls is S470:
+            photometer = cls(port, handshake_timeout=timeout)
+        else:
+            photometer = cls(port)
+    except Exception:
+        return None
+    if not getattr(photometer, 'OK', False):
+        _close_photometer(photometer)
+        return None
     return photometer
+
+
+def _close_photometer(photometer):
+    com = getattr(photometer, 'com', None)
+    if com is not None:
+        com.close()
+
+
+def findPhotometer(ports=None, device=None, timeout=0.2, use_cache=True):
+    """ Find a connected photometer by probing the serial ports concurrently.
+
+    The port of the last photometer found is cached (in psychopy's user preference directory) 
+    and tried first. Otherwise, the ports are probed in parallel, trying the photometer classes
+    one after another at each port, and the first photometer responding is returned.
+
+    :parameters:
+        ports : port or list of ports to search (default: psychopy's serial ports, the ports listed by pyserial,
+            and symlinks like /dev/ttyS470).
+        device : expected device name, e.g. 'S470' or 'PR650' (default: all devices).
+        timeout : seconds to wait for the S470 handshake.
+        use_cache : try and update the cached port.
+    """
+    if isinstance(ports, (str, int)):
+        ports = [ports]
+    available_ports = _serial_ports()
+    if ports is None:
+        ports = _default_ports(available_ports)
+
+    classes = [cls for cls in getAllPhotometers()
+               if device is None or device.lower() in getattr(cls, 'driverFor', [])
+               or device.lower() == cls.__name__.lower()]
+    cache = _load_port_cache() if use_cache else {}
+    cache_key = (device or '').lower()
+
+    photometer = None
+    if cache_key in cache:
+        entry = cache[cache_key]
+        port = _cached_port(entry, available_ports)
+        cls = next((cls for cls in classes if cls.__name__ == entry['class']), None)
+        if cls is not None and port in ports:
+            photometer = _open_photometer(cls, port, timeout)
+            if photometer is not None:
+                print(f"Found {cls.__name__} at cached port {port}.")
+
+    if photometer is None:
+        photometer = _probe_concurrently(classes, ports, timeout)
+        if photometer is not None and use_cache:
+            port = getattr(photometer, 'portString', None) or getattr(photometer, 'portNumber', None)
+            port_info = available_ports.get(port) or available_ports.get(os.path.realpath(str(port)), {})
+            cache[cache_key] = {'class': type(photometer).__name__, 'port': port, **port_info}
+            _save_port_cache(cache)
+    return photometer
+
+
+def _probe_concurrently(classes, ports, timeout):
+    """ Probe the ports in parallel and return the first photometer found.
+
+    The classes are tried one after another at each port, such that their handshakes do not
+    interfere at the same port; the S470 is tried first because its handshake timeout is short.
+    The first photometer found is returned immediately. The probes at the other ports finish
+    in the background, skip their remaining classes, and close the photometers they found.
+    """
+    found = threading.Event()
+    lock = threading.Lock()
+    classes = sorted(classes, key=lambda cls: cls is not S470)
+
+    def probe(port):
+        for cls in classes:
+            if found.is_set():
+                return None
+            photometer = _open_photometer(cls, port, timeout)
+            if photometer is None:
+                continue
+            with lock:
+                if found.is_set():  # a probe at another port was faster
+                    _close_photometer(photometer)
+                    return None
+                found.set()
+                return photometer
+        return None
+
+    if not ports or not classes:
+        return None
+    pool = ThreadPoolExecutor(max_workers=len(ports), thread_name_prefix='photometer probe')
+    futures = [pool.submit(probe, port) for port in ports]
+    try:
+        for future in as_completed(futures):
+            if future.result() is not None:
+                return future.result()
+        return None
+    finally:
+        pool.shutdown(wait=False)
@@ -0,0 +1,150 @@
+""" Plots and summary of stored calibrations.
+
+The report is rendered from the saved monitor calibration, not from the measuring process,
+such that `pixxcalibrate measure --plot` can hand it to a background process and continue
+(e.g. with the next calibration of a batch) while matplotlib starts and renders.
+
+usage::
+    pixxcalibrate report -m ViewPixx --calib "2023_01_01 12:00" -o plots/
+or, from python, without blocking::
+    process = start_report('ViewPixx', '2023_01_01 12:00', 'plots/')
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+import click
+import numpy as np
+
+from psychopy_pixx._sidecar import load_calib_entry, safe_name
+
+
+def summarize_calibration(monitor) -> dict:
+    """ Key numbers of the current calibration: luminance range, linearity and resolution. """
+    calib = monitor.currentCalib
+    summary = {
+        'monitor': monitor.name,
+        'calibration': monitor.currentCalibName,
+        'photometer': calib.get('photometer', {}).get('type'),
+        'clut_method': calib.get('clut_method', 'drop'),
+    }
+    lumsPre = load_calib_entry(monitor, 'lumsPre')
+    if lumsPre is not None:
+        summary['min_luminance'] = float(lumsPre[0][0])
+        summary['max_luminance'] = float(lumsPre[0][-1])
+    lumsPost = load_calib_entry(monitor, 'lumsPost')
+    levelsPost = load_calib_entry(monitor, 'levelsPost')
+    if lumsPost is not None and levelsPost is not None:
+        lums = np.asarray(lumsPost[0])
+        expected = lums[0] + np.asarray(levelsPost) * (lums[-1] - lums[0])
+        deviation = np.abs(lums - expected) / max(lums[-1] - lums[0], np.finfo(float).eps)
+        summary['max_linearity_error'] = float(deviation.max())
+        summary['rms_linearity_error'] = float(np.sqrt(np.mean(deviation**2)))
+    lumsRes = load_calib_entry(monitor, 'lumsRes')
+    if lumsRes is not None:
+        offsets = np.asarray(calib['offsetRes'])[1:]
+        differences = np.asarray(lumsRes)[:, 0, 1:] - np.asarray(lumsRes)[:, 0, :1]
+        # finest grey level step that still increases the luminance, per tested grey level
+        resolved = [offsets[diff > 0].max() if np.any(diff > 0) else np.nan for diff in differences]
+        summary['resolution_bits'] = [float(bits) for bits in resolved]
+    gains = [np.asarray(calib[key]['gains']) for key in ('driftPre', 'driftPost', 'driftRes', 'drift')
+             if calib.get(key) is not None and len(calib[key].get('gains', []))]
+    if gains:
+        summary['max_drift'] = float(max(np.abs(sweep_gains - 1).max() for sweep_gains in gains))
+    return summary
+
+
+def render_report(monitor, output='.', show=False) -> list:
+    """ Save luminance and resolution plots and a summary of the current calibration.
+
+    Returns the paths of the written files.
+    """
+    import matplotlib
+    if not show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    output = Path(output)
+    name = safe_name(monitor.currentCalibName)
+    photometer = monitor.currentCalib.get('photometer', {}).get('type')
+    files = []
+
+    levelsPre, lumsPre = load_calib_entry(monitor, 'levelsPre'), load_calib_entry(monitor, 'lumsPre')
+    levelsPost, lumsPost = load_calib_entry(monitor, 'levelsPost'), load_calib_entry(monitor, 'lumsPost')
+    if lumsPre is not None:
+        plt.figure()
+        plt.plot(levelsPre, lumsPre[0], label='pre')
+        if lumsPost is not None:
+            plt.plot([0, 1], [lumsPre[0][0], lumsPre[0][-1]], '--', linewidth=3, label='expected')
+            plt.plot(levelsPost, lumsPost[0], label='post')
+        plt.xlabel("Grey Level")
+        plt.ylabel("Luminance [cd/m^2]")
+        plt.legend(loc='best')
+        plt.title(f'Luminance before and after calibration ({photometer}, {monitor.currentCalibName})')
+        files.append(output / f"{name}_luminance.pdf")
+        plt.savefig(files[-1])
+
+    levelsRes, lumsRes = load_calib_entry(monitor, 'levelsRes'), load_calib_entry(monitor, 'lumsRes')
+    if lumsRes is not None:
+        resoffset = np.asarray(monitor.currentCalib['offsetRes'])
+        plt.figure()
+        for lums, levels in zip(lumsRes, levelsRes):
+            lums = lums[0]
+            plt.plot(-resoffset[1:], lums[1:] - lums[0], label=f'{levels[0]:.4f}')
+        plt.xlabel("Log2(grey level difference)")
+        plt.ylabel("Luminance difference")
+        plt.yscale('log', base=2)
+        plt.title(f'Luminance resolution ({photometer}, {monitor.currentCalibName})')
+        plt.legend(loc='best', title='Grey level')
+        files.append(output / f"{name}_resolution.pdf")
+        plt.savefig(files[-1])
+
+    summary = summarize_calibration(monitor)
+    files.append(output / f"{name}_summary.txt")
+    files[-1].write_text("".join(f"{key}: {value}\n" for key, value in summary.items()))
+    if show:
+        plt.show()
+    plt.close('all')
+    return files
+
+
+def start_report(monitor_name, calib_names, output='.', show=False) -> subprocess.Popen:
+    """ Render the reports of calibrations in a separate process and return without waiting. """
+    if isinstance(calib_names, str):
+        calib_names = [calib_names]
+    command = [sys.executable, '-m', 'psychopy_pixx.calibration.report', '-m', monitor_name, '-o', str(output)]
+    for calib_name in calib_names:
+        command += ['--calib', calib_name]
+    if show:
+        command.append('--show')
+    return subprocess.Popen(command)
+
+
+@click.command('report')
+@click.option('-m', '--monitor', required=True, help='monitor name from psychopy monitor center')
+@click.option('--calib', help='calibration name(s) to report (default: the latest calibration)', multiple=True)
+@click.option('--all', 'all_calibs', help='report all calibrations of the monitor', is_flag=True)
+@click.option('-o', '--output', help='directory for plots and summaries', type=click.Path(file_okay=False), default='.')
+@click.option('--show', help='show the plots', is_flag=True)
+@click.option('--background', help='render in a separate process and return immediately', is_flag=True)
+def report_cli(monitor, calib, all_calibs, output, show, background):
+    """ Plot and summarize stored calibrations. """
+    from psychopy import monitors  # lazy import
+
+    monitor_name = monitor
+    monitor = monitors.Monitor(monitor_name)
+    calib_names = monitor.calibNames if all_calibs else list(calib) or [monitor.currentCalibName]
+    if background:
+        process = start_report(monitor_name, calib_names, output, show)
+        print(f"Render report in background process {process.pid} ...")
+        return
+    Path(output).mkdir(parents=True, exist_ok=True)
+    for calib_name in calib_names:
+        if not monitor.setCurrent(calib_name):
+            raise click.BadParameter(f"Unknown calibration '{calib_name}', expects one of {monitor.calibNames}.", param_hint='--calib')
+        for path in render_report(monitor, output, show):
+            print(f"Save {path} ...")
+
+
+if __name__ == '__main__':
+    report_cli()
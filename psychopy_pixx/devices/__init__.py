@@ -1,2 +1,13 @@
-from .viewpixx import ViewPixx
-from .responsepixx import ResponsePixx
+# the device classes import psychopy's window backend, import them on first access such that
+# the NumPy helpers (e.g. psychopy_pixx.devices._clut) can be used without a display
+__all__ = ['ViewPixx', 'ResponsePixx']
+
+
+def __getattr__(name):
+    if name == 'ViewPixx':
+        from .viewpixx import ViewPixx
+        return ViewPixx
+    if name == 'ResponsePixx':
+        from .responsepixx import ResponsePixx
+        return ResponsePixx
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,189 @@
+import numpy as np
+
+
+"""
+Inversion of luminance measurements to a 16-bit CLUT.
+
+Besides dropping or clipping non-increasing measurements, the luminances can be smoothed
+by isotonic regression and then inverted by linear or monotone cubic (PCHIP) interpolation.
+For low-noise measurements, the higher order inversion reaches the same linearization accuracy
+with sparser measurements; for noisy, dense measurements, it is slightly less accurate than a linear
+inversion. See examples/benchmark_clut_inversion.py.
+"""
+
+CLUT_METHODS = ('drop', 'cummax', 'isotonic', 'pchip')
+CLUT_SIZE = 2**16
+
+
+def isotonic_regression(y: np.ndarray) -> np.ndarray:
+    """ Least squares non-decreasing fit to each row of y (pool adjacent violators).
+
+    The blocks of all rows are pooled together: every iteration merges all adjacent blocks
+    that violate the order at once, which results in the same fit as merging them one by one.
+    """
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    values = y.ravel()
+    is_row_start = np.zeros(values.size, dtype=bool)
+    is_row_start[::y.shape[1]] = True
+    is_start = np.ones(values.size, dtype=bool)
+    while True:
+        starts = np.flatnonzero(is_start)
+        sizes = np.diff(np.r_[starts, values.size])
+        means = np.add.reduceat(values, starts) / sizes
+        violating = (means[:-1] >= means[1:]) & ~is_row_start[starts[1:]]
+        if not violating.any():
+            return np.repeat(means, sizes).reshape(y.shape)
+        is_start[starts[1:][violating]] = False
+
+
+def _block_knots(levels, fitted):
+    """ Collapse the constant blocks of an isotonic fit to one knot per block.
+
+    Inner blocks are represented by their mean level, the first and last block by the end levels.
+    """
+    is_start = np.r_[True, np.diff(fitted) > 0]
+    block = np.cumsum(is_start) - 1
+    knot_levels = np.bincount(block, weights=levels) / np.bincount(block)
+    knot_levels[0], knot_levels[-1] = levels[0], levels[-1]
+    knot_lums = fitted[is_start]
+    return knot_lums, knot_levels
+
+
+def _pchip_slopes(x, y, gun):
+    """ Fritsch-Carlson derivatives at the knots of concatenated, strictly increasing series. """
+    delta = np.diff(y) / np.diff(x)
+    h = np.diff(x)
+    in_series = gun[:-1] == gun[1:]  # segments between knots of the same series
+    has_left, has_right = np.r_[False, in_series], np.r_[in_series, False]
+    d_left, d_right = np.r_[np.nan, delta], np.r_[delta, np.nan]
+    h_left, h_right = np.r_[np.nan, h], np.r_[h, np.nan]
+
+    w_left, w_right = 2 * h_right + h_left, h_right + 2 * h_left
+    with np.errstate(divide='ignore', invalid='ignore'):
+        harmonic = (w_left + w_right) / (w_left / d_left + w_right / d_right)
+    inner = np.where((d_left > 0) & (d_right > 0), harmonic, 0.)
+    # end points of a series take the one-sided secant
+    return np.where(has_left & has_right, inner, np.where(has_right, d_right, d_left))
+
+
+def monotone_inverse(knot_lums, knot_levels, query_lums, kind='pchip'):
+    """ Interpolate levels at query luminances for several series at once.
+
+    Parameters
+    ----------
+    knot_lums, knot_levels : lists of arrays
+        Strictly increasing knots of every series, possibly with different lengths.
+    query_lums : array of shape (n_query,)
+        Luminances between 0 and 1 at which all series are evaluated.
+    kind : 'linear' or 'pchip'
+
+    Returns
+    -------
+    Array of shape (n_series, n_query).
+    """
+    n_series = len(knot_lums)
+    lengths = np.array([len(k) for k in knot_lums])
+    gun = np.repeat(np.arange(n_series), lengths)
+    # shift the series apart so that one sorted search finds all segments
+    span = 2 + max(np.abs(k).max() for k in knot_lums)
+    x = np.concatenate(knot_lums) + gun * span
+    y = np.concatenate(knot_levels)
+
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    query = (np.clip(query_lums[np.newaxis, :], [[k[0]] for k in knot_lums], [[k[-1]] for k in knot_lums])
+             + (np.arange(n_series) * span)[:, np.newaxis])
+    segment = np.searchsorted(x, query, side='right') - 1
+    segment = np.clip(segment, starts[:, np.newaxis], (starts + lengths - 2)[:, np.newaxis])
+
+    x0, x1, y0, y1 = x[segment], x[segment + 1], y[segment], y[segment + 1]
+    h = x1 - x0
+    t = (query - x0) / h
+    if kind == 'linear':
+        return y0 + t * (y1 - y0)
+
+    slopes = _pchip_slopes(x, y, gun)
+    m0, m1 = slopes[segment] * h, slopes[segment + 1] * h
+    t2, t3 = t * t, t * t * t
+    return ((2 * t3 - 3 * t2 + 1) * y0 + (t3 - 2 * t2 + t) * m0
+            + (-2 * t3 + 3 * t2) * y1 + (t3 - t2) * m1)
+
+
+def invert_luminances(levels, lums, gamma=1.0, method='drop', return_error=False):
+    """ Interpolate the 2^16 grey levels that linearize the measured luminances.
+
+    Parameters
+    ----------
+    levels : array of shape (n_levels,)
+        Grey levels between 0 and 1 (or 255), in increasing order.
+    lums : array of shape (4, n_levels)
+        Measured luminances per gun.
+    gamma : float
+        Gamma applied to the linearized levels.
+    method : 'drop', 'cummax', 'isotonic' or 'pchip'
+        Monotonic cleanup of noisy luminances before the inversion.
+        'drop' removes levels where any gun decreases, 'cummax' replaces
+        decreases by the running maximum, both invert linearly.
+        'isotonic' smoothes the luminances with isotonic regression and inverts linearly,
+        'pchip' inverts the isotonic regression with monotone cubic interpolation.
+    return_error : bool
+        Additionally return the estimated error of every CLUT entry, as a fraction of the level range (0 to 1).
+        The estimate propagates the residual noise around the isotonic
+        regression through the local slope of the CLUT.
+
+    Returns
+    -------
+    CLUT of shape (4, 2^16) and, optionally, its error estimate of the same shape.
+    """
+    lums = np.asarray(lums, dtype=float)
+    levels = np.asarray(levels, dtype=float)
+    if lums.shape[0] != 4 or lums.shape[1] != levels.shape[0]:
+        raise ValueError(f"Expects matching levels and luminances,\n"
+                         f"got {levels.shape} != {lums.shape}.")
+    if method not in CLUT_METHODS:
+        raise ValueError(f"Expects method in {CLUT_METHODS}, got '{method}'.")
+
+    lums = (lums - lums[:, [0]]) / (lums[:, [-1]] - lums[:, [0]] + 1e-8)
+    if method in ('isotonic', 'pchip') or return_error:
+        fitted = isotonic_regression(lums)
+    if return_error:
+        noise = np.sqrt(np.mean((lums - fitted)**2, axis=1))
+
+    if method == 'cummax':
+        lums = np.maximum.accumulate(lums, axis=1)
+    elif method == 'drop':
+        is_lum_incr = np.all(np.diff(lums) >= 0, axis=0)  # all guns have to be increasing
+        if not np.all(is_lum_incr):
+            lums = np.c_[lums[:, 0], lums[:, 1:][:, is_lum_incr]]
+            levels = np.r_[levels[0], levels[1:][is_lum_incr]]
+            print(f"WARNING: Expects increasing colors, got {len(is_lum_incr) - is_lum_incr.sum()} decreases and dropped them.")
+
+    if not np.all(np.diff(levels) >= 0):
+        raise ValueError(f"Expects levels to be increasing, got decreases.")
+    if np.all(levels[0] != 0):
+        raise ValueError(f"Expects levels starting with 0, got {levels[0]}")
+    if np.all(levels[-1] == 255):
+        levels = levels / 255
+    elif np.any(levels[-1] != 1):
+        raise ValueError(f"Expects levels ending with 1.0 or 255, got {levels[-1]}")
+
+    nguns = lums.shape[0]
+    desired_lums = np.linspace(0, 1, CLUT_SIZE, endpoint=True)
+    if method in ('drop', 'cummax'):
+        desired_levels = np.empty((nguns, len(desired_lums)))
+        for gun in range(4):
+            desired_levels[gun, :] = np.interp(x=desired_lums, xp=lums[gun], fp=levels)
+    else:
+        knots = [_block_knots(levels, gun_fitted) for gun_fitted in fitted]
+        measured = [gun for gun, (k, _) in enumerate(knots) if len(k) > 1]
+        # guns without measurements (e.g. allGuns=False) are set to the last level, like 'drop' and 'cummax'
+        desired_levels = np.full((nguns, len(desired_lums)), levels[-1])
+        if measured:
+            knot_lums = [(knots[gun][0] - knots[gun][0][0]) / (knots[gun][0][-1] - knots[gun][0][0]) for gun in measured]
+            desired_levels[measured] = monotone_inverse(knot_lums, [knots[gun][1] for gun in measured], desired_lums,
+                                                        kind='pchip' if method == 'pchip' else 'linear')
+    desired_levels = desired_levels**gamma  # = (invertedfunction)**gamma  (if gamma == 1.0 it is just a linearisation)
+
+    if return_error:
+        error = noise[:, np.newaxis] * np.abs(np.gradient(desired_levels, desired_lums, axis=1))
+        return desired_levels, error
+    return desired_levels
@@ -0,0 +1,113 @@
+import numpy as np
+
+from ._uniformity import correct_uniformity, sample_map
+
+
+"""
+Encoding of frames to the packed output of the M16 and C48 shaders.
+
+Frames encoded ahead of time bypass psychopy's drawing, the float FBO and the shader's
+CLUT lookup during playback: the packed 8-bit RGB frames are only uploaded and copied to the screen,
+see `ViewPixx.show_frame` and `ViewPixx.play_frames`.
+The encoding reproduces the shaders, including the linear texture lookup of the CLUT
+and the spatial uniformity correction.
+"""
+
+FRAME_MODES = ('M16', 'C48')
+
+
+def apply_clut(indices: np.ndarray, clut_row: np.ndarray) -> np.ndarray:
+    """ Look up 16-bit values like the shaders, interpolating linearly within a 256 texel CLUT row. """
+    rows = np.floor(indices / 256.)
+    columns = indices - rows * 256.
+    left = np.floor(columns)
+    weight = columns - left
+    start = (rows * 256.).astype(np.int64)
+    left = left.astype(np.int64)
+    right = np.minimum(left + 1, 255)  # clamp to edge, no interpolation across rows
+    return (clut_row[start + left] * (1 - weight) + clut_row[start + right] * weight) * 65535.
+
+
+def encode_frames(frames, mode='M16', clut=None, out=None, uniformity=None) -> np.ndarray:
+    """ Encode grey level frames to packed 8-bit RGB frames of the M16 or C48 mode.
+
+    Parameters
+    ----------
+    frames : array of shape (n, height, width) for M16 or (n, height, width, 3) for C48
+        Grey levels between 0 and 1 (psychopy colors -1 to 1 correspond to 0 to 1),
+        row 0 at the top of the window. Frames have the size of the window's framebuffer.
+    mode : 'M16' or 'C48'
+    clut : array of shape (4, 2**16), e.g. ViewPixx.shader_clut, or None for no correction.
+    out : uint8 array of shape (n, height, width, 3), e.g. a memory-mapped file (see encode_frames_file).
+    uniformity : (gain, offset) maps, e.g. ViewPixx.uniformity_maps, or None for no spatial correction.
+
+    Returns
+    -------
+    uint8 array of shape (n, height, width, 3). In M16, red holds the high and green the low byte;
+    in C48, even columns hold the high and odd columns the low bytes of the colors.
+    """
+    if mode not in FRAME_MODES:
+        raise ValueError(f"Expects mode in {FRAME_MODES}, got '{mode}'.")
+    frames = np.asarray(frames)
+    expected_ndim = 3 if mode == 'M16' else 4
+    if frames.ndim != expected_ndim or (mode == 'C48' and frames.shape[-1] != 3):
+        raise ValueError(f"Expects frames of shape (n, height, width{'' if mode == 'M16' else ', 3'}) "
+                         f"for mode {mode}, got {frames.shape}.")
+    if clut is not None and np.shape(clut) != (4, 2**16):
+        raise ValueError(f"Expects clut.shape == (4, 2**16), got {np.shape(clut)}")
+    shape = frames.shape[:3] + (3,)
+    if out is None:
+        out = np.empty(shape, dtype=np.uint8)
+    elif out.shape != shape or out.dtype != np.uint8:
+        raise ValueError(f"Expects out as uint8 array of shape {shape}, got {out.dtype} {out.shape}.")
+
+    if uniformity is not None:
+        # sampled once for all frames, flipped to row 0 at the top
+        gain, offset = (sample_map(uniformity_map, *shape[1:3])[:, ::-1] for uniformity_map in uniformity)
+        if mode == 'M16':
+            gain, offset = gain[0], offset[0]
+        else:
+            gain, offset = np.moveaxis(gain[1:], 0, -1), np.moveaxis(offset[1:], 0, -1)
+
+    for n, frame in enumerate(frames):  # per frame to bound the temporary float arrays
+        values = np.clip(frame, 0, 1).astype(np.float32)
+        if uniformity is not None:
+            values = correct_uniformity(values, gain, offset)
+        values = values * 65535.
+        if mode == 'M16':
+            if clut is not None:
+                values = apply_clut(values, clut[0])
+            values = np.floor(values + 0.01).astype(np.uint16)
+            out[n, :, :, 0] = values >> 8
+            out[n, :, :, 1] = values & 0xFF
+            out[n, :, :, 2] = 0
+        else:
+            if clut is not None:
+                values = np.stack([apply_clut(values[..., gun], clut[gun + 1]) for gun in range(3)], axis=-1)
+            values = np.floor(values + 0.5).astype(np.uint16)
+            out[n, :, 0::2] = values[:, 0::2] >> 8
+            out[n, :, 1::2] = values[:, 1::2] & 0xFF
+    return out
+
+
+def encode_frames_file(path, frames, mode='M16', clut=None, chunk_size=64, uniformity=None) -> np.ndarray:
+    """ Encode frames chunk-wise into a .npy file and return it memory-mapped for playback.
+
+    frames can be a memory-mapped array itself, such that movies larger than the memory can be encoded.
+    """
+    n_frames, height, width = np.shape(frames)[:3]
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(n_frames, height, width, 3))
+    for start in range(0, n_frames, chunk_size):
+        stop = min(start + chunk_size, n_frames)
+        encode_frames(frames[start:stop], mode, clut, out=out[start:stop], uniformity=uniformity)
+    out.flush()
+    return open_frames(path)
+
+
+def open_frames(path) -> np.ndarray:
+    """ Memory-map encoded frames of a .npy file read-only, frames are read from disk during playback. """
+    frames = np.load(path, mmap_mode='r')
+    if frames.ndim != 4 or frames.shape[-1] != 3 or frames.dtype != np.uint8:
+        raise ValueError(f"Expects encoded frames as uint8 array of shape (n, height, width, 3), "
+                         f"got {frames.dtype} {frames.shape}.")
+    return frames
@@ -0,0 +1,196 @@
+"""
+Validity monitor of the calibration during experiments.
+
+The luminance correction is only valid in the monitor state of the calibration. Tools like VPutil
+or the front panel can change this state during a session. The register monitor compares a few
+precomputed register entries (the fingerprint) against the device, rate-limited between trials
+or periodically on a background thread, and raises or logs an event when the state changes.
+A check costs one register update (a USB round trip) and one local getter call per entry.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from psychopy_pixx._profiling import PROFILER
+from psychopy_pixx._sidecar import json_normalized
+
+
+FINGERPRINT_KEYS = ('VideoMode', 'BacklightIntensity', 'ScanningBackLight')
+MISMATCH_ACTIONS = ('raise', 'log', 'ignore')
+
+
+class RegisterMismatch(RuntimeError):
+    """ The device register differs from the calibration, .event holds the details. """
+    def __init__(self, event: dict):
+        details = ", ".join(f"{key}={value['actual']!r} (expects {value['expected']!r})"
+                            for key, value in event['mismatches'].items())
+        super().__init__(f"Monitor state changed since calibration: {details}")
+        self.event = event
+
+
+def register_getter(device, key: str):
+    """ Return the getter of a register entry, named like the entries of ViewPixx.register, or None. """
+    if hasattr(device, 'get' + key):
+        return getattr(device, 'get' + key)
+    if hasattr(device, f'is{key}Enabled'):
+        return getattr(device, f'is{key}Enabled')
+    return None
+
+
+class RegisterMonitor(object):
+    """ Compare the device register against the expected (calibration) register.
+
+    usage::
+        register_monitor = vpixx.register_monitor(min_interval=5.)
+        for trial in trials:
+            ...  # draw and flip
+            register_monitor.check()  # between trials, at most every 5 seconds
+    or, on a background thread::
+        register_monitor.start(interval=5.)
+        ...
+        register_monitor.check_events()  # raises in the main thread if a mismatch was found
+        register_monitor.stop()
+    :parameters:
+        device: pypixxlib device, e.g. ViewPixx._pixxdevice
+        expected: dict
+            register entries to expect, e.g. of the calibration.
+        keys: list of str
+            entries to compare (default: FINGERPRINT_KEYS, the entries affecting the luminance).
+            Use keys=None to compare all expected entries.
+        min_interval: float
+            seconds between checks, more frequent calls of .check() return immediately.
+        on_mismatch: 'raise', 'log', 'ignore' or callable
+            raise RegisterMismatch, log a psychopy warning, only record the event,
+            or call on_mismatch(event).
+    Events are only created when the register state changes: at the first mismatching check,
+    when the mismatch changes, and when the register matches again (event['recovered'] is True,
+    which is logged or passed to the callable, but never raised).
+    """
+    def __init__(self, device, expected: dict, keys=FINGERPRINT_KEYS, min_interval=1., on_mismatch='raise'):
+        if not callable(on_mismatch) and on_mismatch not in MISMATCH_ACTIONS:
+            raise ValueError(f"Expects on_mismatch in {MISMATCH_ACTIONS} or a function, got {on_mismatch!r}.")
+        keys = list(expected) if keys is None else [key for key in keys if key in expected]
+        getters = [register_getter(device, key) for key in keys]
+        # precomputed fingerprint: getters and expected values in fixed order, compared as tuple
+        self.keys = tuple(key for key, getter in zip(keys, getters) if getter is not None)
+        # the expected register is usually loaded from json, e.g. with lists instead of tuples
+        self.fingerprint = tuple(json_normalized([expected[key] for key in self.keys]))
+        self._getters = tuple(getter for getter in getters if getter is not None)
+        if not self.keys:
+            raise ValueError(f"Expects some of the keys {keys} in the expected register and device.")
+        self._update_register_cache = device.updateRegisterCache
+        self.min_interval = min_interval
+        self.on_mismatch = on_mismatch
+        self.events = []
+        self.n_checks = 0
+        self.n_skipped = 0
+        self.durations = deque(maxlen=10000)  # seconds of the recent checks
+        self._last_check = -np.inf
+        self._state = self.fingerprint  # register state of the last check
+        self._pending = None
+        self._thread = None
+
+    def check(self, force: bool = False):
+        """ Compare the register with the fingerprint, unless the last check was less than min_interval ago.
+
+        Returns True if the register matches, False on mismatch, and None if skipped.
+        """
+        if threading.current_thread() is threading.main_thread():
+            self.check_events()
+        start = time.perf_counter()
+        if not force and start - self._last_check < self.min_interval:
+            self.n_skipped += 1
+            return None
+        self._last_check = start
+        with PROFILER.span('register check', 'viewpixx'):
+            self._update_register_cache()
+            actual = tuple(getter() for getter in self._getters)
+            if actual != self._state:
+                actual = tuple(json_normalized(actual))
+        self.durations.append(time.perf_counter() - start)
+        self.n_checks += 1
+        if actual != self._state:
+            self._state = actual
+            self._state_changed(actual)
+        return actual == self.fingerprint
+
+    def _state_changed(self, actual):
+        event = {
+            'time': time.perf_counter(),
+            'wall_time': time.time(),
+            'recovered': actual == self.fingerprint,
+            'mismatches': {key: {'expected': expected, 'actual': value}
+                           for key, expected, value in zip(self.keys, self.fingerprint, actual)
+                           if expected != value},
+        }
+        self.events.append(event)
+        if event['recovered']:
+            PROFILER.instant('register recovered', 'viewpixx')
+        else:
+            PROFILER.instant('register mismatch', 'viewpixx', **{key: value['actual'] for key, value in event['mismatches'].items()})
+        if callable(self.on_mismatch):
+            self.on_mismatch(event)
+        elif self.on_mismatch == 'log':
+            from psychopy import logging
+            if event['recovered']:
+                logging.info("Monitor state matches the calibration again.")
+            else:
+                logging.warning(str(RegisterMismatch(event)))
+        elif self.on_mismatch == 'raise' and not event['recovered']:
+            if threading.current_thread() is threading.main_thread():
+                raise RegisterMismatch(event)
+            self._pending = event  # raised in the main thread by .check_events()
+
+    def check_events(self):
+        """ Raise a mismatch found by the background thread. """
+        if self._pending is not None:
+            event, self._pending = self._pending, None
+            raise RegisterMismatch(event)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval: float = None):
+        """ Check every interval seconds (default: min_interval) on a background thread.
+
+        pypixxlib is not thread-safe, use it only if the main thread does not access the device
+        at the same time (e.g. no ResponsePixx polling), otherwise check between trials.
+        """
+        if self.running:
+            raise RuntimeError("Register monitor is already running.")
+        interval = self.min_interval if interval is None else interval
+        stop_event = threading.Event()
+        thread = threading.Thread(target=self._run, args=(stop_event, interval),
+                                  name='register monitor', daemon=True)
+        self._thread = (thread, stop_event)
+        thread.start()
+
+    def _run(self, stop_event, interval):
+        while not stop_event.wait(interval):
+            self.check(force=True)
+
+    def stop(self):
+        if not self.running:
+            return
+        thread, stop_event = self._thread
+        stop_event.set()
+        thread.join()
+        self._thread = None
+
+    def stats(self) -> dict:
+        """ Number of checks and skipped calls, and check durations in milliseconds. """
+        durations = np.array(self.durations) * 1e3
+        recoveries = sum(event['recovered'] for event in self.events)
+        stats = {'checks': self.n_checks, 'skipped': self.n_skipped,
+                 'mismatches': len(self.events) - recoveries, 'recoveries': recoveries}
+        if len(durations):
+            stats.update({'mean_ms': float(durations.mean()), 'median_ms': float(np.median(durations)),
+                          'p99_ms': float(np.percentile(durations, 99)), 'max_ms': float(durations.max())})
+        return stats
+
+    def __del__(self):
+        if hasattr(self, '_thread'):
+            self.stop()
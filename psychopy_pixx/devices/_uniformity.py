@@ -0,0 +1,123 @@
+import numpy as np
+
+
+"""
+Spatial luminance correction from uniformity measurements.
+
+After the global linearization by the CLUT, the luminance at every screen position is approximately
+linear in the desired value v, L_p(v) = a_p + b_p * v, with position-dependent offset a_p and gain b_p.
+A gain/offset correction v' = offset + gain * v before the CLUT lookup maps every position to the same
+target luminance, the largest range that all positions can show.
+The correction maps are coarse grids over the window, interpolated per pixel by the GPU's linear
+texture filtering; `sample_map` and `correct_uniformity` are the NumPy reference of the shaders.
+Maps have shape (4, rows, columns) with gun 0 for luminance (M16) and guns 1-3 for red, green,
+and blue (C48), like the CLUT. Row 0 is at the bottom of the window.
+"""
+
+MAP_SIZE = (16, 16)
+
+
+def _desired_values(levels, levelsPre, lumsPre):
+    """ Desired values (0 to 1) of the global linearization that correspond to grey levels, per gun. """
+    lumsPre = np.atleast_2d(np.asarray(lumsPre, dtype=float))
+    values = np.empty((len(lumsPre), len(levels)))
+    for gun, lums in enumerate(lumsPre):
+        span = lums[-1] - lums[0]
+        values[gun] = (np.interp(levels, levelsPre, lums) - lums[0]) / span if span > 0 else np.asarray(levels)
+    return values
+
+
+def fit_uniformity(levels, lums, levelsPre=None, lumsPre=None):
+    """ Return the gain and offset correction per position and gun, each of shape (positions, 4).
+
+    Parameters
+    ----------
+    levels : grey levels of the uniformity measurement
+    lums : luminances of shape (positions, 4, levels), e.g. of `pixxcalibrate uniformity`
+    levelsPre, lumsPre : the calibration's luminance measurement, if the uniformity was measured
+        without linearization. Then the grey levels are converted to the desired values of the CLUT.
+    """
+    lums = np.asarray(lums, dtype=float)
+    if levelsPre is None:
+        values = np.broadcast_to(np.asarray(levels, dtype=float), lums.shape[1:])
+    else:
+        values = _desired_values(levels, levelsPre, lumsPre)
+        values = np.broadcast_to(values, lums.shape[1:]) if len(values) == 1 else values
+    # least squares lines L_p(v) = a_p + b_p * v for all positions and guns at once
+    values_centered = values - values.mean(axis=-1, keepdims=True)
+    lums_mean = lums.mean(axis=-1)
+    slopes = (values_centered * (lums - lums_mean[..., None])).sum(axis=-1) / (values_centered**2).sum(axis=-1)
+    intercepts = lums_mean - slopes * values.mean(axis=-1)
+
+    # the target is the range that all positions can show
+    target_low = intercepts.max(axis=0)
+    target_high = (intercepts + slopes).min(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gains = (target_high - target_low) / slopes
+        offsets = (target_low - intercepts) / slopes
+    # guns without measurements, e.g. colors of a luminance-only measurement, use the luminance correction
+    unmeasured = ~np.all(slopes > 0, axis=0)
+    if unmeasured[0]:
+        raise ValueError("Expects increasing luminances at every position.")
+    gains[:, unmeasured] = gains[:, [0]]
+    offsets[:, unmeasured] = offsets[:, [0]]
+    return gains, offsets
+
+
+def _polynomial_terms(x, y, degree):
+    return np.stack([x**(total - power) * y**power
+                     for total in range(degree + 1) for power in range(total + 1)], axis=-1)
+
+
+def interpolate_map(values, positions, size=MAP_SIZE, degree=2) -> np.ndarray:
+    """ Interpolate values (positions, 4) at positions (x, y in norm units) to a map of shape (4, rows, columns).
+
+    Fits a smooth polynomial surface by least squares, which also extrapolates to the screen edges.
+    The degree is reduced if there are too few positions (6 for quadratic, 3 for linear surfaces).
+    """
+    values, positions = np.asarray(values, dtype=float), np.asarray(positions, dtype=float)
+    while (degree + 1) * (degree + 2) // 2 > len(positions):
+        degree -= 1
+    rows, columns = size
+    # texel centers in norm units
+    x = 2 * (np.arange(columns) + 0.5) / columns - 1
+    y = 2 * (np.arange(rows) + 0.5) / rows - 1
+    x, y = np.meshgrid(x, y)
+    coefficients, *_ = np.linalg.lstsq(_polynomial_terms(positions[:, 0], positions[:, 1], degree), values, rcond=None)
+    surface = _polynomial_terms(x.ravel(), y.ravel(), degree) @ coefficients
+    return surface.T.reshape(values.shape[1], rows, columns)
+
+
+def uniformity_maps(levels, lums, positions, levelsPre=None, lumsPre=None, size=MAP_SIZE):
+    """ Gain and offset maps, each of shape (4, rows, columns), from uniformity measurements. """
+    gains, offsets = fit_uniformity(levels, lums, levelsPre, lumsPre)
+    return (interpolate_map(gains, positions, size).astype(np.float32),
+            interpolate_map(offsets, positions, size).astype(np.float32))
+
+
+def sample_map(uniformity_map, height: int, width: int) -> np.ndarray:
+    """ Sample a map at the pixel centers like a linearly filtered, edge-clamped texture.
+
+    Returns an array of shape (4, height, width) with row 0 at the bottom of the window.
+    """
+    uniformity_map = np.asarray(uniformity_map, dtype=np.float32)
+    _, rows, columns = uniformity_map.shape
+
+    def axis_weights(n_pixels, n_texels):
+        texel = np.clip((np.arange(n_pixels) + 0.5) / n_pixels * n_texels - 0.5, 0, n_texels - 1)
+        lower = np.floor(texel).astype(int)
+        upper = np.minimum(lower + 1, n_texels - 1)
+        return lower, upper, (texel - lower).astype(np.float32)
+
+    row_lower, row_upper, row_weight = axis_weights(height, rows)
+    column_lower, column_upper, column_weight = axis_weights(width, columns)
+    # separable bilinear interpolation: first along columns, then along rows
+    along_columns = (uniformity_map[:, :, column_lower] * (1 - column_weight)
+                     + uniformity_map[:, :, column_upper] * column_weight)
+    return (along_columns[:, row_lower] * (1 - row_weight[:, None])
+            + along_columns[:, row_upper] * row_weight[:, None])
+
+
+def correct_uniformity(values, gain, offset) -> np.ndarray:
+    """ Apply sampled gain and offset (see sample_map) to desired values, like the shaders before the CLUT. """
+    return np.clip(offset + gain * values, 0, 1)
@@ -1,5 +1,7 @@
 import time
 
+from psychopy_pixx._profiling import PROFILER
+
 
 class ResponsePixx:
     NAME_BY_INCODE = {65534: 'red', 65533: 'yellow', 65531: 'green', 65527: 'blue', 65519: 'white'}
@@ -28,8 +30,11 @@ class ResponsePixx:
             self.light_intensity = lights
         else:
             self.button_lights = []
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
 
+    def _update_register_cache(self):
+        with PROFILER.span('updateRegisterCache', 'responsepixx'):
+            self._pixxdevice.updateRegisterCache()
 
     def _buttons_from_output_bits(self, bitmask) -> list:
         buttons = []
@@ -49,13 +54,13 @@ class ResponsePixx:
 
     @property
     def button_state(self) -> dict:
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
         bitmask = self._pixxdevice.din.getValue()
         return self._state_from_input_bits(bitmask)
 
     @property
     def button_lights(self) -> list:
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
         bitmask = self._pixxdevice.din.getOutputValue()
         return self._buttons_from_output_bits(bitmask)
 
@@ -68,11 +73,11 @@ class ResponsePixx:
         for name in button_names:
             bitmask = bitmask | ResponsePixx.OUTCODE_BY_NAME[name]
         self._pixxdevice.din.setOutputValue(str(bitmask))
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
 
     @property
     def light_intensity(self) -> float:
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
         return self._pixxdevice.din.getOutputStrength()
 
     @light_intensity.setter
@@ -81,7 +86,7 @@ class ResponsePixx:
             return
         
         self._pixxdevice.din.setOutputStrength(value)
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
 
     def start(self):
         # log voltage changes and thus button push and release
@@ -90,14 +95,14 @@ class ResponsePixx:
         self._old_state = self.button_state
         self._pixxdevice.din.startDinLog()
         self._pixxdevice.din.setDebounce(True)  # smooth responses for 30ms to avoid noise
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
 
     def getKeys(self):
         if self._starttime is None:
             raise RuntimeError("Event watching not started. Call .start() first!")
 
         self._pixxdevice.din.getDinLogStatus(self._log)
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
         num_events = self._log["newLogFrames"]
 
         events = []
@@ -138,7 +143,7 @@ class ResponsePixx:
         if self._starttime is None:
             raise RuntimeError("Event watching not started. Call .start() first!")
         self._pixxdevice.din.stopDinLog()
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
         self._log = None
         self._starttime = None
         self._old_state = None
@@ -9,12 +9,21 @@
     uniform sampler2D fbo;
     uniform sampler2D clut;
     uniform bool gamma_correction_flag;
+    uniform sampler2D gain_map;
+    uniform sampler2D offset_map;
+    uniform bool uniformity_flag;
     vec3 index;
     vec2 coords;
 
     void main() {
         vec4 fboFrag = texture2D(fbo, gl_TexCoord[0].st);
-        index = fboFrag.rgb * 65535.0;
+        index = fboFrag.rgb;
+        if (uniformity_flag) {
+            /* spatial gain and offset, interpolated linearly between the texels of a coarse map */
+            index = clamp(texture2D(offset_map, gl_TexCoord[0].st).rgb
+                          + texture2D(gain_map, gl_TexCoord[0].st).rgb * index, 0.0, 1.0);
+        }
+        index = index * 65535.0;
         if (gamma_correction_flag) {
             for (int i=0; i < 3; i++) {
                 /* texture coords range 0..1
@@ -0,0 +1,12 @@
+/* Passthrough of pre-encoded frames
+ *
+ * Copies a frame, already encoded to the packed output of the M16 or C48 shader
+ * (see encode_frames), to the screen. The frame texture bypasses the FBO.
+ * Frames are stored with row 0 at the top and thus flipped vertically.
+ */
+    uniform sampler2D frame;
+
+    void main() {
+        vec2 coords = vec2(gl_TexCoord[0].s, 1.0 - gl_TexCoord[0].t);
+        gl_FragColor = vec4(texture2D(frame, coords).rgb, 1.0);
+    }
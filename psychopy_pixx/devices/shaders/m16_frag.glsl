@@ -9,12 +9,21 @@
     uniform sampler2D fbo;
     uniform sampler2D clut;
     uniform bool gamma_correction_flag;
+    uniform sampler2D gain_map;
+    uniform sampler2D offset_map;
+    uniform bool uniformity_flag;
     float color;
     vec2 coords;
     
     void main() {
         vec4 fboFrag = texture2D(fbo, gl_TexCoord[0].st);
-        color = fboFrag.r * 65535.0;
+        color = fboFrag.r;
+        if (uniformity_flag) {
+            /* spatial gain and offset, interpolated linearly between the texels of a coarse map */
+            color = clamp(texture2D(offset_map, gl_TexCoord[0].st).a
+                          + texture2D(gain_map, gl_TexCoord[0].st).a * color, 0.0, 1.0);
+        }
+        color = color * 65535.0;
         if (gamma_correction_flag) {
             /* texture coords range 0..1
                Pixels range [0-1/255, 1/255-2/255, ..., 254/255-1]
@@ -1,3 +1,4 @@
+import hashlib
 from pathlib import Path
 
 from psychopy.visual import shaders
@@ -6,6 +7,13 @@ from OpenGL import GL
 import ctypes
 import numpy as np
 
+from ._clut import CLUT_METHODS, invert_luminances
+from ._frames import FRAME_MODES, encode_frames, encode_frames_file, open_frames
+from ._uniformity import MAP_SIZE, uniformity_maps
+from ._register_monitor import FINGERPRINT_KEYS, RegisterMonitor, register_getter
+from psychopy_pixx._profiling import PROFILER
+from psychopy_pixx._sidecar import json_normalized, load_calib_entry, safe_name
+
 
 def load_shader_source(mode):
     src = Path(__file__).parent / 'shaders' / f'{mode.lower()}_frag.glsl'
@@ -40,22 +48,32 @@ class ViewPixx:
         self._shader_progs = {'C24': win._progFBOtoFrame}
         self._clut_texture = None
         self._shader_clut = None
+        self._uniformity_textures = None
+        self._uniformity_maps = None
+        self._frame_prog = None
+        self._frame_textures = []
+        self._frame_counter = 0
+        self._shown_frame = None
+        self.n_frame_textures = 2  # double buffering of frame uploads
         self._setup_shader()
 
     
     def correct_luminance(self, gamma=1.0, assert_register=True):
         if assert_register:
            try:
-               calib_reg = self.window.monitor.currentCalib['viewpixx']['register'] 
-           except KeyError:
+               calib_reg = load_calib_entry(self.window.monitor, 'viewpixx')['register']
+           except (KeyError, TypeError):
                raise ValueError("No register data found in calibration file.\n"
                     "This means, the calibration was probably not created with the psychopy-pixx tools.\n"
                     "Hide this error with `assert_register=False`.")
-           register = self.register
-           for k, v in calib_reg.items():
+           register = json_normalized(self.register)  # as stored in the calibration, e.g. tuples as lists
+           for k, v in json_normalized(calib_reg).items():
                assert register[k] == v, f"Expects {k}={v}, got {k}={register[k]}"
                 
-        self.shader_clut = interp_clut(self.window.monitor, gamma)
+        clut = load_clut(self.window.monitor, gamma)
+        if clut is None:
+            clut = interp_clut(self.window.monitor, gamma)
+        self.shader_clut = clut
         
     @property
     def shader_clut(self) -> np.ndarray:
@@ -85,20 +103,145 @@ class ViewPixx:
                             GL.GL_TEXTURE_WRAP_T: GL.GL_CLAMP_TO_EDGE})
         
         self._setup_shader()  # update clut variables in shader
-        
-        
+
+    def correct_uniformity(self, size=MAP_SIZE):
+        """ Correct the spatial luminance non-uniformity measured with `pixxcalibrate uniformity`.
+
+        Gain and offset maps of the given size (rows, columns) are fitted to the uniformity
+        measurements of the current calibration and applied per pixel before the CLUT lookup.
+        Call after correct_luminance.
+        """
+        monitor = self.window.monitor
+        lums = load_calib_entry(monitor, 'lumsUniformity')
+        if lums is None:
+            raise ValueError("No uniformity measurements found in calibration file.\n"
+                             "Measure them with `pixxcalibrate uniformity`.")
+        if monitor.currentCalib.get('linearizedUniformity', False):
+            levelsPre = lumsPre = None
+        else:
+            levelsPre, lumsPre = load_calib_entry(monitor, 'levelsPre'), load_calib_entry(monitor, 'lumsPre')
+        self.uniformity_maps = uniformity_maps(monitor.currentCalib['levelsUniformity'], lums,
+                                               monitor.currentCalib['positionsUniformity'],
+                                               levelsPre, lumsPre, size)
+
+    @property
+    def uniformity_maps(self):
+        """ Gain and offset maps, each of shape (4, rows, columns), see _uniformity.py. """
+        return self._uniformity_maps
+
+    @uniformity_maps.setter
+    def uniformity_maps(self, maps):
+        if maps is not None and (len(maps) != 2 or np.shape(maps[0]) != np.shape(maps[1])
+                                 or np.ndim(maps[0]) != 3 or len(maps[0]) != 4):
+            raise ValueError(f"Expects (gain, offset) maps of shape (4, rows, columns), got {np.shape(maps)}.")
+        self._uniformity_maps = maps
+
+        if self._uniformity_textures is not None:  # delete old textures
+            for texture in self._uniformity_textures:
+                gltools.deleteTexture(texture)
+            self._uniformity_textures = None
+
+        if maps is not None:  # add new textures
+            textures = []
+            for uniformity_map in maps:
+                # swap (LRGB, rows, columns) to (rows, columns, RGBA) for texture
+                _, rows, columns = np.shape(uniformity_map)
+                ctype_map = np.ascontiguousarray(
+                    np.moveaxis(np.asarray(uniformity_map)[[1, 2, 3, 0]], 0, -1), dtype='float32').ctypes
+                textures.append(gltools.createTexImage2D(
+                    columns, rows, target=GL.GL_TEXTURE_2D, internalFormat=GL.GL_RGBA32F,
+                    pixelFormat=GL.GL_RGBA, dataType=GL.GL_FLOAT, data=ctype_map,
+                    texParams={ GL.GL_TEXTURE_MIN_FILTER: GL.GL_LINEAR, 
+                                GL.GL_TEXTURE_MAG_FILTER: GL.GL_LINEAR, 
+                                GL.GL_TEXTURE_WRAP_S: GL.GL_CLAMP_TO_EDGE, 
+                                GL.GL_TEXTURE_WRAP_T: GL.GL_CLAMP_TO_EDGE}))
+            self._uniformity_textures = textures
+
+        self._setup_shader()  # update uniformity variables in shader
+
+    def show_frame(self, frame: np.ndarray):
+        """ Show an encoded frame instead of the window's content at the next flip.
+
+        The frame, e.g. of encode_frames or open_frames, is uploaded to the next texture
+        of a small pool and copied to the screen without FBO, CLUT, or high-resolution shader.
+        Frames of (memory-mapped) sequences are uploaded without copying.
+        """
+        width, height = self.window.frameBufferSize
+        if frame.shape != (height, width, 3) or frame.dtype != np.uint8:
+            raise ValueError(f"Expects encoded frame as uint8 array of shape {(height, width, 3)}, "
+                             f"got {frame.dtype} {frame.shape}.")
+        if not self._frame_textures or (self._frame_textures[0].width, self._frame_textures[0].height) != (width, height):
+            self._delete_frame_textures()
+            self._frame_textures = [gltools.createTexImage2D(
+                width, height, target=GL.GL_TEXTURE_2D, internalFormat=GL.GL_RGB8,
+                pixelFormat=GL.GL_RGB, dataType=GL.GL_UNSIGNED_BYTE, data=None,
+                texParams={ GL.GL_TEXTURE_MIN_FILTER: GL.GL_NEAREST, 
+                            GL.GL_TEXTURE_MAG_FILTER: GL.GL_NEAREST, 
+                            GL.GL_TEXTURE_WRAP_S: GL.GL_CLAMP_TO_EDGE, 
+                            GL.GL_TEXTURE_WRAP_T: GL.GL_CLAMP_TO_EDGE})
+                for _ in range(self.n_frame_textures)]
+        texture = self._frame_textures[self._frame_counter % len(self._frame_textures)]
+        self._frame_counter += 1
+
+        frame = np.ascontiguousarray(frame)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, texture.name)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        GL.glTexSubImage2D(GL.GL_TEXTURE_2D, 0, 0, 0, width, height, GL.GL_RGB, GL.GL_UNSIGNED_BYTE,
+                           frame.ctypes.data_as(ctypes.POINTER(GL.GLubyte)))
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+        self._shown_frame = texture
+
+    def play_frames(self, frames, repeat=1):
+        """ Show encoded frames, one per flip, and yield the flip times.
+
+        usage::
+            frames = open_frames('noise_m16.npy')  # see encode_frames_file
+            for flip_time in vpixx.play_frames(frames):
+                if event.getKeys(['escape']):
+                    break
+        """
+        for _ in range(repeat):
+            for frame in frames:
+                self.show_frame(frame)
+                yield self.window.flip()
+
+    def _delete_frame_textures(self):
+        for texture in self._frame_textures:
+            gltools.deleteTexture(texture)
+        self._frame_textures = []
+        self._shown_frame = None
+
     def _prepareFBOrender(self):
+        if self._shown_frame is not None:
+            if self._frame_prog is None:
+                self._frame_prog = shaders.compileProgram(shaders.vertSimple, load_shader_source('frame'))
+                GL.glUseProgram(self._frame_prog)
+                GL.glUniform1i(GL.glGetUniformLocation(self._frame_prog, b"frame"), 2)
+            GL.glUseProgram(self._frame_prog)
+            GL.glActiveTexture(GL.GL_TEXTURE2)
+            gltools.bindTexture(self._shown_frame, unit=2, enable=True)
+            return
         prog = self._shader_progs[self.mode]
         GL.glUseProgram(prog)
         if self._clut_texture:
             # gltools.bindTexture sets the active texture incorrectly 
             GL.glActiveTexture(GL.GL_TEXTURE1)
             gltools.bindTexture(self._clut_texture, unit=1, enable=True)
+        if self._uniformity_textures:
+            for unit, texture in enumerate(self._uniformity_textures, start=2):
+                GL.glActiveTexture(GL.GL_TEXTURE0 + unit)
+                gltools.bindTexture(texture, unit=unit, enable=True)
                     
         
     def _finishFBOrender(self):
-        if self._clut_texture:
-            gltools.unbindTexture(self._clut_texture)
+        if self._shown_frame is not None:
+            gltools.unbindTexture(self._shown_frame)
+            self._shown_frame = None  # show the window's content again at the next flip
+        else:
+            if self._clut_texture:
+                gltools.unbindTexture(self._clut_texture)
+            for texture in self._uniformity_textures or []:
+                gltools.unbindTexture(texture)
         GL.glUseProgram(0)
 
     def _afterFBOrender(self):
@@ -130,10 +273,16 @@ class ViewPixx:
             else:
                 GL.glUniform1i(GL.glGetUniformLocation(prog, b"clut"), 1)
                 GL.glUniform1i(GL.glGetUniformLocation(prog, b"gamma_correction_flag"), 1)
+            if self._uniformity_textures is None:
+                GL.glUniform1i(GL.glGetUniformLocation(prog, b"uniformity_flag"), 0)
+            else:
+                GL.glUniform1i(GL.glGetUniformLocation(prog, b"gain_map"), 2)
+                GL.glUniform1i(GL.glGetUniformLocation(prog, b"offset_map"), 3)
+                GL.glUniform1i(GL.glGetUniformLocation(prog, b"uniformity_flag"), 1)
             GL.glUseProgram(0)
         else:
-            if self._clut_texture is not None:
-                raise ValueError(f"Software clut is only supported with"
+            if self._clut_texture is not None or self._uniformity_textures is not None:
+                raise ValueError(f"Software clut and uniformity correction are only supported with"
                                  f" high luminance-resolution modes {HIGH_RES_MODES}, got '{mode}'")
         
     @property
@@ -148,16 +297,20 @@ class ViewPixx:
         self._window._finishFBOrender = self._finishFBOrender
         self._window._afterFBOrender = self._afterFBOrender
 
+    def _update_register_cache(self):
+        with PROFILER.span('updateRegisterCache', 'viewpixx'):
+            self._pixxdevice.updateRegisterCache()
+
     @property
     def mode(self):
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
         return self._pixxdevice.getVideoMode()
 
     @mode.setter
     def mode(self, value):
         if value != self.mode:
             self._pixxdevice.setVideoMode(value)
-            self._pixxdevice.updateRegisterCache() 
+            self._update_register_cache()
 
         self._setup_shader()
         
@@ -165,90 +318,117 @@ class ViewPixx:
     @property
     def size(self) -> (int, int):
         """ Visible pixels (width, height) """
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
         return (self._pixxdevice.getVisiblePixelsPerHorizontalLine(),
                 self._pixxdevice.getVisibleLinePerVerticalFrame())
     
     @property
     def backlight(self) -> int:
         """ Intensity between 0 and 255 """
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
         return self._pixxdevice.getBacklightIntensity()
     
     @backlight.setter
     def backlight(self, value):
         if self.backlight != value:
             self._pixxdevice.setBacklightIntensity(value)
-            self._pixxdevice.updateRegisterCache()
+            self._update_register_cache()
       
     @property
     def scanning_backlight(self) -> bool:
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
         return self._pixxdevice.isScanningBackLightEnabled()
     
     @scanning_backlight.setter
     def scanning_backlight(self, value):
         if self.scanning_backlight != value:
             self._pixxdevice.setScanningBackLight(value)
-            self._pixxdevice.updateRegisterCache()
+            self._update_register_cache()
             
     @property
     def register(self) -> dict:
         setters = (attr for attr in dir(self._pixxdevice)
                    if attr.startswith('set'))
         reg = {}
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
         for setter in setters:
             key = setter[3:]
             if key.startswith("Vesa"):  # avoid problem: vesa registers returned "random" entries
                 continue
-            if hasattr(self._pixxdevice, 'get' + key):
-                reg[key] = getattr(self._pixxdevice, 'get' + key)()
-            elif hasattr(self._pixxdevice, f'is{key}Enabled'):
-                reg[key] = getattr(self._pixxdevice, f'is{key}Enabled')()
+            getter = register_getter(self._pixxdevice, key)
+            if getter is not None:
+                reg[key] = getter()
         return reg
     
     @register.setter
     def register(self, reg: dict):
         for key, value in reg.items():
             getattr(self._pixxdevice, 'set' + key, value)
-        self._pixxdevice.updateRegisterCache()
+        self._update_register_cache()
 
     def use_calibration_register(self):
-        self.register = self.window.monitor.currentCalib['viewpixx']['register'] 
-    
+        self.register = load_calib_entry(self.window.monitor, 'viewpixx')['register']
 
-def interp_clut(monitor, gamma):
-    lums = monitor.getLumsPre()
-    levels = monitor.getLevelsPre()
-    
-    if lums.shape[0] != 4 or lums.shape[1] != levels.shape[0]:
-        raise ValueError(f"Expects matching levels and luminances,\n"
-                         f"got {levels.shape} != {lums.shape}.")
-    
-    lums = (lums - lums[:, [0]]) / (lums[:, [-1]] - lums[:, [0]] + 1e-8)
-    
-    is_lum_incr = np.all(np.diff(lums) >= 0, axis=0)  # all guns have to be increasing
-    if not np.all(is_lum_incr):
-        lums = np.c_[lums[:, 0], lums[:, 1:][:, is_lum_incr]]
-        levels = np.r_[levels[0], levels[1:][is_lum_incr]]
-        print(f"WARNING: Expects increasing colors, got {len(is_lum_incr) - is_lum_incr.sum()} decreases and dropped them.")
-    
-    if not np.all(np.diff(levels) >= 0):
-        raise ValueError(f"Expects levels to be increasing, got decreases.")
-    if np.all(levels[0] != 0):
-        raise ValueError(f"Expects levels starting with 0, got {levels[0]}")
-    if np.all(levels[-1] == 255):
-        levels = levels / 255
-    elif np.any(levels[-1] != 1):
-        raise ValueError(f"Expects levels ending with 1.0 or 255, got {levels[-1]}")
+    def register_monitor(self, keys=FINGERPRINT_KEYS, min_interval=1., on_mismatch='raise') -> RegisterMonitor:
+        """ Monitor that the register keeps the state of the calibration during the session.
+
+        See RegisterMonitor for the parameters, e.g. check between trials with .check().
+        """
+        try:
+            calib_reg = load_calib_entry(self.window.monitor, 'viewpixx')['register']
+        except (KeyError, TypeError):
+            raise ValueError("No register data found in calibration file.\n"
+                             "This means, the calibration was probably not created with the psychopy-pixx tools.")
+        return RegisterMonitor(self._pixxdevice, calib_reg, keys, min_interval, on_mismatch)
     
-    nguns = lums.shape[0]
-    desired_lums = np.linspace(0, 1, 2**16, endpoint=True)
-    desired_levels = np.empty((nguns, len(desired_lums)))
-    for gun in range(4):
-        desired_levels[gun, :] = (np.interp(x=desired_lums, xp=lums[gun], fp=levels))**gamma # = (invertedfunction)**gamma  (if gamma == 1.0 it is just a linearisation)
-    return desired_levels
+
+def interp_clut(monitor, gamma, method=None):
+    """ Invert the monitor's luminance measurements to a 16-bit CLUT.
+
+    The cleanup method defaults to the one stored in the calibration (see `pixxcalibrate refit`).
+    """
+    if method is None:
+        method = monitor.currentCalib.get('clut_method', 'drop')
+    return invert_luminances(load_calib_entry(monitor, 'levelsPre'), load_calib_entry(monitor, 'lumsPre'), gamma, method)
+
+
+def _measurement_hash(monitor) -> str:
+    """ Short hash of the current calibration's luminance measurements and cleanup method. """
+    digest = hashlib.sha1()
+    for key in ('levelsPre', 'lumsPre'):
+        digest.update(np.ascontiguousarray(load_calib_entry(monitor, key), dtype=float).tobytes())
+    digest.update(str(monitor.currentCalib.get('clut_method', 'drop')).encode())
+    return digest.hexdigest()[:12]
+
+
+def clut_cache_file(monitor, gamma) -> Path:
+    """ Path of the cached CLUT for the monitor's current calibration.
+
+    The file name contains a hash of the measurements, such that a calibration that is
+    measured again under the same name does not load the CLUT of the old measurements.
+    """
+    from psychopy.monitors.calibTools import monitorFolder
+
+    return (Path(monitorFolder) / f'{monitor.name}_clut'
+            / f'{safe_name(monitor.currentCalibName)}_gamma{gamma:g}_{_measurement_hash(monitor)}.npy')
+
+
+def load_clut(monitor, gamma):
+    """ Load the cached CLUT of the current calibration or return None if there is none. """
+    cache_file = clut_cache_file(monitor, gamma)
+    if not cache_file.exists():
+        return None
+    return np.load(cache_file)
+
+
+def save_clut(monitor, gamma, clut):
+    cache_file = clut_cache_file(monitor, gamma)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    # remove CLUTs of earlier measurements with the same calibration name
+    for old_file in cache_file.parent.glob(f'{safe_name(monitor.currentCalibName)}_gamma{gamma:g}_*.npy'):
+        old_file.unlink()
+    np.save(cache_file, np.asarray(clut, dtype='float32'))
+    return cache_file
 
                         
                         
@@ -0,0 +1,89 @@
+import os
+import pty
+import select
+import threading
+import time
+import tty
+
+import numpy as np
+
+
+class FakeS470(object):
+    """ Simulated S470 photometer behind a pseudo terminal.
+
+    Answers the RNG, SRT, and REA commands like the device, <CR> <LF> value <CR> <LF> ...
+    Responses can be written in small pieces with delays, such that readings arrive split across reads.
+    usage::
+        fake = FakeS470(write_size=3)
+        phot = S470(fake.port)
+        lums = phot.measure(10)  # equal to fake.sent[-10:]
+        fake.close()
+    :parameters:
+        luminance: float
+            mean luminance of the readings, which vary by a small deterministic ramp.
+        write_size: int
+            bytes per write of the responses (default: complete responses).
+        write_delay: float
+            seconds between the writes of a response.
+        muted: bool
+            ignore commands, like a disconnected device.
+        garbled: bool
+            respond with unparsable readings.
+    """
+    terminator = b'\r\n'
+
+    def __init__(self, luminance=42.5, write_size=None, write_delay=0.001, muted=False, garbled=False):
+        self.luminance = luminance
+        self.muted = muted
+        self.garbled = garbled
+        self.write_size = write_size
+        self.write_delay = write_delay
+        self.commands = []
+        self.sent = []
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='fake S470', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        buffer = b''
+        while not self._stop_event.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.01)
+            if not ready:
+                continue
+            buffer += os.read(self._master, 1024)
+            while self.terminator in buffer:
+                line, buffer = buffer.split(self.terminator, 1)
+                self._respond(line.decode())
+
+    def _respond(self, command: str):
+        self.commands.append(command)
+        if self.muted:
+            return
+        name, *args = command.split()
+        if name == 'REA':
+            n_measures = int(args[0]) if args else 1
+            values = self.luminance + 0.001 * (len(self.sent) + np.arange(n_measures))
+            self.sent.extend(values)
+            response = ''.join(f'{value:.4E}\r\n' for value in values)
+            if self.garbled:
+                response = response.replace('E', '#')
+        else:  # RNG, SRT
+            response = 'OK\r\n'
+        self._write(b'\r\n' + response.encode())
+
+    def _write(self, data: bytes):
+        if self.write_size is None:
+            os.write(self._master, data)
+            return
+        for start in range(0, len(data), self.write_size):
+            os.write(self._master, data[start:start + self.write_size])
+            time.sleep(self.write_delay)
+
+    def close(self):
+        self._stop_event.set()
+        self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from psychopy_pixx.calibration._campaign import (config_key, config_name, expand_grid, load_checkpoint,
+                                                  needs_warmup, plan_campaign, save_checkpoint)
+
+
+def test_expand_grid():
+    configs = expand_grid({'bg_intensity': [255, 128], 'scanning': [True, False], 'mode': ['M16', 'C48']})
+    assert len(configs) == 8
+    assert {'scanning': False, 'bg_intensity': 128, 'mode': 'C48'} in configs
+    assert expand_grid({}) == [{'scanning': True, 'bg_intensity': 255, 'mode': 'M16'}]
+    assert expand_grid({'bg_intensity': 100}) == [{'scanning': True, 'bg_intensity': 100, 'mode': 'M16'}]
+
+
+@pytest.mark.parametrize('grid', [{'backlight': [255]}, {'mode': ['C24']}])
+def test_expand_grid_rejects(grid):
+    with pytest.raises(ValueError):
+        expand_grid(grid)
+
+
+def test_plan_campaign():
+    configs = expand_grid({'bg_intensity': [128, 255, 64], 'scanning': [False, True], 'mode': ['M16', 'C48']})
+    plan = plan_campaign(configs)
+    assert sorted(map(config_key, plan)) == sorted(map(config_key, configs))
+    assert [(cfg['scanning'], cfg['bg_intensity']) for cfg in plan[::2]] == [
+        (True, 255), (True, 128), (True, 64), (False, 64), (False, 128), (False, 255)]
+    assert [cfg['mode'] for cfg in plan[:2]] == ['C48', 'M16']  # video modes innermost
+    # one warm-up per scanning mode and intensity
+    assert sum(needs_warmup(previous, cfg) for previous, cfg in zip([None] + plan[:-1], plan)) == 6
+
+
+def test_config_name():
+    assert config_name('june', {'scanning': False, 'bg_intensity': 128, 'mode': 'M16'}) == 'june M16 normal backlight 128'
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = tmp_path / 'campaign.json.checkpoint.json'
+    assert load_checkpoint(path) == {'name': None, 'completed': {}}
+    completed = {config_key(cfg): f'june {n}' for n, cfg in enumerate(expand_grid({'bg_intensity': [255, 128]}))}
+    save_checkpoint(path, 'june', completed)
+    assert load_checkpoint(path) == {'name': 'june', 'completed': completed}
+    assert not (tmp_path / 'campaign.json.checkpoint.json.tmp').exists()
+    assert json.loads(path.read_text())['name'] == 'june'
@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+
+from psychopy_pixx.devices._clut import (CLUT_METHODS, CLUT_SIZE, _block_knots, _pchip_slopes, invert_luminances,
+                                         isotonic_regression, monotone_inverse)
+
+
+def sequential_isotonic_regression(values):
+    means, sizes = [], []
+    for value in values:
+        mean, size = value, 1
+        while means and means[-1] >= mean:
+            prev_mean, prev_size = means.pop(), sizes.pop()
+            mean = (prev_mean * prev_size + mean * size) / (prev_size + size)
+            size += prev_size
+        means.append(mean)
+        sizes.append(size)
+    return np.repeat(means, sizes)
+
+
+def test_isotonic_regression():
+    rng = np.random.default_rng(0)
+    y = np.linspace(0, 1, 200)**2 + rng.normal(0, 0.05, (4, 200))
+    fitted = isotonic_regression(y)
+    assert np.all(np.diff(fitted, axis=1) >= 0)
+    for row, fitted_row in zip(y, fitted):
+        np.testing.assert_allclose(fitted_row, sequential_isotonic_regression(row))
+    np.testing.assert_allclose(isotonic_regression([3., 2., 1., 0.]), [[1.5] * 4])
+
+
+@pytest.mark.parametrize('method', CLUT_METHODS)
+def test_invert_linear_luminances(method):
+    levels = np.linspace(0, 1, 11)
+    clut = invert_luminances(levels, np.repeat(levels[np.newaxis], 4, axis=0), method=method)
+    assert clut.shape == (4, CLUT_SIZE)
+    np.testing.assert_allclose(clut, np.repeat(np.linspace(0, 1, CLUT_SIZE)[np.newaxis], 4, axis=0))
+
+
+@pytest.mark.parametrize('method', CLUT_METHODS)
+def test_invert_gamma_luminances(method):
+    levels = np.linspace(0, 255, 256)
+    lums = np.repeat((levels / 255)[np.newaxis]**2.2 * 100 + 0.5, 4, axis=0)
+    clut = invert_luminances(levels, lums, method=method)
+    desired_lums = np.linspace(0, 1, CLUT_SIZE)
+    np.testing.assert_allclose(clut[0]**2.2, desired_lums, atol=2e-3)
+
+
+def test_drop_decreases():
+    levels = np.linspace(0, 1, 5)
+    lums = np.repeat([[0., 0.3, 0.2, 0.6, 1.]], 4, axis=0)
+    clut = invert_luminances(levels, lums, method='drop')
+    # the decreasing level 0.5 is dropped, 0.2 luminance lies between levels 0 and 0.25
+    assert clut[0, int(0.2 * (CLUT_SIZE - 1))] == pytest.approx(0.25 * 0.2 / 0.3, abs=1e-4)
+
+
+def test_cummax_decreases():
+    levels = np.linspace(0, 1, 5)
+    lums = np.repeat([[0., 0.3, 0.2, 0.6, 1.]], 4, axis=0)
+    clut = invert_luminances(levels, lums, method='cummax')
+    assert np.all(np.diff(clut, axis=1) >= 0)
+    # the decreasing level is clipped to 0.3, luminances up to 0.3 map below level 0.25
+    assert clut[0, int(0.3 * (CLUT_SIZE - 1))] <= 0.25
+
+
+def test_invert_rejects_bad_levels():
+    with pytest.raises(ValueError):
+        invert_luminances(np.linspace(0.1, 1, 5), np.repeat([np.linspace(0, 1, 5)], 4, axis=0))
+    with pytest.raises(ValueError):
+        invert_luminances(np.linspace(0, 1, 5), np.zeros((3, 5)))
+
+
+def test_block_knots():
+    levels = np.linspace(0, 1, 6)
+    fitted = np.array([0., 0.2, 0.2, 0.2, 0.9, 0.9])
+    knot_lums, knot_levels = _block_knots(levels, fitted)
+    np.testing.assert_allclose(knot_lums, [0., 0.2, 0.9])
+    # the inner block at its mean level, the last block at the end level
+    np.testing.assert_allclose(knot_levels, [0., 0.4, 1.])
+
+
+def test_pchip_slopes():
+    interpolate = pytest.importorskip('scipy.interpolate')
+    rng = np.random.default_rng(1)
+    series = [(np.sort(rng.random(8)), np.cumsum(rng.random(8))) for _ in range(2)]
+    x = np.concatenate([x + 10 * n for n, (x, _) in enumerate(series)])
+    y = np.concatenate([y for _, y in series])
+    slopes = _pchip_slopes(x, y, np.repeat([0, 1], 8))
+    for n, (series_x, series_y) in enumerate(series):
+        expected = interpolate.PchipInterpolator(series_x, series_y).derivative()(series_x)
+        # scipy's end point slopes use a three point formula, compare the inner knots
+        np.testing.assert_allclose(slopes[8 * n + 1:8 * n + 7], expected[1:-1])
+    # the end points take the one-sided secant
+    assert slopes[0] == pytest.approx((y[1] - y[0]) / (x[1] - x[0]))
+
+
+def test_monotone_inverse():
+    knot_lums = [np.array([0., 0.1, 0.5, 1.]), np.array([0., 0.6, 1.])]
+    knot_levels = [np.array([0., 0.4, 0.7, 1.]), np.array([0., 0.5, 1.])]
+    query = np.linspace(0, 1, 101)
+    linear = monotone_inverse(knot_lums, knot_levels, query, kind='linear')
+    for row, k, l in zip(linear, knot_lums, knot_levels):
+        np.testing.assert_allclose(row, np.interp(query, k, l))
+    pchip = monotone_inverse(knot_lums, knot_levels, query, kind='pchip')
+    assert pchip.shape == (2, 101)
+    assert np.all(np.diff(pchip, axis=1) >= 0)
+    # passes through the knots
+    np.testing.assert_allclose(pchip[0, [0, 10, 50, 100]], [0., 0.4, 0.7, 1.], atol=1e-12)
+    np.testing.assert_allclose(pchip[1, [0, 60, 100]], [0., 0.5, 1.], atol=1e-12)
+
+
+@pytest.mark.parametrize('method', CLUT_METHODS)
+def test_unmeasured_guns(method):
+    levels = np.linspace(0, 1, 11)
+    lums = np.zeros((4, 11))
+    lums[0] = levels**2
+    clut = invert_luminances(levels, lums, method=method)
+    np.testing.assert_allclose(clut[1:], 1.)
+
+
+def test_return_error():
+    levels = np.linspace(0, 1, 256)
+    lums = np.repeat(levels[np.newaxis], 4, axis=0)
+    clut, error = invert_luminances(levels, lums, method='isotonic', return_error=True)
+    assert error.shape == clut.shape
+    np.testing.assert_allclose(error, 0., atol=1e-12)
+
+    noise = 0.01
+    noisy = lums + np.random.default_rng(2).normal(0, noise, lums.shape)
+    noisy[:, 0], noisy[:, -1] = 0., 1.
+    _, error = invert_luminances(levels, noisy, method='pchip', return_error=True)
+    # residual noise around the isotonic fit (smaller than the noise) times a slope of about 1
+    assert 0.3 * noise < np.median(error) < noise
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from psychopy_pixx.calibration._drift import DriftCorrector
+
+
+def test_gains_relative_to_first_reference():
+    drift = DriftCorrector(reference_levels=[0.5, 1.0])
+    assert drift.drift == 0.
+    assert len(drift.gains) == 0
+    drift.add_reference(0., [20., 80.])
+    assert drift.add_reference(10., [21., 84.]) == pytest.approx(0.05)
+    np.testing.assert_allclose(drift.gains, [1., 1.05])
+
+
+def test_dark_first_reference():
+    drift = DriftCorrector()
+    drift.add_reference(0., [0.])
+    drift.add_reference(1., [5.])
+    np.testing.assert_allclose(drift.gains, [1., 1.])
+
+
+def test_crossed_only_at_first_exceeding_reference():
+    drift = DriftCorrector(threshold=0.02)
+    crossed = []
+    for lum in [100., 101., 103., 104., 101., 97.]:
+        drift.add_reference(len(crossed), [lum])
+        crossed.append(drift.crossed)
+    assert crossed == [False, False, True, False, False, True]
+    assert drift.exceeded
+
+
+def test_correct_interpolates_gains():
+    drift = DriftCorrector()
+    lums = np.full((4, 5), 110.)
+    np.testing.assert_allclose(drift.correct(np.arange(20.).reshape(4, 5), lums), lums)
+    drift.add_reference(0., [100.])
+    drift.add_reference(10., [110.])
+    times = np.array([[-5., 0., 5., 10., 20.]])
+    np.testing.assert_allclose(drift.gain(times), [[1., 1., 1.05, 1.1, 1.1]])
+    np.testing.assert_allclose(drift.correct(times, [[100., 100., 105., 110., 110.]]), 100.)
+
+
+def test_as_dict():
+    drift = DriftCorrector(reference_levels=[1.], interval=20, threshold=0.01)
+    drift.add_reference(0., [100.])
+    drift.add_reference(1., [99.])
+    stored = drift.as_dict()
+    assert stored['interval'] == 20
+    np.testing.assert_allclose(stored['gains'], [1., 0.99])
+    assert stored['lums'].shape == (2, 1)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from psychopy_pixx.devices._frames import apply_clut, encode_frames, encode_frames_file, open_frames
+
+
+def unpack(high, low):
+    return high.astype(np.uint16) * 256 + low
+
+
+def test_m16_bytes():
+    frames = np.array([[[0., 1., 0.5, 1000 / 65535]]])
+    out = encode_frames(frames, 'M16')
+    assert out.shape == (1, 1, 4, 3) and out.dtype == np.uint8
+    # red holds the high, green the low byte, blue is unused
+    np.testing.assert_array_equal(unpack(out[..., 0], out[..., 1]), [[[0, 65535, 32767, 1000]]])
+    np.testing.assert_array_equal(out[..., 2], 0)
+
+
+def test_c48_even_and_odd_pixels():
+    frames = np.zeros((1, 2, 4, 3))
+    frames[0, :, :, 0] = 1000 / 65535
+    frames[0, :, :, 1] = 1.
+    frames[0, :, :, 2] = 0.5
+    out = encode_frames(frames, 'C48')
+    values = np.array([1000, 65535, 32768])  # rounded to the nearest 16-bit value
+    # even columns hold the high bytes, odd columns the low bytes of each color
+    np.testing.assert_array_equal(out[0, :, 0::2], np.broadcast_to(values >> 8, (2, 2, 3)))
+    np.testing.assert_array_equal(out[0, :, 1::2], np.broadcast_to(values & 0xFF, (2, 2, 3)))
+
+
+def test_apply_clut_at_texels():
+    clut_row = np.linspace(0, 1, 2**16) ** 2
+    indices = np.array([0., 255., 256., 4097., 65535.])
+    np.testing.assert_allclose(apply_clut(indices, clut_row), clut_row[indices.astype(int)] * 65535.)
+    # linear interpolation between neighbouring texels of a row
+    assert apply_clut(np.array([10.5]), clut_row)[0] == pytest.approx((clut_row[10] + clut_row[11]) / 2 * 65535.)
+
+
+def test_clut_is_applied_per_gun():
+    clut = np.empty((4, 2**16))
+    clut[0] = np.linspace(1, 0, 2**16)  # inverting CLUT for M16
+    clut[1], clut[2], clut[3] = 0.25, 0.5, 1.
+    m16 = encode_frames(np.array([[[0., 1.]]]), 'M16', clut=clut)
+    np.testing.assert_array_equal(unpack(m16[..., 0], m16[..., 1]), [[[65535, 0]]])
+
+    c48 = encode_frames(np.full((1, 1, 2, 3), 0.3), 'C48', clut=clut)
+    # the colors take the CLUT rows 1 to 3
+    np.testing.assert_array_equal(unpack(c48[0, 0, 0], c48[0, 0, 1]), np.floor(np.array([0.25, 0.5, 1.]) * 65535 + 0.5))
+
+
+def test_encode_frames_file(tmp_path):
+    frames = np.random.default_rng(0).random((5, 3, 4))
+    encoded = encode_frames_file(tmp_path / 'frames.npy', frames, 'M16', chunk_size=2)
+    np.testing.assert_array_equal(encoded, encode_frames(frames, 'M16'))
+    np.testing.assert_array_equal(open_frames(tmp_path / 'frames.npy'), encoded)
+
+
+def test_invalid_frames():
+    with pytest.raises(ValueError):
+        encode_frames(np.zeros((1, 2, 2)), 'C48')
+    with pytest.raises(ValueError):
+        encode_frames(np.zeros((1, 2, 2)), 'M8')
+    with pytest.raises(ValueError):
+        encode_frames(np.zeros((1, 2, 2)), 'M16', clut=np.zeros((4, 256)))
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from psychopy_pixx.calibration._gamma_fit import fit_gamma_batch, fit_gamma_grid
+
+
+LEVELS = np.linspace(0, 1, 32)
+
+
+def full_gamma(levels, min_lum, gamma, a, k):
+    """ eq.4 of psychopy, y = a + (b + k*x)**gamma with b = (min_lum - a)**(1/gamma). """
+    b = (min_lum - a) ** (1 / gamma)
+    return a + (b + k * levels) ** gamma
+
+
+def synthetic_series(n_series, noise=0., seed=0):
+    rng = np.random.default_rng(seed)
+    min_lum = rng.uniform(0.2, 2., n_series)
+    gamma = rng.uniform(1.8, 2.6, n_series)
+    a = min_lum * rng.uniform(0.1, 0.9, n_series)
+    k = rng.uniform(5., 15., n_series)
+    lums = full_gamma(LEVELS, *(param[:, np.newaxis] for param in (min_lum, gamma, a, k)))
+    return lums * (1 + noise * rng.standard_normal(lums.shape))
+
+
+def grid_model(levels, grid):
+    _, _, gamma, a, b, k = (column[:, np.newaxis] for column in grid.T)
+    return a + (b + k * levels) ** gamma
+
+
+def test_recovers_synthetic_series():
+    lums = synthetic_series(20)
+    grid = fit_gamma_batch(LEVELS, lums)
+    assert grid.shape == (20, 6)
+    np.testing.assert_allclose(grid[:, 0], lums[:, 0])
+    np.testing.assert_allclose(grid[:, 1], lums[:, -1])
+    np.testing.assert_allclose(grid_model(LEVELS, grid), lums, rtol=1e-3)
+
+
+def test_levels_in_255_scale():
+    lums = synthetic_series(3)
+    np.testing.assert_allclose(fit_gamma_batch(255 * LEVELS, lums), fit_gamma_batch(LEVELS, lums))
+
+
+def test_not_worse_than_psychopy():
+    monitors = pytest.importorskip('psychopy.monitors')
+    lums = synthetic_series(8, noise=0.005)
+    grid = fit_gamma_batch(LEVELS, lums)
+    for series, params in zip(lums, grid):
+        calc = monitors.GammaCalculator(inputs=LEVELS, lums=series, eq=4)
+        psychopy_model = grid_model(LEVELS, np.array([[calc.min, calc.max, calc.gamma, calc.a, calc.b, calc.k]]))
+        ssq = np.sum((grid_model(LEVELS, params[np.newaxis]) - series) ** 2)
+        assert ssq <= np.sum((psychopy_model - series) ** 2) * (1 + 1e-6)
+
+
+def test_duplicates_and_process_pool():
+    lums = synthetic_series(6, noise=0.005)
+    stacked = np.concatenate([lums, lums[::-1]])
+    grid = fit_gamma_batch(LEVELS, stacked)
+    np.testing.assert_array_equal(grid[:6], grid[6:][::-1])
+    np.testing.assert_allclose(fit_gamma_batch(LEVELS, stacked, n_jobs=2, chunk_size=2), grid)
+
+
+def test_invalid_shapes():
+    with pytest.raises(ValueError):
+        fit_gamma_batch(LEVELS, synthetic_series(2)[:, :-1])
+
+
+def test_fit_gamma_grid():
+    lums = synthetic_series(4)
+    grid = fit_gamma_grid(LEVELS, lums)
+    assert grid.shape == (4, 6)
+    np.testing.assert_allclose(grid, fit_gamma_batch(LEVELS, lums))
+    np.testing.assert_allclose(fit_gamma_grid(LEVELS, lums[0]), np.repeat(grid[:1], 4, axis=0))
+    with pytest.raises(ValueError):
+        fit_gamma_grid(LEVELS, lums[:2])
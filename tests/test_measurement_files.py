@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from psychopy_pixx.calibration._measurement_files import load_luminance_file, load_raw_file
+
+
+def write_raw_file(path, rows):
+    n_measures = len(rows[0]) - 1
+    header = 'levels,' + ','.join(f'measurement_{i:03}' for i in range(1, n_measures + 1))
+    np.savetxt(path, rows, delimiter=',', header=header, comments='')
+
+
+def test_load_raw_file(tmp_path):
+    path = tmp_path / 'allMeasurments.csv'
+    write_raw_file(path, [[0., 1., 1.2, 0.8, 1.0],
+                          [0.5, 10., 10.2, 9.8, 10.],
+                          [0.5, 12., 12., 12., 12.],  # repeated level
+                          [1., 100., 101., 99., 100.]])
+    levels, lums = load_raw_file(path)
+    np.testing.assert_allclose(levels, [0., 0.5, 1.])
+    assert lums.shape == (4, 3)
+    np.testing.assert_allclose(lums[0], [1., 11., 100.])
+    np.testing.assert_allclose(lums[3], lums[0])
+
+
+def test_load_raw_file_outliers(tmp_path):
+    path = tmp_path / 'allMeasurments.csv'
+    write_raw_file(path, [[0., 1., 1.1, 0.9, 1.0, 50.],
+                          [1., 100., 101., 99., 100., 100.5]])
+    levels, lums = load_raw_file(path)
+    assert lums[0, 0] == pytest.approx(54. / 5)
+
+    levels, lums = load_raw_file(path, outliers=3)
+    # the spike is dropped, the regular spread is kept
+    np.testing.assert_allclose(lums[0], [1., np.mean([100., 101., 99., 100., 100.5])])
+
+
+def test_load_raw_file_applies_drift_gains(tmp_path):
+    path = tmp_path / 'allMeasurments2026-01-01_12-00.csv'
+    write_raw_file(path, [[0., 1., 1.], [1., 110., 110.]])
+    levels, lums = load_raw_file(path)
+    np.testing.assert_allclose(lums[0], [1., 110.])
+
+    np.savetxt(tmp_path / 'allMeasurments2026-01-01_12-00_drift.csv', [[0., 1.], [1., 1.1]],
+               delimiter=',', header='levels,gain', comments='')
+    levels, lums = load_raw_file(path)
+    np.testing.assert_allclose(lums[0], [1., 100.])
+
+    np.savetxt(tmp_path / 'allMeasurments2026-01-01_12-00_drift.csv', [[0., 1.]],
+               delimiter=',', header='levels,gain', comments='')
+    with pytest.raises(ValueError):
+        load_raw_file(path)
+
+def test_load_luminance_file(tmp_path):
+    path = tmp_path / 'luminancePre.csv'
+    np.savetxt(path, [[0., 0.5], [50., 20.], [100., 100.]], delimiter=',')
+    levels, lums = load_luminance_file(path)
+    np.testing.assert_allclose(levels, [0., 0.5, 1.])
+    assert lums.shape == (4, 3)
+    np.testing.assert_allclose(lums[0], [0.5, 20., 100.])
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from psychopy_pixx.calibration._ordering import ORDERS, linear_settle, order_report, plan_order
+
+
+@pytest.mark.parametrize('order', ORDERS)
+@pytest.mark.parametrize('n_levels', [1, 2, 17, 256])
+def test_orders_are_permutations(order, n_levels):
+    index = plan_order(n_levels, order, rng=0)
+    np.testing.assert_array_equal(np.sort(index), np.arange(n_levels))
+
+
+@pytest.mark.parametrize('order', ['strided', 'shuffled-strided'])
+@pytest.mark.parametrize('n_levels, stride', [(256, None), (100, 7), (50, 1), (10, 20)])
+def test_strided_jump_bound(order, n_levels, stride):
+    index = plan_order(n_levels, order, stride)
+    bound = min(stride or int(np.ceil(np.sqrt(n_levels))), n_levels)
+    assert np.abs(np.diff(index)).max() <= bound
+
+
+def test_fixed_orders():
+    np.testing.assert_array_equal(plan_order(4, 'sequential'), [0, 1, 2, 3])
+    np.testing.assert_array_equal(plan_order(4, 'inverted'), [3, 2, 1, 0])
+    np.testing.assert_array_equal(plan_order(7, 'strided', 3), [0, 3, 6, 4, 1, 2, 5])
+    np.testing.assert_array_equal(plan_order(8, 'random', rng=1), plan_order(8, 'random', rng=1))
+    with pytest.raises(ValueError):
+        plan_order(8, 'zigzag')
+
+
+def test_order_report():
+    levels = np.linspace(0, 1, 5)
+    settle = linear_settle(0.5, 1.)
+    sequential = order_report(levels, plan_order(5), settle)
+    assert sequential['max_jump'] == pytest.approx(0.25)
+    # no jump before the first level, then four jumps of 0.25
+    assert sequential['total_settle'] == pytest.approx(5 * 0.5 + 4 * 0.25)
+    assert sequential['settle_per_level'] == pytest.approx(sequential['total_settle'] / 5)
+    assert sequential['drift_confounding'] == pytest.approx(1.)
+
+    alternating = order_report(levels, np.array([0, 4, 1, 3, 2]), settle)
+    assert alternating['max_jump'] == pytest.approx(1.)
+    assert alternating['drift_confounding'] < sequential['drift_confounding']
+    assert order_report(levels[:1], np.array([0]), settle)['drift_confounding'] == 0.
@@ -0,0 +1,95 @@
+import json
+import time
+
+import pytest
+
+from psychopy_pixx.calibration import photometer as photometer_module
+from psychopy_pixx.calibration._s470_photometer import S470
+from psychopy_pixx.calibration.photometer import _cached_port, _probe_concurrently, findPhotometer
+
+from fake_s470 import FakeS470
+
+
+@pytest.fixture
+def fakes():
+    fakes = []
+
+    def make(**kwargs):
+        fake = FakeS470(**kwargs)
+        fakes.append(fake)
+        return fake
+    yield make
+    for fake in fakes:
+        fake.close()
+
+
+@pytest.fixture
+def cache_file(tmp_path, monkeypatch):
+    cache_file = tmp_path / 'pixx_photometers.json'
+    monkeypatch.setattr(photometer_module, 'PORT_CACHE_FILE', str(cache_file))
+    return cache_file
+
+
+def test_probe_returns_first_photometer(fakes):
+    muted, fake = fakes(muted=True), fakes()
+    start = time.perf_counter()
+    photometer = _probe_concurrently([S470], [muted.port, fake.port], timeout=2.)
+    duration = time.perf_counter() - start
+    assert photometer.portString == fake.port
+    assert duration < 1.  # does not wait for the handshake at the muted port
+    photometer.com.close()
+
+
+def test_probe_closes_other_photometers(fakes, monkeypatch):
+    opened = []
+    open_photometer = photometer_module._open_photometer
+
+    def recording_open(cls, port, timeout):
+        photometer = open_photometer(cls, port, timeout)
+        opened.append(photometer)
+        return photometer
+    monkeypatch.setattr(photometer_module, '_open_photometer', recording_open)
+    ports = [fakes().port for _ in range(3)]
+    photometer = _probe_concurrently([S470], ports, timeout=1.)
+    assert photometer.com.is_open
+    deadline = time.perf_counter() + 2.
+    while len(opened) < len(ports) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert [other.com.is_open for other in opened if other is not photometer] == [False] * (len(ports) - 1)
+    photometer.com.close()
+
+
+def test_probe_without_photometer(fakes):
+    assert _probe_concurrently([S470], [fakes(muted=True).port], timeout=0.1) is None
+    assert _probe_concurrently([S470], [], timeout=0.1) is None
+
+
+def test_find_updates_and_uses_cache(fakes, cache_file, monkeypatch):
+    fake = fakes()
+    photometer = findPhotometer(ports=[fakes(muted=True).port, fake.port], device='S470', timeout=0.5)
+    photometer.com.close()
+    assert json.loads(cache_file.read_text())['s470'] == {'class': 'S470', 'port': fake.port}
+
+    def no_probe(*args):
+        raise AssertionError("expects the cached port")
+    monkeypatch.setattr(photometer_module, '_probe_concurrently', no_probe)
+    photometer = findPhotometer(ports=[fake.port], device='S470', timeout=0.5)
+    assert photometer.portString == fake.port
+    photometer.com.close()
+
+
+def test_find_probes_if_cached_port_fails(fakes, cache_file):
+    fake = fakes()
+    cache_file.write_text(json.dumps({'s470': {'class': 'S470', 'port': fakes(muted=True).port}}))
+    ports = [json.loads(cache_file.read_text())['s470']['port'], fake.port]
+    photometer = findPhotometer(ports=ports, device='S470', timeout=0.2)
+    assert photometer.portString == fake.port
+    assert json.loads(cache_file.read_text())['s470']['port'] == fake.port
+    photometer.com.close()
+
+
+def test_cached_port_follows_serial_number():
+    available = {'/dev/ttyUSB1': {'serial_number': 'FT1234', 'hwid': ''},
+                 '/dev/ttyUSB2': {'serial_number': None, 'hwid': ''}}
+    assert _cached_port({'port': '/dev/ttyUSB0', 'serial_number': 'FT1234'}, available) == '/dev/ttyUSB1'
+    assert _cached_port({'port': '/dev/ttyUSB0', 'serial_number': None}, available) == '/dev/ttyUSB0'
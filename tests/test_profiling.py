@@ -0,0 +1,37 @@
+import threading
+
+from psychopy_pixx._profiling import Profiler
+
+
+def test_concurrent_counts():
+    profiler = Profiler(enabled=True)
+
+    def count():
+        for _ in range(5000):
+            profiler.count('serial bytes read', 3)
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert profiler.counters['serial bytes read'] == 4 * 5000 * 3
+    totals = [event['args']['serial bytes read'] for event in profiler.events]
+    assert sorted(totals) == totals  # running totals in the order of the events
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    with profiler.span('flip'):
+        pass
+    profiler.count('serial bytes read')
+    assert profiler.events == [] and profiler.counters == {}
+
+
+def test_summary():
+    profiler = Profiler(enabled=True)
+    profiler.record('flip', 1., 1.5)
+    profiler.record('flip', 2., 2.1)
+    summary = profiler.summary()['spans']['flip']
+    assert summary['count'] == 2
+    assert abs(summary['total'] - 0.6) < 1e-9 and abs(summary['max'] - 0.5) < 1e-9
@@ -0,0 +1,56 @@
+import pytest
+
+from psychopy_pixx.devices._register_monitor import RegisterMismatch, RegisterMonitor
+
+
+class FakeDevice:
+    def __init__(self):
+        self.register = {'VideoMode': 'M16', 'BacklightIntensity': 255, 'DisplayResolution': (1920, 1080)}
+        for key in self.register:
+            setattr(self, 'get' + key, lambda key=key: self.register[key])
+        self.isScanningBackLightEnabled = lambda: True
+
+    def updateRegisterCache(self):
+        pass
+
+
+def expected_register():
+    # as loaded from the calibration json, without tuples
+    return {'VideoMode': 'M16', 'BacklightIntensity': 255, 'DisplayResolution': [1920, 1080],
+            'ScanningBackLight': True}
+
+
+def test_events_on_state_changes():
+    device = FakeDevice()
+    register_monitor = RegisterMonitor(device, expected_register(), keys=None, min_interval=0., on_mismatch='ignore')
+    assert register_monitor.check()
+    device.register['BacklightIntensity'] = 128
+    assert register_monitor.check() is False
+    assert register_monitor.check() is False
+    assert register_monitor.check() is False
+    device.register['BacklightIntensity'] = 255
+    assert register_monitor.check()
+    assert register_monitor.check()
+
+    assert [event['recovered'] for event in register_monitor.events] == [False, True]
+    assert register_monitor.events[0]['mismatches'] == {'BacklightIntensity': {'expected': 255, 'actual': 128}}
+    stats = register_monitor.stats()
+    assert (stats['checks'], stats['mismatches'], stats['recoveries']) == (6, 1, 1)
+
+
+def test_raise_once_per_change():
+    device = FakeDevice()
+    register_monitor = RegisterMonitor(device, expected_register(), min_interval=0.)
+    device.register['VideoMode'] = 'C24'
+    with pytest.raises(RegisterMismatch, match='VideoMode'):
+        register_monitor.check()
+    assert register_monitor.check() is False
+    device.register['VideoMode'] = 'M16'
+    assert register_monitor.check()
+
+
+def test_rate_limit():
+    register_monitor = RegisterMonitor(FakeDevice(), expected_register(), min_interval=60.)
+    assert register_monitor.check()
+    assert register_monitor.check() is None
+    assert register_monitor.n_skipped == 1
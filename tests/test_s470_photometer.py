@@ -0,0 +1,142 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from psychopy_pixx.calibration._s470_photometer import S470, _RingBuffer
+
+from fake_s470 import FakeS470
+
+
+@pytest.fixture
+def fake():
+    fake = FakeS470()
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def photometer(fake):
+    photometer = S470(fake.port, timeout=1.)
+    yield photometer
+    photometer.com.close()
+
+
+def test_connect(fake, photometer):
+    assert photometer.OK
+    assert fake.commands == ['RNG 6', 'SRT 250']
+
+
+
+@pytest.mark.parametrize('arguments', [{'channel_range': 7}, {'sample_rate': 0}, {'sample_rate': 251}])
+def test_invalid_arguments(fake, arguments):
+    with pytest.raises(ValueError):
+        S470(fake.port, **arguments)
+    assert fake.commands == []
+
+
+def test_settings(fake, photometer):
+    photometer.channel_range = 3
+    photometer.sample_rate = 100
+    assert fake.commands[-2:] == ['RNG 3', 'SRT 100']
+    with pytest.raises(ValueError):
+        photometer.sample_rate = 300
+    assert photometer.sample_rate == 100
+
+
+def test_measure(fake, photometer):
+    lums = photometer.measure(100)
+    assert isinstance(lums, np.ndarray)
+    assert lums.shape == (100,)
+    np.testing.assert_allclose(lums, fake.sent, rtol=1e-4)
+    assert fake.commands[-1] == 'REA 100'
+
+    photometer.measure(1)
+    assert fake.commands[-1] == 'REA'
+
+
+def test_get_lum(fake, photometer):
+    photometer.n_repeat = 20
+    lum, lums = photometer.getLum(return_all=True)
+    assert isinstance(lums, list) and len(lums) == 20
+    np.testing.assert_allclose(lums, fake.sent, rtol=1e-4)
+    assert lum == pytest.approx(np.mean(fake.sent), rel=1e-4)
+    assert photometer.lastLum == lum
+
+
+def test_stream_split_readings(fake, photometer):
+    fake.write_size = 3  # every reading arrives in several pieces
+    chunks = list(photometer.stream(30, chunk_size=8))
+    assert len(chunks) > 1
+    times = [timestamp for timestamp, _ in chunks]
+    assert times == sorted(times)
+    lums = np.concatenate([values for _, values in chunks])
+    np.testing.assert_allclose(lums, fake.sent, rtol=1e-4)
+
+
+def test_measure_timeout(fake, photometer):
+    photometer.com.timeout = 0.1
+    fake.muted = True
+    with pytest.raises(IOError):
+        photometer.measure(5)
+
+
+def test_acquisition(fake, photometer):
+    start = time.perf_counter()
+    photometer.start_acquisition(chunk_measures=10)
+    times, lums = photometer.wait_readings(start, 25)
+    photometer.stop_acquisition()
+    assert len(lums) == 25 and np.all(times >= start)
+    assert not photometer.acquiring
+
+
+def test_acquisition_garbled(fake, photometer):
+    fake.garbled = True
+    start = time.perf_counter()
+    photometer.start_acquisition(chunk_measures=10)
+    with pytest.raises(IOError) as error:
+        photometer.wait_readings(start, 25, timeout=5.)
+    assert isinstance(error.value.__cause__, ValueError)
+    photometer.stop_acquisition()
+
+
+def test_ring_buffer_concurrent_reads_during_wrap_around():
+    buffer = _RingBuffer(64)
+    done = threading.Event()
+
+    def write():
+        for start in range(0, 20000, 7):
+            samples = np.arange(start, start + 7, dtype=float)
+            buffer.push(samples, -samples)  # value is the negative time, to detect torn pairs
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    n_reads = 0
+    while not done.is_set() or n_reads == 0:
+        times, values = buffer.between(0.)
+        n_reads += 1
+        assert len(times) <= 64
+        np.testing.assert_array_equal(values, -times)
+        np.testing.assert_array_equal(np.diff(times), 1.)  # consecutive and in order, nothing stale
+    writer.join()
+    times, values = buffer.between(19950., 19990.)
+    np.testing.assert_array_equal(times, np.arange(19950., 19991.))
+
+
+def test_auto_range(fake, photometer):
+    photometer.channel_range = 0  # 42.5 cd/m^2 exceed this range, the probe repeats in the highest
+    assert photometer.auto_range(band=3) == 2
+    assert fake.commands[-4:] == ['REA 5', 'RNG 6', 'REA 5', 'RNG 2']
+    assert photometer.range_by_band == {3: 2}
+
+    fake.luminance = 500.
+    n_commands = len(fake.commands)
+    assert photometer.auto_range(band=3) == 2  # cached, without probing
+    assert len(fake.commands) == n_commands
+
+    photometer.reset_range_cache()
+    assert photometer.range_by_band == {}
+    assert photometer.auto_range(band=3) == 3
+    assert fake.commands[-2:] == ['REA 5', 'RNG 3']
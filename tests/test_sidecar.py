@@ -0,0 +1,50 @@
+from copy import deepcopy
+
+import numpy as np
+
+from psychopy_pixx import _sidecar
+from psychopy_pixx._sidecar import copy_calib, json_normalized, load_calib_entry, store_calib_entry
+
+
+class FakeMonitor:
+    name = 'ViewPixx'
+    currentCalibName = '2026_01_01 12:00'
+
+    def __init__(self, calib):
+        self.currentCalib = calib
+
+    def copyCalib(self, calibName):  # like psychopy's Monitor.copyCalib
+        self.currentCalib = deepcopy(self.currentCalib)
+        self.currentCalibName = calibName
+
+
+def test_store_and_load_calib_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(_sidecar, '_monitor_folder', lambda: tmp_path)
+    lums = np.random.default_rng(0).random((4, 16))
+    register = {'VideoMode': 'M16', 'BacklightIntensity': np.int64(8), 'DisplayResolution': (1920, 1080)}
+    monitor = FakeMonitor({'lumsPre': lums, 'viewpixx': {'register': register}})
+    store_calib_entry(monitor, 'lumsPre')
+    store_calib_entry(monitor, 'viewpixx')
+    assert monitor.currentCalib['lumsPre'] == {'sidecar': 'ViewPixx_arrays/2026_01_01_12_00/lumsPre.npy'}
+    np.testing.assert_array_equal(load_calib_entry(monitor, 'lumsPre'), lums)
+
+    loaded = load_calib_entry(monitor, 'viewpixx')['register']
+    assert loaded['DisplayResolution'] == [1920, 1080]  # json has no tuples
+    assert json_normalized(register) == json_normalized(loaded)
+
+
+def test_copy_calib_copies_sidecar_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(_sidecar, '_monitor_folder', lambda: tmp_path)
+    lums = np.arange(8.).reshape(2, 4)
+    monitor = FakeMonitor({'lumsPost': lums, 'viewpixx': {'register': {'VideoMode': 'M16'}}, 'gamma': 1})
+    store_calib_entry(monitor, 'lumsPost')
+    store_calib_entry(monitor, 'viewpixx')
+    old_calib = monitor.currentCalib
+
+    copy_calib(monitor, 'refit')
+    assert monitor.currentCalib['lumsPost'] == {'sidecar': 'ViewPixx_arrays/refit/lumsPost.npy'}
+    assert monitor.currentCalib['viewpixx'] == {'sidecar': 'ViewPixx_arrays/refit/viewpixx.json'}
+    assert monitor.currentCalib['gamma'] == 1
+    np.testing.assert_array_equal(load_calib_entry(monitor, 'lumsPost'), lums)
+    assert load_calib_entry(monitor, 'viewpixx') == {'register': {'VideoMode': 'M16'}}
+    assert old_calib['lumsPost'] == {'sidecar': 'ViewPixx_arrays/2026_01_01_12_00/lumsPost.npy'}
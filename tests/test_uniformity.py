@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from psychopy_pixx.devices._uniformity import correct_uniformity, fit_uniformity, interpolate_map, sample_map
+
+
+LEVELS = np.linspace(0, 1, 9)
+
+
+def linear_lums(intercepts, slopes):
+    """ Luminances of shape (positions, 4, levels) with only the luminance gun measured. """
+    lums = np.zeros((len(intercepts), 4, len(LEVELS)))
+    lums[:, 0] = np.asarray(intercepts)[:, None] + np.asarray(slopes)[:, None] * LEVELS
+    return lums
+
+
+def test_fit_uniformity_recovers_gain_and_offset():
+    intercepts, slopes = np.array([1., 2., 1.5]), np.array([100., 90., 95.])
+    gains, offsets = fit_uniformity(LEVELS, linear_lums(intercepts, slopes))
+    assert gains.shape == offsets.shape == (3, 4)
+    # common target range: from the highest black (2) to the lowest white (92)
+    np.testing.assert_allclose(gains[:, 0], 90. / slopes)
+    np.testing.assert_allclose(offsets[:, 0], (2. - intercepts) / slopes)
+    corrected = intercepts[:, None] + slopes[:, None] * correct_uniformity(LEVELS, gains[:, [0]], offsets[:, [0]])
+    np.testing.assert_allclose(corrected, np.broadcast_to(2. + 90. * LEVELS, corrected.shape))
+    # unmeasured colors take the luminance correction
+    np.testing.assert_allclose(gains[:, 1:], np.repeat(gains[:, [0]], 3, axis=1))
+
+
+def test_fit_uniformity_rejects_flat_luminances():
+    with pytest.raises(ValueError):
+        fit_uniformity(LEVELS, linear_lums([1., 1.], [100., 0.]))
+
+
+def surface_positions(n):
+    return np.random.default_rng(n).uniform(-0.9, 0.9, (n, 2))
+
+
+@pytest.mark.parametrize('true_surface', [lambda x, y: 1 + 0.2 * x - 0.1 * y + 0.05 * x * y - 0.1 * x**2,
+                                            lambda x, y: 0.5 - 0.3 * y])
+def test_interpolate_map_recovers_surface(true_surface):
+    positions = surface_positions(9)
+    values = np.repeat(true_surface(*positions.T)[:, None], 4, axis=1)
+    surface = interpolate_map(values, positions, size=(4, 6))
+    assert surface.shape == (4, 4, 6)
+    x, y = np.meshgrid(2 * (np.arange(6) + 0.5) / 6 - 1, 2 * (np.arange(4) + 0.5) / 4 - 1)
+    np.testing.assert_allclose(surface[0], true_surface(x, y), atol=1e-12)
+
+
+@pytest.mark.parametrize('n_positions, degree', [(5, 1), (3, 1), (2, 0), (1, 0)])
+def test_interpolate_map_reduces_degree(n_positions, degree):
+    positions = surface_positions(n_positions)
+    values = np.repeat((positions[:, 0]**2 + positions[:, 1])[:, None], 4, axis=1)
+    surface = interpolate_map(values, positions, size=(5, 5))[0]
+    # a linear surface has no second differences, a constant surface no first differences
+    np.testing.assert_allclose(np.diff(surface, n=degree + 1, axis=0), 0, atol=1e-12)
+    np.testing.assert_allclose(np.diff(surface, n=degree + 1, axis=1), 0, atol=1e-12)
+    if degree == 0:
+        np.testing.assert_allclose(surface, values[:, 0].mean())
+
+
+def test_sample_map_edge_clamp():
+    uniformity_map = np.array([[[0., 1.], [2., 3.]]] * 4, dtype=np.float32)
+    np.testing.assert_allclose(sample_map(uniformity_map, 2, 2), uniformity_map)
+    sampled = sample_map(uniformity_map, 4, 4)
+    assert sampled.shape == (4, 4, 4)
+    # pixel centers beyond the outer texel centers are clamped to the edge texels
+    np.testing.assert_allclose(sampled[0, 0], [0., 0.25, 0.75, 1.])
+    np.testing.assert_allclose(sampled[0, -1], [2., 2.25, 2.75, 3.])
+    np.testing.assert_allclose(sampled[0, :, 0], [0., 0.5, 1.5, 2.])